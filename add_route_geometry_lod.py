@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+"""
+Veritabanına sadeleştirilmiş rota geometrisi desteği ekler
+Routes tablosuna geometry_lod JSONB kolonu ekler ve mevcut rotalar için
+zoom seviyelerini önceden hesaplar
+"""
+
+import json
+import os
+import sys
+
+import psycopg2
+
+from route_geometry import LOD_ZOOMS, LOD_PRECISION, build_lod
+
+
+def add_geometry_lod_column():
+    """Routes tablosuna geometry_lod kolonu ekle ve mevcut rotaları doldur"""
+
+    # Database connection
+    db_config = {
+        'host': os.getenv('POI_DB_HOST', 'localhost'),
+        'port': os.getenv('POI_DB_PORT', '5432'),
+        'database': os.getenv('POI_DB_NAME', 'poi_db'),
+        'user': os.getenv('POI_DB_USER', 'poi_user'),
+        'password': os.getenv('POI_DB_PASSWORD', 'poi_password')
+    }
+
+    conn = None
+    try:
+        conn = psycopg2.connect(**db_config)
+        cur = conn.cursor()
+
+        print("🗺️ Adding geometry level-of-detail support to routes table...")
+
+        # Check if column already exists
+        cur.execute("""
+            SELECT column_name
+            FROM information_schema.columns
+            WHERE table_name = 'routes' AND column_name = 'geometry_lod'
+        """)
+
+        if cur.fetchone():
+            print("⚠️ geometry_lod column already exists")
+        else:
+            cur.execute("""
+                ALTER TABLE routes
+                ADD COLUMN geometry_lod JSONB;
+            """)
+            print("✅ Added geometry_lod column")
+
+        cur.execute(f"""
+            COMMENT ON COLUMN routes.geometry_lod IS
+            'Douglas-Peucker simplified route geometry per map zoom level: {{"10": "<polyline>", ...}}.
+             Levels {", ".join(map(str, LOD_ZOOMS))}; Google encoded polylines with precision {LOD_PRECISION}.';
+        """)
+
+        # Backfill routes saved before this migration
+        cur.execute("""
+            SELECT id, ST_AsGeoJSON(route_geometry)
+            FROM routes
+            WHERE route_geometry IS NOT NULL AND geometry_lod IS NULL
+        """)
+        rows = cur.fetchall()
+        for route_id, geometry in rows:
+            coordinates = json.loads(geometry)['coordinates']
+            lod = build_lod([(lat, lng) for lng, lat, *_ in coordinates])
+            cur.execute("UPDATE routes SET geometry_lod = %s WHERE id = %s", (json.dumps(lod), route_id))
+        print(f"✅ Precomputed geometry levels for {len(rows)} routes")
+
+        conn.commit()
+        print("✅ Geometry level-of-detail support added successfully")
+
+    except psycopg2.Error as e:
+        print(f"❌ Database error: {e}")
+        sys.exit(1)
+    except Exception as e:
+        print(f"❌ Error: {e}")
+        sys.exit(1)
+    finally:
+        if conn:
+            conn.close()
+
+
+if __name__ == "__main__":
+    add_geometry_lod_column()
@@ -16,6 +16,7 @@ from .config.database import init_database_pool, close_database_pool
 from auth_middleware import auth_middleware
 from session_config import configure_session
 from .middleware.error_handler import error_handler
+from readiness import register_readiness, start_background_services
 
 # Global logger
 logger = logging.getLogger(__name__)
@@ -66,6 +67,12 @@ def create_app(config_name=None):
     
     # Register blueprints and routes
     register_blueprints(app)
+    register_readiness(app)
+    
+    # Load routing graphs and start route workers in the background;
+    # requests and the /ready probe never start them
+    if not app.config.get('TESTING'):
+        start_background_services()
     
     # Log successful initialization
     logger.info(f"Flask app created with config: {config.__class__.__name__}")
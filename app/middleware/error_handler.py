@@ -17,12 +17,14 @@ logger = logging.getLogger(__name__)
 class APIError(Exception):
     """Custom API error with structured information."""
     
-    def __init__(self, message: str, code: str = "API_ERROR", status_code: int = 400, details: Optional[Dict] = None):
+    def __init__(self, message: str, code: str = "API_ERROR", status_code: int = 400, details: Optional[Dict] = None,
+                 headers: Optional[Dict[str, str]] = None):
         super().__init__(message)
         self.message = message
         self.code = code
         self.status_code = status_code
         self.details = details or {}
+        self.headers = headers or {}
 
 
 class ErrorHandler:
@@ -133,7 +135,7 @@ class ErrorHandler:
             details=error.details
         )
         
-        return jsonify(response), error.status_code
+        return jsonify(response), error.status_code, error.headers
     
     def handle_http_error(self, error: HTTPException) -> Tuple[Dict[str, Any], int]:
         """Handle HTTP errors (4xx, 5xx)."""
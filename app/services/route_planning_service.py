@@ -4,14 +4,23 @@ Handles route calculation, optimization, and navigation between POIs.
 """
 
 import math
+import os
 import logging
 from typing import Dict, List, Any, Optional, Tuple
 from datetime import datetime
 
+import numpy as np
+
 from app.middleware.error_handler import APIError, bad_request, internal_error
+from graph_store import GraphLoadingError, get_graph_store
+from poi_distance_table import load_table, poi_distance_table_path
+from route_workers import RoutePoolError, get_route_pool
+from routing_engine import haversine_m
 
 logger = logging.getLogger(__name__)
 
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
 
 class RoutePlanningService:
     """Service class for route planning and calculation operations."""
@@ -26,6 +35,12 @@ class RoutePlanningService:
         self.walking_speed_kmh = 5  # km/h
         self.driving_speed_kmh = 40  # km/h in city
         self.max_walking_distance_km = 5  # Maximum walking distance
+        self.max_snap_distance_m = 750  # Waypoints farther from the network are rejected
+        self.detour_factor = 1.5  # Crow-flies distance multiplier for pairs without a network path
+        self.optimization_time_budget_s = 0.2
+        self.poi_distance_table_path = poi_distance_table_path(os.path.join(PROJECT_ROOT, 'cache'), 'walking')
+        self.graph_store = get_graph_store()
+        self.route_pool = get_route_pool()
     
     def create_route(self, waypoints: List[Dict[str, Any]], 
                     route_type: str = 'smart') -> Dict[str, Any]:
@@ -88,6 +103,9 @@ class RoutePlanningService:
             try:
                 return self._create_osmnx_walking_route(waypoints)
             except Exception as osmnx_error:
+                # Temporary unavailability is reported so that clients retry
+                if isinstance(osmnx_error, APIError) and osmnx_error.status_code == 503:
+                    raise
                 logger.warning(f"OSMnx walking route failed: {osmnx_error}")
                 # Fallback to simple routing
                 return self._create_simple_route(waypoints, 'walking')
@@ -129,6 +147,11 @@ class RoutePlanningService:
         """
         Optimize route order using traveling salesman approach.
         
+        Orders stops on the walking network distance matrix: exact Held-Karp
+        for small routes, nearest neighbour + 2-opt/Or-opt within a time
+        budget for larger ones. Without a start point the first waypoint
+        stays first.
+        
         Args:
             waypoints: List of POI waypoints to visit
             start_point: Fixed starting point (optional)
@@ -138,15 +161,21 @@ class RoutePlanningService:
             Optimized waypoint order
         """
         try:
-            if len(waypoints) <= 2:
+            if len(waypoints) <= 2 and not start_point and not end_point:
                 return waypoints
             
-            # For small number of waypoints, use simple nearest neighbor
-            if len(waypoints) <= 10:
-                return self._nearest_neighbor_optimization(waypoints, start_point, end_point)
-            else:
-                # For larger sets, use a more sophisticated approach
-                return self._genetic_algorithm_optimization(waypoints, start_point, end_point)
+            points = list(waypoints)
+            start = self._fixed_point_index(points, start_point, at_end=False)
+            if start is None:
+                start = 0
+            end = self._fixed_point_index(points, end_point, at_end=True)
+            if end == start:
+                end = None
+            
+            matrix = self._network_distance_matrix(points)
+            order = self.route_pool.optimize_order(matrix, start=start, end=end,
+                                                   time_budget_s=self.optimization_time_budget_s)
+            return [points[i] for i in order]
                 
         except Exception as e:
             logger.error(f"Route optimization error: {e}")
@@ -267,29 +296,33 @@ class RoutePlanningService:
         
         return c * r
     
+    def _get_walking_graph(self):
+        """Current compiled walking graph from the process-wide graph store (loaded in the background)."""
+        return self.graph_store.get('walking')
+    
     def _create_osmnx_walking_route(self, waypoints: List[Dict[str, Any]]) -> Dict[str, Any]:
-        """Create walking route using OSMnx (simplified mock implementation)."""
+        """Create walking route over the compiled OSMnx walking graph."""
         try:
-            # In real implementation, would use OSMnx and NetworkX
-            # For now, create a mock response based on the API structure we saw
+            graph = self._get_walking_graph()
+            
+            # Snap all waypoints in one KD-tree query
+            nodes, snap_distances = graph.snap([float(wp['lat']) for wp in waypoints],
+                                               [float(wp['lng']) for wp in waypoints])
+            for i, distance in enumerate(snap_distances.tolist()):
+                if distance > self.max_snap_distance_m:
+                    raise APIError(f"Waypoint {i+1} is {distance:.0f} m away from the walking network",
+                                   "WAYPOINT_OFF_NETWORK", 400)
             
             full_route = []
             total_distance = 0
+            legs = self.route_pool.route_legs(graph, list(zip(nodes[:-1].tolist(), nodes[1:].tolist())))
             
-            # Generate mock route coordinates between waypoints
-            for i in range(len(waypoints) - 1):
-                start = waypoints[i]
-                end = waypoints[i + 1]
-                
-                # Create interpolated points between waypoints
-                segment_coords = self._interpolate_coordinates(start, end, num_points=10)
-                full_route.extend(segment_coords)
-                
-                # Calculate segment distance
-                segment_distance = self._haversine_distance(
-                    start['lat'], start['lng'], end['lat'], end['lng']
-                )
-                total_distance += segment_distance
+            for i, leg in enumerate(legs):
+                if leg is None:
+                    raise APIError(f"No walking path between waypoints {i+1} and {i+2}", "NO_WALKING_PATH", 400)
+                segment_coords = [{'lat': lat, 'lng': lng} for lat, lng in leg.geometry]
+                full_route.extend(segment_coords if not full_route else segment_coords[1:])
+                total_distance += leg.length_m / 1000.0
             
             # Calculate estimated time
             estimated_time_minutes = (total_distance / self.walking_speed_kmh) * 60
@@ -311,6 +344,14 @@ class RoutePlanningService:
                 'fallback_used': False
             }
             
+        except APIError:
+            raise
+        except GraphLoadingError as e:
+            raise APIError(f"Walking network is still loading: {str(e)}", "GRAPH_LOADING", 503,
+                           headers={'Retry-After': str(e.retry_after_s)})
+        except RoutePoolError as e:
+            raise APIError(f"Route service busy: {str(e)}", "ROUTE_POOL_BUSY", 503,
+                           headers={'Retry-After': '2'})
         except Exception as e:
             raise APIError(f"OSMnx walking route error: {str(e)}", "OSMNX_WALKING_ERROR", 500)
     
@@ -414,61 +455,51 @@ class RoutePlanningService:
         
         return coords
     
-    def _nearest_neighbor_optimization(self, waypoints: List[Dict[str, Any]], 
-                                     start_point: Dict[str, Any] = None,
-                                     end_point: Dict[str, Any] = None) -> List[Dict[str, Any]]:
-        """Optimize route using nearest neighbor algorithm."""
+    def _fixed_point_index(self, points: List[Dict[str, Any]], point: Optional[Dict[str, Any]],
+                           at_end: bool) -> Optional[int]:
+        """Index of a fixed start/end point, appending it when it is not one of the waypoints."""
+        if not point:
+            return None
+        if point in points:
+            return points.index(point)
+        if at_end:
+            points.append(point)
+            return len(points) - 1
+        points.insert(0, point)
+        return 0
+    
+    def _network_distance_matrix(self, points: List[Dict[str, Any]]) -> np.ndarray:
+        """
+        Walking network distances in meters between all points.
+        
+        Pairs between stored POIs are read from the persisted POI distance
+        table; other pairs are searched live. Pairs without a network path (or
+        points off the network, or no compiled graph) use the crow-flies
+        distance times the detour factor.
+        """
+        lats = np.array([float(p['lat']) for p in points])
+        lngs = np.array([float(p['lng']) for p in points])
+        matrix = np.full((len(points), len(points)), np.inf)
+        
         try:
-            if not waypoints:
-                return []
-            
-            # Start with the first waypoint or provided start point
-            optimized_route = []
-            remaining_points = waypoints.copy()
-            
-            if start_point:
-                current_point = start_point
-                optimized_route.append(current_point)
-            else:
-                current_point = remaining_points.pop(0)
-                optimized_route.append(current_point)
-            
-            # Find nearest neighbor for each step
-            while remaining_points:
-                nearest_point = None
-                nearest_distance = float('inf')
-                
-                for point in remaining_points:
-                    distance = self._haversine_distance(
-                        current_point['lat'], current_point['lng'],
-                        point['lat'], point['lng']
-                    )
-                    
-                    if distance < nearest_distance:
-                        nearest_distance = distance
-                        nearest_point = point
-                
-                if nearest_point:
-                    optimized_route.append(nearest_point)
-                    remaining_points.remove(nearest_point)
-                    current_point = nearest_point
-            
-            # Add end point if specified
-            if end_point and end_point != optimized_route[-1]:
-                optimized_route.append(end_point)
-            
-            return optimized_route
-            
+            graph = self._get_walking_graph()
+            nodes, snap_distances = graph.snap(lats, lngs)
+            on_network = np.flatnonzero(snap_distances <= self.max_snap_distance_m)
+            if len(on_network):
+                table = load_table(self.poi_distance_table_path, graph)
+                snapped = nodes[on_network].tolist()
+                live = lambda sources, targets: self.route_pool.distance_matrix(graph, sources, targets)
+                lengths, _ = table.distance_matrix(graph, snapped, live=live) if table else live(snapped, snapped)
+                matrix[np.ix_(on_network, on_network)] = lengths
         except Exception as e:
-            logger.error(f"Nearest neighbor optimization error: {e}")
-            return waypoints
-    
-    def _genetic_algorithm_optimization(self, waypoints: List[Dict[str, Any]], 
-                                      start_point: Dict[str, Any] = None,
-                                      end_point: Dict[str, Any] = None) -> List[Dict[str, Any]]:
-        """Optimize route using simplified genetic algorithm (placeholder)."""
-        # For now, fall back to nearest neighbor for complex cases
-        return self._nearest_neighbor_optimization(waypoints, start_point, end_point)
+            logger.warning(f"Network distance matrix unavailable, using crow-flies distances: {e}")
+        
+        missing = np.isinf(matrix)
+        if missing.any():
+            crow_flies = haversine_m(lats[:, None], lngs[:, None], lats[None, :], lngs[None, :])
+            matrix[missing] = crow_flies[missing] * self.detour_factor
+        np.fill_diagonal(matrix, 0.0)
+        return matrix
 
 
 # Global route planning service instance
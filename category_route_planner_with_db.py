@@ -14,6 +14,9 @@ import traceback
 
 # POI veritabanı adaptörü
 from poi_database_adapter import POIDatabaseFactory, load_poi_data_from_database
+from poi_distance_table import load_table, poi_distance_table_path
+from route_workers import get_route_pool
+from routing_engine import RoutingGraph, load_compiled_graph
 
 # --- Sabitler ve Konfigürasyon ---
 URGUP_CENTER_LOCATION = (38.6310, 34.9130)
@@ -21,6 +24,8 @@ DEFAULT_ZOOM_URGUP = 16
 DEFAULT_GRAPH_FILE_URGUP = "urgup_merkez_walking.graphml"
 EARTH_RADIUS_KM = 6371.0
 DEFAULT_GRAPH_RADIUS_KM = 10.0
+MAX_SNAP_DISTANCE_M = 750.0  # Yol ağına bundan uzak noktalar düz çizgiyle bağlanır
+POI_DISTANCE_TABLE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "cache")  # poi_api ile paylaşılan POI mesafe tabloları
 
 # --- Harita Altlıkları (Tile Layers) ---
 TILE_LAYERS = [
@@ -393,33 +398,67 @@ def load_road_network(graph_file_path: str, radius_km: float) -> Optional[nx.Mul
         print(f"💥 KRİTİK İNDİRME HATASI: Yol ağı indirilemedi: {e}")
         return None
 
-def get_shortest_path_route(G: nx.MultiDiGraph, origin_coord: Tuple[float, float], dest_coord: Tuple[float, float]) -> Tuple[List[Tuple[float, float]], float]:
+def load_router(graph_file_path: str, radius_km: float) -> Optional[RoutingGraph]:
+    """
+    Derlenmiş (mmap) yol ağını aç. GraphML yoksa önce indirilir; derlenmiş
+    dosya yoksa veya eskiyse bir kez derlenip diske yazılır.
+    """
+    if not os.path.exists(graph_file_path) and load_road_network(graph_file_path, radius_km) is None:
+        return None
+    try:
+        return load_compiled_graph(graph_file_path, name='walking')
+    except Exception as e:
+        print(f"⚠️ Derlenmiş yol ağı açılamadı ({e}), GraphML'den bellekte derleniyor...")
+        road_network = load_road_network(graph_file_path, radius_km)
+        return RoutingGraph.from_networkx(road_network, name='walking') if road_network is not None else None
+
+def get_shortest_path_route(router: RoutingGraph, origin_coord: Tuple[float, float], dest_coord: Tuple[float, float]) -> Tuple[List[Tuple[float, float]], float]:
     try:
-        orig_node, dest_node = ox.nearest_nodes(G, X=[origin_coord[1], dest_coord[1]], Y=[origin_coord[0], dest_coord[0]])
-        route_nodes = nx.shortest_path(G, orig_node, dest_node, weight="length")
-        length = nx.shortest_path_length(G, orig_node, dest_node, weight="length")
-        path_coords = [(G.nodes[n]["y"], G.nodes[n]["x"]) for n in route_nodes]
-        return path_coords, length / 1000.0
-    except (nx.NetworkXNoPath, Exception):
+        # İki uç tek KD-tree sorgusuyla ağa oturtulur
+        (orig_node, dest_node), snap_distances = router.snap([origin_coord[0], dest_coord[0]], [origin_coord[1], dest_coord[1]])
+        if snap_distances.max() > MAX_SNAP_DISTANCE_M:
+            raise ValueError(f"Nokta yol ağına {snap_distances.max():.0f} m uzakta")
+        leg = router.route_leg(int(orig_node), int(dest_node))
+        return leg.geometry, leg.length_m / 1000.0
+    except Exception:
         return [origin_coord, dest_coord], haversine_distance(origin_coord, dest_coord)
 
 # --- TSP, Yükseklik ve Zorluk Fonksiyonları ---
 
-def solve_tsp(G: nx.MultiDiGraph, pois: Dict[str, Tuple[float, float]], start_poi_name: Optional[str]) -> List[str]:
+def build_poi_distance_matrix(router: RoutingGraph, pois: Dict[str, Tuple[float, float]]) -> np.ndarray:
+    """
+    POI'ler arası ağ mesafe matrisi (metre).
+
+    Çift başına arama yapılmaz: kayıtlı POI mesafe tablosu varsa çiftler
+    oradan okunur; kalanlar contraction hierarchy varsa tek çoktan-çoğa
+    sorgu ile, yoksa rota süreç havuzunda (route_workers) tek görevde
+    hesaplanır.
+    Ulaşılamayan veya ağa uzak çiftler kuş uçuşu mesafenin 1.5 katı alınır.
+    """
+    coords = list(pois.values())
+    nodes, snap_distances = router.snap([c[0] for c in coords], [c[1] for c in coords])
+    table = load_table(poi_distance_table_path(POI_DISTANCE_TABLE_DIR, router.name), router)
+    if table is not None:
+        dist_matrix, _ = table.distance_matrix(router, nodes.tolist())
+    elif router.hierarchy is not None:
+        dist_matrix, _ = router.distance_matrix(nodes.tolist())
+    else:
+        dist_matrix, _ = get_route_pool().distance_matrix(router, nodes.tolist())
+
+    off_network = snap_distances > MAX_SNAP_DISTANCE_M
+    dist_matrix[off_network, :] = np.inf
+    dist_matrix[:, off_network] = np.inf
+    for i, j in zip(*np.nonzero(np.isinf(dist_matrix))):
+        dist_matrix[i, j] = haversine_distance(coords[i], coords[j]) * 1000 * 1.5
+    np.fill_diagonal(dist_matrix, 0)
+    return dist_matrix
+
+def solve_tsp(router: RoutingGraph, pois: Dict[str, Tuple[float, float]], start_poi_name: Optional[str]) -> List[str]:
     print("🧠 En optimize rota (TSP) hesaplanıyor...")
     poi_names = list(pois.keys())
     if len(poi_names) < 2: return poi_names
 
-    poi_nodes = {name: ox.nearest_nodes(G, X=coord[1], Y=coord[0]) for name, coord in pois.items()}
-    dist_matrix = np.full((len(poi_names), len(poi_names)), np.inf)
-
-    for i, name1 in enumerate(poi_names):
-        for j, name2 in enumerate(poi_names):
-            if i == j: dist_matrix[i, j] = 0; continue
-            try:
-                dist_matrix[i, j] = nx.shortest_path_length(G, poi_nodes[name1], poi_nodes[name2], weight='length')
-            except nx.NetworkXNoPath:
-                dist_matrix[i, j] = haversine_distance(pois[name1], pois[name2]) * 1000 * 1.5
+    dist_matrix = build_poi_distance_matrix(router, pois)
 
     tsp_path_indices = nx.approximation.traveling_salesman_problem(nx.from_numpy_array(dist_matrix), weight='weight', cycle=False)
     
@@ -550,7 +589,7 @@ def calculate_route_difficulty(elevations: List[float], length_km: float) -> Tup
 
 # --- Harita Oluşturma Fonksiyonları ---
 
-def generate_and_add_route(folium_map: folium.Map, road_network: Optional[nx.MultiDiGraph], ordered_pois: Dict[str, Tuple[float, float]], style: Dict, category_name: str, fetch_elevation: bool):
+def generate_and_add_route(folium_map: folium.Map, road_network: Optional[RoutingGraph], ordered_pois: Dict[str, Tuple[float, float]], style: Dict, category_name: str, fetch_elevation: bool):
     if not ordered_pois or len(ordered_pois) < 2: return 0.0, [], None
     
     poi_coords = list(ordered_pois.values())
@@ -1859,7 +1898,7 @@ def main(args: argparse.Namespace):
         if args.category and args.category not in POI_DATA: 
             print(f"⚠️ Kategori '{args.category}' bulunamadı. Tümü işleniyor.")
 
-        road_network = load_road_network(args.graphfile, args.radius)
+        router = load_router(args.graphfile, args.radius)
         folium_map = folium.Map(location=URGUP_CENTER_LOCATION, zoom_start=DEFAULT_ZOOM_URGUP, tiles=None, max_zoom=20)
         
         poi_layer = folium.FeatureGroup(name="📍 Tüm POI Noktaları", show=True).add_to(folium_map)
@@ -1872,14 +1911,14 @@ def main(args: argparse.Namespace):
             style = CATEGORY_STYLES.get(cat_name, CATEGORY_STYLES["default"])
             print(f"\n🔄 '{style.get('display_name', cat_name)}' işleniyor...")
 
-            ordered_names = solve_tsp(road_network, pois, args.start) if args.optimize and road_network and len(pois) > 1 else list(pois.keys())
-            if args.start and args.start in ordered_names and not (args.optimize and road_network):
+            ordered_names = solve_tsp(router, pois, args.start) if args.optimize and router and len(pois) > 1 else list(pois.keys())
+            if args.start and args.start in ordered_names and not (args.optimize and router):
                 ordered_names.remove(args.start)
                 ordered_names.insert(0, args.start)
             
             ordered_pois_dict = {name: pois[name] for name in ordered_names if name in pois}
 
-            route_len, warnings, layer_var = generate_and_add_route(folium_map, road_network, ordered_pois_dict, style, cat_name, args.elevation)
+            route_len, warnings, layer_var = generate_and_add_route(folium_map, router, ordered_pois_dict, style, cat_name, args.elevation)
             if warnings:
                 for w in warnings: print(f"   - {w}")
             
@@ -0,0 +1,8 @@
+"""
+pytest configuration: importing poi_api in tests must not start the graph
+store watcher or the route worker processes (see readiness.py)
+"""
+
+import os
+
+os.environ.setdefault('POI_BACKGROUND_SERVICES', '0')
@@ -0,0 +1,439 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Contraction Hierarchies
+Yol ağını çevrimdışı olarak "kısayol" kenarlarıyla genişletir ve iki yönlü
+arama ile milisaniyenin altında noktadan noktaya en kısa yol bulur.
+
+Ön işleme düğümleri önem sırasına göre tek tek "büzer": bir düğüm
+kaldırılırken komşuları arasındaki en kısa yollar korunacak şekilde kısayol
+kenarları eklenir. Sorgu, başlangıçtan yalnızca yukarı (daha önemli
+düğümlere), hedeften yalnızca aşağıdan gelen kenarlar üzerinde arar; iki
+arama en üstteki ortak düğümde buluşur. Bulunan yol kısayolların orta
+düğümleri üzerinden orijinal kenarlara açılır.
+"""
+
+import heapq
+import logging
+import math
+import time
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Witness searches stop after settling this many nodes. A lower limit makes
+# preprocessing faster at the cost of a few unnecessary shortcuts; the
+# resulting hierarchy is correct either way.
+WITNESS_SETTLE_LIMIT = 200
+
+# Arrays that make up a hierarchy, in file order
+HIERARCHY_ARRAYS = (
+    'rank',
+    'up_offsets', 'up_targets', 'up_weights', 'up_durations', 'up_middle',
+    'down_offsets', 'down_targets', 'down_weights', 'down_durations', 'down_middle',
+)
+
+
+class ContractionHierarchy:
+    """
+    Shortcut-augmented search graph produced by node contraction.
+
+    Arrays:
+        rank:         int32 contraction order of every node
+        up_offsets:   int64 CSR offsets; edges u -> v with rank[v] > rank[u]
+                      are stored at u
+        down_offsets: int64 CSR offsets; edges u -> v with rank[u] > rank[v]
+                      are stored at v (pointing back to u) for the backward
+                      search
+        *_targets:    int32 neighbour node index
+        *_weights:    float64 edge or shortcut length in meters
+        *_durations:  float64 travel time of the edge or shortcut in seconds
+                      (along the shortest-length path it represents)
+        *_middle:     int32 contracted node a shortcut bypasses, -1 for
+                      original edges
+    """
+
+    def __init__(self, rank: np.ndarray,
+                 up_offsets: np.ndarray, up_targets: np.ndarray, up_weights: np.ndarray,
+                 up_durations: np.ndarray, up_middle: np.ndarray,
+                 down_offsets: np.ndarray, down_targets: np.ndarray, down_weights: np.ndarray,
+                 down_durations: np.ndarray, down_middle: np.ndarray):
+        self.rank = rank
+        self.up_offsets = up_offsets
+        self.up_targets = up_targets
+        self.up_weights = up_weights
+        self.up_durations = up_durations
+        self.up_middle = up_middle
+        self.down_offsets = down_offsets
+        self.down_targets = down_targets
+        self.down_weights = down_weights
+        self.down_durations = down_durations
+        self.down_middle = down_middle
+
+        self._lists: Optional[Tuple[list, list]] = None
+        self._duration_lists: Optional[Tuple[list, list]] = None
+        self._middle: Optional[Dict[Tuple[int, int], int]] = None
+
+    @property
+    def shortcut_count(self) -> int:
+        return int((self.up_middle >= 0).sum() + (self.down_middle >= 0).sum())
+
+    def arrays(self) -> Dict[str, np.ndarray]:
+        return {key: getattr(self, key) for key in HIERARCHY_ARRAYS}
+
+    # ------------------------------------------------------------------
+    # Preprocessing
+    # ------------------------------------------------------------------
+
+    @classmethod
+    def build(cls, offsets: np.ndarray, targets: np.ndarray, lengths: np.ndarray,
+              travel_times: Optional[np.ndarray] = None,
+              witness_settle_limit: int = WITNESS_SETTLE_LIMIT) -> 'ContractionHierarchy':
+        """
+        Contract a CSR graph.
+
+        Shortcuts are chosen by length; their travel time is carried along
+        so many-to-many queries can report both.
+
+        Nodes are ordered lazily by edge difference (shortcuts added minus
+        edges removed), the number of already contracted neighbours and
+        the node's level in the hierarchy; the last two spread contraction
+        evenly over the network and keep the upward search spaces small.
+        """
+        started = time.time()
+        node_count = len(offsets) - 1
+        offsets_list = offsets.tolist()
+        targets_list = targets.tolist()
+        lengths_list = lengths.astype(np.float64).tolist()
+        times_list = (travel_times if travel_times is not None else lengths).astype(np.float64).tolist()
+
+        # Remaining (not yet contracted) graph as forward/backward dicts
+        duration: Dict[Tuple[int, int], float] = {}
+        out_adj: List[Dict[int, float]] = [dict() for _ in range(node_count)]
+        in_adj: List[Dict[int, float]] = [dict() for _ in range(node_count)]
+        for u in range(node_count):
+            for e in range(offsets_list[u], offsets_list[u + 1]):
+                v = targets_list[e]
+                if v == u:
+                    continue
+                w = lengths_list[e]
+                if w < out_adj[u].get(v, math.inf):
+                    out_adj[u][v] = w
+                    in_adj[v][u] = w
+                    duration[(u, v)] = times_list[e]
+
+        middle: Dict[Tuple[int, int], int] = {}
+        deleted = [0] * node_count
+        level = [0] * node_count
+        push, pop = heapq.heappush, heapq.heappop
+
+        def witness_distances(source: int, skip: int, limit: float) -> Dict[int, float]:
+            dist = {source: 0.0}
+            heap = [(0.0, source)]
+            settled = 0
+            while heap:
+                d, u = pop(heap)
+                if d > dist[u]:
+                    continue
+                if d > limit or settled >= witness_settle_limit:
+                    break
+                settled += 1
+                for v, w in out_adj[u].items():
+                    if v == skip:
+                        continue
+                    nd = d + w
+                    if nd < dist.get(v, math.inf):
+                        dist[v] = nd
+                        push(heap, (nd, v))
+            return dist
+
+        def needed_shortcuts(v: int) -> List[Tuple[int, int, float, float]]:
+            incoming, outgoing = in_adj[v], out_adj[v]
+            shortcuts = []
+            if not incoming or not outgoing:
+                return shortcuts
+            max_out = max(outgoing.values())
+            for u, wu in incoming.items():
+                dist = witness_distances(u, v, wu + max_out)
+                for x, wx in outgoing.items():
+                    if x == u:
+                        continue
+                    via = wu + wx
+                    if dist.get(x, math.inf) > via:
+                        shortcuts.append((u, x, via, duration[(u, v)] + duration[(v, x)]))
+            return shortcuts
+
+        def priority(v: int, shortcuts: List[Tuple[int, int, float, float]]) -> int:
+            edge_difference = len(shortcuts) - len(in_adj[v]) - len(out_adj[v])
+            return 2 * edge_difference + deleted[v] + level[v]
+
+        queue = [(priority(v, needed_shortcuts(v)), v) for v in range(node_count)]
+        heapq.heapify(queue)
+
+        rank = np.full(node_count, -1, dtype=np.int32)
+        up_edges: List[Tuple[int, int, float, float, int]] = []
+        down_edges: List[Tuple[int, int, float, float, int]] = []
+        order = 0
+        while queue:
+            _, v = pop(queue)
+            shortcuts = needed_shortcuts(v)
+            current = priority(v, shortcuts)
+            if queue and current > queue[0][0]:
+                push(queue, (current, v))
+                continue
+
+            rank[v] = order
+            order += 1
+            neighbours = set(out_adj[v]) | set(in_adj[v])
+            for x, w in out_adj[v].items():
+                up_edges.append((v, x, w, duration[(v, x)], middle.get((v, x), -1)))
+                del in_adj[x][v]
+            for u, w in in_adj[v].items():
+                down_edges.append((v, u, w, duration[(u, v)], middle.get((u, v), -1)))
+                del out_adj[u][v]
+            out_adj[v] = {}
+            in_adj[v] = {}
+
+            for u, x, w, t in shortcuts:
+                if w < out_adj[u].get(x, math.inf):
+                    out_adj[u][x] = w
+                    in_adj[x][u] = w
+                    duration[(u, x)] = t
+                    middle[(u, x)] = v
+
+            for neighbour in neighbours:
+                deleted[neighbour] += 1
+                level[neighbour] = max(level[neighbour], level[v] + 1)
+
+        hierarchy = cls(rank, **_to_csr(up_edges, node_count, 'up'), **_to_csr(down_edges, node_count, 'down'))
+        logger.info(f"Contracted {node_count} nodes in {time.time() - started:.1f}s "
+                    f"({hierarchy.shortcut_count} shortcuts)")
+        return hierarchy
+
+    # ------------------------------------------------------------------
+    # Query
+    # ------------------------------------------------------------------
+
+    def _get_lists(self) -> Tuple[list, list]:
+        # Per-node lists of (neighbour, weight) pairs; iterating these is
+        # considerably faster from Python than indexing CSR arrays.
+        if self._lists is None:
+            def adjacency(offsets, targets, weights):
+                pairs = list(zip(targets.tolist(), weights.tolist()))
+                bounds = offsets.tolist()
+                return [pairs[bounds[i]:bounds[i + 1]] for i in range(len(bounds) - 1)]
+            self._lists = (
+                adjacency(self.up_offsets, self.up_targets, self.up_weights),
+                adjacency(self.down_offsets, self.down_targets, self.down_weights),
+            )
+        return self._lists
+
+    def _get_middle(self) -> Dict[Tuple[int, int], int]:
+        # Shortcut (u, v) -> bypassed node, keyed in travel direction
+        if self._middle is None:
+            middle = {}
+            for offsets, targets, mids, upward in (
+                    (self.up_offsets, self.up_targets, self.up_middle, True),
+                    (self.down_offsets, self.down_targets, self.down_middle, False)):
+                edges = np.flatnonzero(mids >= 0)
+                owners = np.searchsorted(offsets, edges, side='right') - 1
+                for owner, other, mid in zip(owners.tolist(), targets[edges].tolist(),
+                                             mids[edges].tolist()):
+                    key = (owner, other) if upward else (other, owner)
+                    middle[key] = mid
+            self._middle = middle
+        return self._middle
+
+    def query(self, source: int, target: int) -> Optional[Tuple[List[int], float]]:
+        """
+        Bidirectional upward search between two nodes.
+
+        Returns:
+            (unpacked path node indices, length in meters) or None if the
+            target is unreachable
+        """
+        if source == target:
+            return [source], 0.0
+
+        up, down = self._get_lists()
+        push, pop = heapq.heappush, heapq.heappop
+
+        dist_f = {source: 0.0}
+        dist_b = {target: 0.0}
+        parent_f = {source: -1}
+        parent_b = {target: -1}
+        heap_f = [(0.0, source)]
+        heap_b = [(0.0, target)]
+        best = math.inf
+        meet = -1
+
+        while True:
+            top_f = heap_f[0][0] if heap_f else math.inf
+            top_b = heap_b[0][0] if heap_b else math.inf
+            if min(top_f, top_b) >= best:
+                break
+            if top_f <= top_b:
+                heap, dist, parent, other = heap_f, dist_f, parent_f, dist_b
+                edges, stall_edges = up, down
+            else:
+                heap, dist, parent, other = heap_b, dist_b, parent_b, dist_f
+                edges, stall_edges = down, up
+
+            d, u = pop(heap)
+            if d > dist[u]:
+                continue
+            if u in other and d + other[u] < best:
+                best = d + other[u]
+                meet = u
+
+            # Stall-on-demand: if a higher node already reached by this
+            # search offers a shorter way into u, u cannot be on a shortest
+            # up-down path and its edges need not be relaxed.
+            stalled = False
+            for w, weight in stall_edges[u]:
+                if dist.get(w, math.inf) + weight < d:
+                    stalled = True
+                    break
+            if stalled:
+                continue
+
+            for v, weight in edges[u]:
+                nd = d + weight
+                if nd < dist.get(v, math.inf):
+                    dist[v] = nd
+                    parent[v] = u
+                    push(heap, (nd, v))
+
+        if meet < 0:
+            return None
+
+        packed = []
+        node = meet
+        while node != -1:
+            packed.append(node)
+            node = parent_f[node]
+        packed.reverse()
+        node = parent_b[meet]
+        while node != -1:
+            packed.append(node)
+            node = parent_b[node]
+
+        return self.unpack(packed), best
+
+    def _get_duration_lists(self) -> Tuple[list, list]:
+        # (neighbour, weight, duration) triples for many-to-many queries
+        if self._duration_lists is None:
+            def adjacency(offsets, targets, weights, durations):
+                triples = list(zip(targets.tolist(), weights.tolist(), durations.tolist()))
+                bounds = offsets.tolist()
+                return [triples[bounds[i]:bounds[i + 1]] for i in range(len(bounds) - 1)]
+            self._duration_lists = (
+                adjacency(self.up_offsets, self.up_targets, self.up_weights, self.up_durations),
+                adjacency(self.down_offsets, self.down_targets, self.down_weights, self.down_durations),
+            )
+        return self._duration_lists
+
+    def _upward_space(self, start: int, edges: list, stall_edges: list) -> List[Tuple[int, float, float]]:
+        """
+        Complete upward search from one node.
+
+        Returns (node, distance, duration) for every settled node that is
+        not stalled; these are the only nodes where a shortest up-down
+        path through ``start`` can turn around.
+        """
+        push, pop = heapq.heappush, heapq.heappop
+        dist = {start: 0.0}
+        duration = {start: 0.0}
+        heap = [(0.0, start)]
+        space = []
+        while heap:
+            d, u = pop(heap)
+            if d > dist[u]:
+                continue
+            stalled = False
+            for w, weight, _ in stall_edges[u]:
+                if dist.get(w, math.inf) + weight < d:
+                    stalled = True
+                    break
+            if stalled:
+                continue
+            t = duration[u]
+            space.append((u, d, t))
+            for v, weight, travel in edges[u]:
+                nd = d + weight
+                if nd < dist.get(v, math.inf):
+                    dist[v] = nd
+                    duration[v] = t + travel
+                    push(heap, (nd, v))
+        return space
+
+    def many_to_many(self, sources: List[int], targets: List[int]) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Shortest path lengths and travel times between all source/target
+        pairs with one upward search per source and per target.
+
+        Each target's backward search leaves (target, distance) entries in
+        "buckets" at the nodes it settles; each source's forward search
+        then combines its own distances with the buckets it meets.
+
+        Returns:
+            (lengths in meters, durations in seconds) as arrays of shape
+            (len(sources), len(targets)); unreachable pairs are inf
+        """
+        up, down = self._get_duration_lists()
+        buckets: Dict[int, List[Tuple[int, float, float]]] = {}
+        for j, target in enumerate(targets):
+            for node, d, t in self._upward_space(int(target), down, up):
+                buckets.setdefault(node, []).append((j, d, t))
+
+        lengths = np.full((len(sources), len(targets)), np.inf)
+        durations = np.full((len(sources), len(targets)), np.inf)
+        for i, source in enumerate(sources):
+            best = [math.inf] * len(targets)
+            best_time = [math.inf] * len(targets)
+            for node, d, t in self._upward_space(int(source), up, down):
+                for j, db, tb in buckets.get(node, ()):
+                    if d + db < best[j]:
+                        best[j] = d + db
+                        best_time[j] = t + tb
+            lengths[i] = best
+            durations[i] = best_time
+        return lengths, durations
+
+    def unpack(self, packed: List[int]) -> List[int]:
+        """Expand a path over shortcut edges into original graph nodes"""
+        middle = self._get_middle()
+        path = [packed[0]]
+        for u, v in zip(packed, packed[1:]):
+            stack = [(u, v)]
+            while stack:
+                a, b = stack.pop()
+                m = middle.get((a, b), -1)
+                if m < 0:
+                    path.append(b)
+                else:
+                    stack.append((m, b))
+                    stack.append((a, m))
+        return path
+
+
+def _to_csr(edges: List[Tuple[int, int, float, float, int]], node_count: int,
+            prefix: str) -> Dict[str, np.ndarray]:
+    """Sort (owner, neighbour, weight, duration, middle) tuples into CSR arrays"""
+    if edges:
+        owners, neighbours, weights, durations, mids = (np.asarray(column) for column in zip(*edges))
+    else:
+        owners = neighbours = mids = np.zeros(0, dtype=np.int64)
+        weights = durations = np.zeros(0, dtype=np.float64)
+    order = np.argsort(owners, kind='stable')
+    offsets = np.zeros(node_count + 1, dtype=np.int64)
+    np.cumsum(np.bincount(owners.astype(np.int64), minlength=node_count), out=offsets[1:])
+    return {
+        f'{prefix}_offsets': offsets,
+        f'{prefix}_targets': neighbours[order].astype(np.int32),
+        f'{prefix}_weights': weights[order].astype(np.float64),
+        f'{prefix}_durations': durations[order].astype(np.float64),
+        f'{prefix}_middle': mids[order].astype(np.int32),
+    }
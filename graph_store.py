@@ -0,0 +1,301 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Graph Deposu
+Yürüyüş ve araç yol ağlarını (derlenmiş routing graph) süreç genelinde
+tutar ve dosyalar değiştiğinde arka planda yeni sürümü yükler.
+
+- İstek thread'i hiçbir zaman GraphML ayrıştırmaz, graph derlemez veya
+  indirmez; yalnızca o anki graph referansını alır (get). İlk yükleme
+  henüz bitmediyse varsayılan olarak beklemez, GraphLoadingError verir
+  (uç noktalar Retry-After ile 503 döner). Süreç açılışında start() ile
+  (readiness.start_background_services) tüm ağlar arka planda önceden
+  yüklenir; get() ve ready() yükleme başlatmaz. ready() hepsi hazır olunca
+  True olur (/ready).
+- İzleyici thread GraphML ve derlenmiş dosyayı stat ile izler. GraphML
+  değişmişse yeniden derler (aynı makinedeki worker'lar arasında dosya
+  kilidiyle tek derleme), derlenmiş dosya değişmişse mmap ile yeniden açar.
+- Yeni graph tamamen hazır olduğunda referans atomik olarak değiştirilir.
+  Devam eden istekler aldıkları eski graph ile biter; eski mmap, son
+  referans bırakılınca kapanır. Yükleme başarısız olursa eski graph
+  kullanılmaya devam eder.
+
+Graph sürümü (kaynak GraphML'in SHA-256 özetinin ilk 12 karakteri) yanıtlarda
+ve /health çıktısında gösterilir.
+"""
+
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from routing_engine import RoutingGraph, compiled_graph_path, load_compiled_graph
+
+try:
+    import fcntl
+except ImportError:  # Windows: compile without the cross-process lock
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+GRAPH_SOURCES = {
+    'walking': os.path.join(BASE_DIR, 'urgup_merkez_walking.graphml'),
+    'driving': os.path.join(BASE_DIR, 'urgup_driving.graphml'),
+}
+DEFAULT_POLL_INTERVAL_S = float(os.getenv('POI_GRAPH_POLL_INTERVAL', '10'))
+# How long get() waits for a graph that is still loading (0: fail fast)
+DEFAULT_WAIT_S = float(os.getenv('POI_GRAPH_WAIT_TIMEOUT', '0'))
+# Suggested client back-off while graphs load (Retry-After header)
+RETRY_AFTER_S = int(os.getenv('POI_GRAPH_RETRY_AFTER', '5'))
+
+
+class GraphUnavailableError(RuntimeError):
+    """No graph of the requested mode has been loaded (yet)"""
+
+
+class GraphLoadingError(GraphUnavailableError):
+    """The graph is still being loaded in the background; retry shortly"""
+
+    retry_after_s = RETRY_AFTER_S
+
+
+def _signature(path: str) -> Optional[Tuple[int, int, int]]:
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return (st.st_ino, st.st_size, st.st_mtime_ns)
+
+
+@contextmanager
+def compile_lock(compiled_path: str):
+    """Exclusive lock so that only one worker process compiles a changed GraphML"""
+    if fcntl is None:
+        yield
+        return
+    with open(compiled_path + '.lock', 'a') as lock_file:
+        fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
+
+
+class _GraphEntry:
+    def __init__(self, name: str, source_path: str, prepare: Optional[Callable[[], Any]]):
+        self.name = name
+        self.source_path = source_path
+        self.compiled_path = compiled_graph_path(source_path)
+        self.prepare = prepare
+        self.graph: Optional[RoutingGraph] = None
+        self.signature = None
+        self.failed_signature = None
+        self.error: Optional[str] = None
+        self.loaded_at: Optional[str] = None
+        self.load_seconds: Optional[float] = None
+        self.reloads = 0
+        self.attempted = threading.Event()
+
+    def current_signature(self):
+        return (_signature(self.source_path), _signature(self.compiled_path))
+
+
+class GraphStore:
+    """
+    Süreç genelinde, sürümlü ve sıcak yeniden yüklenebilen graph deposu.
+
+    Args:
+        poll_interval_s: İzleyici thread'in dosyaları kontrol etme aralığı
+        wait_s: get() çağrısının ilk yüklemeyi bekleyeceği varsayılan süre
+    """
+
+    def __init__(self, poll_interval_s: float = DEFAULT_POLL_INTERVAL_S,
+                 wait_s: float = DEFAULT_WAIT_S):
+        self.poll_interval_s = poll_interval_s
+        self.wait_s = wait_s
+        self._entries: Dict[str, _GraphEntry] = {}
+        self._lock = threading.Lock()
+        self._refresh_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def register(self, name: str, source_path: str,
+                 prepare: Optional[Callable[[], Any]] = None):
+        """
+        Bir ağı depoya ekle (aynı isim yeniden kaydedilirse yolu değişir).
+
+        Args:
+            name: Ulaşım modu ('walking', 'driving')
+            source_path: GraphML yolu; derlenmiş dosya yanında aranır
+            prepare: Ne GraphML ne derlenmiş dosya varsa izleyici thread'de
+                çağrılır (örneğin ağı indirmek için)
+        """
+        with self._lock:
+            self._entries[name] = _GraphEntry(name, source_path, prepare)
+
+    def start(self):
+        """İzleyici thread'i başlat; ilk turda tüm ağlar yüklenir"""
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name='graph-store-watcher', daemon=True)
+            self._thread.start()
+
+    def stop(self, timeout: Optional[float] = None):
+        self._stop.set()
+        thread = self._thread
+        if thread is not None:
+            thread.join(timeout)
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                self.refresh()
+            except Exception as e:  # the watcher must survive anything
+                logger.error(f"Graph store refresh failed: {e}")
+            self._stop.wait(self.poll_interval_s)
+
+    def get(self, name: str, wait_s: Optional[float] = None) -> RoutingGraph:
+        """
+        Ağın o anki sürümünü döndür; asla yükleme yapmaz, yüklemeyi başlatmaz (bkz. start).
+
+        Raises:
+            GraphLoadingError: İlk yükleme süre içinde bitmediyse
+            GraphUnavailableError: Ağ kayıtlı değilse ya da yüklenemediyse
+        """
+        entry = self._entries.get(name)
+        if entry is None:
+            raise GraphUnavailableError(f"Unknown graph: {name}")
+        graph = entry.graph
+        if graph is not None:
+            return graph
+
+        wait_s = self.wait_s if wait_s is None else wait_s
+        if wait_s > 0:
+            entry.attempted.wait(wait_s)
+        graph = entry.graph
+        if graph is None:
+            if entry.error:
+                raise GraphUnavailableError(f"{name} network not available: {entry.error}")
+            raise GraphLoadingError(f"{name} network is still loading")
+        return graph
+
+    def refresh(self, name: Optional[str] = None) -> List[str]:
+        """
+        Değişen ağları yükle ve yerine koy (izleyici thread'den çağrılır).
+
+        Returns:
+            Yeni sürümü yerine konan ağ isimleri
+        """
+        swapped = []
+        with self._refresh_lock:
+            for entry in list(self._entries.values()):
+                if name is not None and entry.name != name:
+                    continue
+                signature = entry.current_signature()
+                if entry.graph is not None and signature == entry.signature:
+                    continue
+                if signature == entry.failed_signature:
+                    continue  # same broken files as last time; wait for a change
+                if self._load(entry, signature):
+                    swapped.append(entry.name)
+        return swapped
+
+    def _load(self, entry: _GraphEntry, signature) -> bool:
+        started = time.time()
+        try:
+            if signature == (None, None) and entry.prepare is not None:
+                logger.info(f"🔄 {entry.name} network not found, preparing...")
+                entry.prepare()
+                signature = entry.current_signature()
+
+            with compile_lock(entry.compiled_path):
+                graph = load_compiled_graph(entry.source_path, name=entry.name)
+        except Exception as e:
+            entry.error = str(e)
+            entry.failed_signature = signature
+            logger.error(f"❌ Loading {entry.name} network failed: {e}")
+            entry.attempted.set()
+            return False
+
+        previous = entry.graph
+        compiled_signature = _signature(graph.path)
+        if previous is not None and entry.signature and compiled_signature == entry.signature[1]:
+            # Source touched but the compiled graph is unchanged: keep the open one
+            entry.signature = (signature[0], compiled_signature)
+            return False
+
+        with self._lock:
+            entry.graph = graph
+            entry.signature = (signature[0], compiled_signature)
+            entry.failed_signature = None
+            entry.error = None
+            entry.loaded_at = datetime.now().isoformat()
+            entry.load_seconds = round(time.time() - started, 3)
+            entry.reloads += previous is not None
+        entry.attempted.set()
+
+        if previous is None:
+            logger.info(f"✅ {entry.name} network loaded: version {graph.version}, "
+                        f"{graph.node_count} nodes, {graph.edge_count} edges")
+        else:
+            logger.info(f"🔄 {entry.name} network swapped: {previous.version} -> {graph.version}")
+        return True
+
+    def ready(self, names: Optional[List[str]] = None) -> bool:
+        """True when every (or every named) network has a usable graph"""
+        entries = self._entries
+        return all(name in entries and entries[name].graph is not None for name in (names or list(entries)))
+
+    def peek(self, name: str) -> Optional[RoutingGraph]:
+        """Yüklü graph ya da None; beklemez, yükleme başlatmaz"""
+        entry = self._entries.get(name)
+        return entry.graph if entry else None
+
+    def version(self, name: str) -> Optional[str]:
+        """Yüklü ağın sürümü (yüklenmediyse None)"""
+        graph = self.peek(name)
+        return graph.version if graph is not None else None
+
+    def status(self) -> Dict[str, Dict[str, Any]]:
+        """/health için ağ başına durum bilgisi"""
+        status = {}
+        for name, entry in list(self._entries.items()):
+            graph = entry.graph
+            if graph is not None:
+                state = 'ready'
+            elif entry.error:
+                state = 'unavailable'
+            else:
+                state = 'loading'
+            status[name] = {
+                'state': state,
+                'version': graph.version if graph is not None else None,
+                'nodes': graph.node_count if graph is not None else None,
+                'edges': graph.edge_count if graph is not None else None,
+                'loaded_at': entry.loaded_at,
+                'load_seconds': entry.load_seconds,
+                'reloads': entry.reloads,
+                'error': entry.error,
+            }
+        return status
+
+
+_default_store: Optional[GraphStore] = None
+_default_store_lock = threading.Lock()
+
+
+def get_graph_store() -> GraphStore:
+    """Süreç genelindeki depo; GRAPH_SOURCES ağları kayıtlı olarak oluşturulur"""
+    global _default_store
+    with _default_store_lock:
+        if _default_store is None:
+            _default_store = GraphStore()
+            for name, source_path in GRAPH_SOURCES.items():
+                _default_store.register(name, source_path)
+        return _default_store
@@ -0,0 +1,271 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+İzokron (Erişilebilirlik Alanı)
+Bir noktadan yürüyerek veya araçla N dakika (ya da N metre) içinde
+ulaşılabilen alanı ve POI'leri hesaplar.
+
+- Arama, bütçe aşıldığında duran tek kaynaklı bir Dijkstra'dır
+  (RoutingGraph.reachable); yalnızca erişilen alan taranır.
+- Alan poligonu, erişilen düğümler ile bütçenin bittiği kenar
+  noktalarından (kısmen yürünen kenarlar) içbükey zarf (concave hull)
+  olarak oluşturulur. Shapely yoksa dışbükey zarfa düşülür.
+- Sonuçlar (graph sürümü, mod, oturtulan düğüm, bütçe dilimi) anahtarıyla
+  önbelleğe alınır; bütçe dakika / 100 m dilimlerine yukarı yuvarlandığı
+  için harita üzerindeki tekrarlı etkileşimler aramayı yeniden çalıştırmaz.
+  Aynı anahtar için eşzamanlı ıskalar tek aramada birleştirilir.
+"""
+
+import math
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from request_coalescing import SingleFlight
+from routing_engine import RoutingGraph
+
+try:
+    import shapely
+except ImportError:  # pragma: no cover - shapely comes with osmnx
+    shapely = None
+
+try:
+    from scipy.spatial import ConvexHull
+except ImportError:  # pragma: no cover
+    ConvexHull = None
+
+# Budgets are rounded up to these steps so nearby requests share a result
+TIME_BUCKET_S = 60
+DISTANCE_BUCKET_M = 100
+MAX_DURATION_S = 2 * 3600
+MAX_LENGTH_M = 50000
+
+# shapely.concave_hull ratio: 0 follows the points tightly, 1 is the convex hull
+HULL_RATIO = 0.2
+# Hull input points are deduplicated on this grid (degrees, about 5 m)
+HULL_GRID_DEG = 5e-5
+
+
+def budget_bucket(value: float, bucket: float) -> float:
+    """Round a budget up to its cache bucket"""
+    return math.ceil(value / bucket - 1e-9) * bucket
+
+
+@dataclass
+class Isochrone:
+    """Area reachable from one node within a budget"""
+    mode: str
+    graph_version: str
+    source: int
+    metric: str                  # 'duration' (seconds) or 'length' (meters)
+    budget: float
+    nodes: np.ndarray            # reached node indices
+    lengths: np.ndarray          # meters, per reached node
+    durations: np.ndarray        # seconds, per reached node
+    polygon: List[List[float]]   # outer ring as [lng, lat] pairs (GeoJSON order)
+    compute_ms: float = 0.0
+    _order: Optional[np.ndarray] = field(default=None, repr=False)
+
+    def lookup(self, nodes) -> Tuple[np.ndarray, np.ndarray]:
+        """(lengths, durations) for arbitrary nodes; inf where not reached"""
+        nodes = np.asarray(nodes, dtype=np.int64)
+        lengths = np.full(len(nodes), np.inf)
+        durations = np.full(len(nodes), np.inf)
+        if not len(self.nodes):
+            return lengths, durations
+        if self._order is None:
+            self._order = np.argsort(self.nodes)
+        sorted_nodes = self.nodes[self._order]
+        position = np.minimum(np.searchsorted(sorted_nodes, nodes), len(sorted_nodes) - 1)
+        found = sorted_nodes[position] == nodes
+        index = self._order[position[found]]
+        lengths[found] = self.lengths[index]
+        durations[found] = self.durations[index]
+        return lengths, durations
+
+    def geojson(self) -> Optional[Dict[str, Any]]:
+        if len(self.polygon) < 4:
+            return None
+        return {'type': 'Polygon', 'coordinates': [self.polygon]}
+
+
+def frontier_points(graph: RoutingGraph, nodes: np.ndarray, costs: np.ndarray,
+                    budget: float, by_time: bool) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Points where the budget runs out along edges leaving the reached area
+    (interpolated on the straight line between the edge's end nodes).
+
+    Returns:
+        (lats, lngs)
+    """
+    starts = graph.offsets[nodes].astype(np.int64)
+    counts = graph.offsets[nodes + 1].astype(np.int64) - starts
+    total = int(counts.sum())
+    if not total:
+        return np.empty(0), np.empty(0)
+    first = np.cumsum(counts) - counts
+    edges = np.repeat(starts - first, counts) + np.arange(total)
+    sources = np.repeat(nodes, counts)
+    remaining = np.repeat(budget - costs, counts)
+    weights = (graph.travel_times if by_time else graph.lengths)[edges].astype(np.float64)
+
+    partial = remaining < weights
+    fraction = remaining[partial] / weights[partial]
+    u, v = sources[partial], graph.targets[edges[partial]]
+    lats = graph.node_y[u] + fraction * (graph.node_y[v] - graph.node_y[u])
+    lngs = graph.node_x[u] + fraction * (graph.node_x[v] - graph.node_x[u])
+    return lats, lngs
+
+
+def hull_polygon(lats: np.ndarray, lngs: np.ndarray, ratio: float = HULL_RATIO) -> List[List[float]]:
+    """Closed outer ring ([lng, lat] pairs) around the points; empty when degenerate"""
+    points = np.unique(np.round(np.c_[lngs, lats] / HULL_GRID_DEG).astype(np.int64), axis=0) * HULL_GRID_DEG
+    if len(points) < 3:
+        return []
+
+    if shapely is not None:
+        hull = shapely.concave_hull(shapely.MultiPoint(points), ratio=ratio)
+        if hull.geom_type != 'Polygon':
+            return []
+        return np.round(np.asarray(hull.exterior.coords), 6).tolist()
+
+    if ConvexHull is None:  # pragma: no cover
+        return []
+    try:
+        vertices = ConvexHull(points).vertices
+    except Exception:  # collinear points
+        return []
+    ring = points[np.append(vertices, vertices[0])]
+    return np.round(ring, 6).tolist()
+
+
+def compute_isochrone(graph: RoutingGraph, source: int, max_duration_s: Optional[float] = None,
+                      max_length_m: Optional[float] = None, with_polygon: bool = True,
+                      reachable: Optional[Callable] = None) -> Isochrone:
+    """
+    Bounded search from ``source`` plus (unless with_polygon is False) the area polygon.
+
+    ``reachable(graph, source, max_duration_s=, max_length_m=)`` runs the
+    search (e.g. RouteWorkerPool.reachable); graph.reachable by default.
+    """
+    started = time.perf_counter()
+    by_time = max_duration_s is not None
+    budget = float(max_duration_s if by_time else max_length_m)
+    if reachable is None:
+        nodes, lengths, durations = graph.reachable(source, max_duration_s=max_duration_s,
+                                                    max_length_m=max_length_m)
+    else:
+        nodes, lengths, durations = reachable(graph, source, max_duration_s=max_duration_s,
+                                              max_length_m=max_length_m)
+
+    polygon = []
+    if with_polygon:
+        edge_lats, edge_lngs = frontier_points(graph, nodes, durations if by_time else lengths, budget, by_time)
+        polygon = hull_polygon(np.concatenate((graph.node_y[nodes], edge_lats)),
+                               np.concatenate((graph.node_x[nodes], edge_lngs)))
+    return Isochrone(
+        mode=graph.name,
+        graph_version=graph.version,
+        source=int(source),
+        metric='duration' if by_time else 'length',
+        budget=budget,
+        # Compact dtypes: cached driving isochrones can cover the whole graph
+        nodes=nodes.astype(np.int32),
+        lengths=lengths.astype(np.float32),
+        durations=durations.astype(np.float32),
+        polygon=polygon,
+        compute_ms=round((time.perf_counter() - started) * 1000, 1),
+    )
+
+
+class IsochroneCache:
+    """
+    Bounded LRU cache of isochrones.
+
+    Keys are (graph version, mode, snapped node, metric, budget bucket);
+    budgets are rounded up to TIME_BUCKET_S / DISTANCE_BUCKET_M first, so
+    the cached area is never smaller than the one requested.
+
+    With ``with_polygon=False`` only travel costs are kept (no hull), for
+    callers that just look up nodes (e.g. location-aware recommendations).
+    ``reachable`` is passed to compute_isochrone. Concurrent misses on the
+    same key wait for one search instead of each running their own.
+    """
+
+    def __init__(self, max_entries: int = 128, with_polygon: bool = True,
+                 reachable: Optional[Callable] = None):
+        self.max_entries = max_entries
+        self.with_polygon = with_polygon
+        self.reachable = reachable
+        self._entries: 'OrderedDict[Tuple[str, str, int, str, float], Isochrone]' = OrderedDict()
+        self._lock = threading.Lock()
+        self._in_flight = SingleFlight()
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.evictions = 0
+
+    def get(self, graph: RoutingGraph, source: int, max_duration_s: Optional[float] = None,
+            max_length_m: Optional[float] = None) -> Tuple[Isochrone, bool]:
+        """
+        Return (isochrone, cache hit), computing it on a miss.
+
+        Raises:
+            ValueError: Neither or both budgets given
+        """
+        if (max_duration_s is None) == (max_length_m is None):
+            raise ValueError("Give exactly one of max_duration_s and max_length_m")
+        if max_duration_s is not None:
+            max_duration_s = budget_bucket(max_duration_s, TIME_BUCKET_S)
+            key = (graph.version, graph.name, int(source), 'duration', max_duration_s)
+        else:
+            max_length_m = budget_bucket(max_length_m, DISTANCE_BUCKET_M)
+            key = (graph.version, graph.name, int(source), 'length', max_length_m)
+
+        with self._lock:
+            isochrone = self._entries.get(key)
+            if isochrone is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return isochrone, True
+            self.misses += 1
+
+        def compute():
+            isochrone = compute_isochrone(graph, source, max_duration_s=max_duration_s,
+                                          max_length_m=max_length_m, with_polygon=self.with_polygon,
+                                          reachable=self.reachable)
+            with self._lock:
+                self._entries[key] = isochrone
+                self._entries.move_to_end(key)
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+                    self.evictions += 1
+            return isochrone
+
+        # Computed outside the lock so misses on other keys do not serialise
+        isochrone, shared = self._in_flight.do(key, compute)
+        if shared:
+            with self._lock:
+                self.coalesced += 1
+        return isochrone, False
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'size': len(self._entries),
+                'max_entries': self.max_entries,
+                'hits': self.hits,
+                'misses': self.misses,
+                'coalesced': self.coalesced,
+                'evictions': self.evictions,
+                'hit_rate': round(self.hits / lookups, 4) if lookups else 0.0,
+            }
@@ -0,0 +1,153 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+POI Değişiklik Bildirimleri
+pois ve poi_ratings tablolarındaki satır değişikliklerini Postgres
+LISTEN/NOTIFY ile dinler ve bellekteki önbelleklere (ör. öneri puan
+matrisi) değişen POI id'lerini iletir.
+
+Tablolardaki tetikleyiciler (poi_database_adapter.install_poi_change_notifications)
+her satır değişikliğinde 'tablo:poi_id' yükü ile bildirim gönderir; yazan
+süreç hangisi olursa olsun (API, admin betikleri, diğer worker'lar) her
+worker'ın dinleyicisi değişikliği alır. Kısa süre içinde gelen bildirimler
+birleştirilip tek seferde iletilir.
+
+Bağlantı koparsa yeniden bağlanılır; aradaki bildirimler kaçmış olabileceği
+için aboneler tam yenileme (None) ile çağrılır.
+"""
+
+import logging
+import os
+import select
+import threading
+import time
+from typing import Any, Callable, List, Optional, Set
+
+logger = logging.getLogger(__name__)
+
+DEBOUNCE_S = float(os.getenv('POI_CHANGE_DEBOUNCE_S', '0.2'))
+RECONNECT_S = float(os.getenv('POI_CHANGE_RECONNECT_S', '5'))
+
+
+def parse_change(payload: str) -> Optional[int]:
+    """POI id of a 'table:poi_id' notification payload; None if unreadable"""
+    try:
+        return int(payload.rsplit(':', 1)[1])
+    except (IndexError, ValueError):
+        return None
+
+
+class PoiChangeListener:
+    """
+    Dedicated LISTEN connection in a daemon thread.
+
+    Subscribers are called from the listener thread with the set of changed
+    POI ids, or with None when every cached POI must be treated as changed
+    (after connecting, or for an unreadable notification).
+    """
+
+    def __init__(self, connect: Callable[[], Any], channel: str,
+                 setup: Optional[Callable[[Any], None]] = None,
+                 debounce_s: float = DEBOUNCE_S, reconnect_s: float = RECONNECT_S):
+        self.connect = connect
+        self.channel = channel
+        self.setup = setup
+        self.debounce_s = debounce_s
+        self.reconnect_s = reconnect_s
+        self._subscribers: List[Callable[[Optional[Set[int]]], None]] = []
+        self._thread: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+        self.connected = threading.Event()
+        self.notifications = 0
+        self.batches = 0
+        self.reconnects = 0
+
+    def subscribe(self, callback: Callable[[Optional[Set[int]]], None]):
+        self._subscribers.append(callback)
+
+    def start(self):
+        """Start the listener thread (once)"""
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._stop.clear()
+                self._thread = threading.Thread(target=self._run, name='poi-change-listener', daemon=True)
+                self._thread.start()
+
+    def stop(self, timeout: float = 5.0):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def _publish(self, poi_ids: Optional[Set[int]]):
+        self.batches += 1
+        for callback in self._subscribers:
+            try:
+                callback(poi_ids)
+            except Exception:
+                logger.exception("⚠️ POI change subscriber failed")
+
+    def _run(self):
+        while not self._stop.is_set():
+            conn = None
+            try:
+                conn = self.connect()
+                conn.autocommit = True
+                if self.setup is not None:
+                    self.setup(conn)
+                with conn.cursor() as cur:
+                    cur.execute(f'LISTEN {self.channel}')
+                self.connected.set()
+                logger.info(f"📡 Listening for POI changes on '{self.channel}'")
+                # Changes made before LISTEN (or while disconnected) were not seen
+                self._publish(None)
+                self._listen(conn)
+            except Exception as e:
+                logger.warning(f"⚠️ POI change listener disconnected: {e}")
+            finally:
+                self.connected.clear()
+                if conn is not None:
+                    try:
+                        conn.close()
+                    except Exception:
+                        pass
+            if self._stop.wait(self.reconnect_s):
+                break
+            self.reconnects += 1
+
+    def _collect(self, conn, changed: Set[int]) -> bool:
+        """Move pending notifications into changed; False if one was unreadable"""
+        readable = True
+        conn.poll()
+        while conn.notifies:
+            notify = conn.notifies.pop(0)
+            self.notifications += 1
+            poi_id = parse_change(notify.payload)
+            if poi_id is None:
+                readable = False
+            else:
+                changed.add(poi_id)
+        return readable
+
+    def _listen(self, conn):
+        while not self._stop.is_set():
+            if not select.select([conn], [], [], 1.0)[0]:
+                continue
+            changed: Set[int] = set()
+            readable = self._collect(conn, changed)
+            # Bulk updates send one notification per row: batch them
+            deadline = time.monotonic() + self.debounce_s
+            while (remaining := deadline - time.monotonic()) > 0:
+                if select.select([conn], [], [], remaining)[0]:
+                    readable = self._collect(conn, changed) and readable
+            if changed or not readable:
+                self._publish(changed if readable else None)
+
+    def stats(self):
+        return {
+            'channel': self.channel,
+            'connected': self.connected.is_set(),
+            'notifications': self.notifications,
+            'batches': self.batches,
+            'reconnects': self.reconnects,
+        }
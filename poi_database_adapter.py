@@ -14,13 +14,114 @@ import logging
 # PostgreSQL imports
 try:
     import psycopg2
-    from psycopg2.extras import RealDictCursor, Json
+    from psycopg2.extras import RealDictCursor, Json, execute_values
     POSTGRES_AVAILABLE = True
 except ImportError:
     POSTGRES_AVAILABLE = False
 
 logger = logging.getLogger(__name__)
 
+# Rating kategorileri: poi_ratings.category değerleri ve poi_rating_pivot kolonları
+RATING_COLUMNS = ('tarihi', 'sanat_kultur', 'doga', 'eglence', 'alisveris',
+                  'spor', 'macera', 'rahatlatici', 'yemek', 'gece_hayati')
+
+
+def install_rating_pivot(conn) -> None:
+    """
+    POI başına tek satır ve kategori başına bir kolon tutan poi_rating_pivot
+    tablosunu, kategori indekslerini ve poi_ratings üzerindeki tetikleyiciyi
+    kur (tekrar çağrılabilir).
+
+    Tetikleyici her poi_ratings değişikliğinde yalnızca ilgili POI'nin
+    satırını yeniden hesaplar; tablo ilk kez oluşturulduğunda mevcut
+    puanlarla doldurulur. Puanı olmayan kategoriler NULL'dur.
+    """
+    pivot_columns = ',\n'.join(
+        f"MAX(CASE WHEN r.category = '{column}' THEN r.rating END) AS {column}" for column in RATING_COLUMNS)
+    column_list = ', '.join(RATING_COLUMNS)
+    with conn.cursor() as cur:
+        cur.execute("SELECT to_regclass('poi_rating_pivot') IS NULL")
+        created = cur.fetchone()[0]
+        column_defs = ''.join(f"{column} INTEGER,\n" for column in RATING_COLUMNS)
+        cur.execute(
+            f"""
+            CREATE TABLE IF NOT EXISTS poi_rating_pivot (
+                poi_id INTEGER PRIMARY KEY REFERENCES pois(id) ON DELETE CASCADE,
+                {column_defs}
+                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            );
+            """
+        )
+        for column in RATING_COLUMNS:
+            cur.execute(
+                f"CREATE INDEX IF NOT EXISTS idx_poi_rating_pivot_{column} "
+                f"ON poi_rating_pivot ({column} DESC) WHERE {column} IS NOT NULL;"
+            )
+        # Silinen POI'nin satırı FK ile silinir; pois'te olmayan POI için satır yazılmaz
+        cur.execute(
+            f"""
+            CREATE OR REPLACE FUNCTION refresh_poi_rating_pivot_row(changed_poi_id INTEGER) RETURNS void AS $$
+            BEGIN
+                -- Aynı POI'yi yazan eşzamanlı işlemler sırayla hesaplar; sonraki
+                -- INSERT öncekinin commit ettiği puanları görür
+                PERFORM pg_advisory_xact_lock(hashtext('poi_rating_pivot'), changed_poi_id);
+                INSERT INTO poi_rating_pivot (poi_id, {column_list}, updated_at)
+                SELECT p.id,
+                       {pivot_columns},
+                       CURRENT_TIMESTAMP
+                FROM pois p
+                LEFT JOIN poi_ratings r ON r.poi_id = p.id
+                WHERE p.id = changed_poi_id
+                GROUP BY p.id
+                ON CONFLICT (poi_id) DO UPDATE SET
+                    {', '.join(f'{column} = EXCLUDED.{column}' for column in RATING_COLUMNS)},
+                    updated_at = EXCLUDED.updated_at;
+            END;
+            $$ LANGUAGE plpgsql;
+
+            CREATE OR REPLACE FUNCTION poi_ratings_refresh_pivot() RETURNS trigger AS $$
+            BEGIN
+                IF TG_OP = 'INSERT' THEN
+                    PERFORM refresh_poi_rating_pivot_row(NEW.poi_id);
+                ELSIF TG_OP = 'DELETE' THEN
+                    PERFORM refresh_poi_rating_pivot_row(OLD.poi_id);
+                ELSE
+                    PERFORM refresh_poi_rating_pivot_row(OLD.poi_id);
+                    IF NEW.poi_id <> OLD.poi_id THEN
+                        PERFORM refresh_poi_rating_pivot_row(NEW.poi_id);
+                    END IF;
+                END IF;
+                RETURN NULL;
+            END;
+            $$ LANGUAGE plpgsql;
+
+            DO $$
+            BEGIN
+                IF NOT EXISTS (SELECT 1 FROM pg_trigger WHERE tgname = 'poi_ratings_refresh_pivot') THEN
+                    CREATE TRIGGER poi_ratings_refresh_pivot
+                    AFTER INSERT OR UPDATE OR DELETE ON poi_ratings
+                    FOR EACH ROW EXECUTE PROCEDURE poi_ratings_refresh_pivot();
+                END IF;
+            END
+            $$;
+            """
+        )
+        if created:
+            cur.execute(
+                f"""
+                INSERT INTO poi_rating_pivot (poi_id, {column_list})
+                SELECT r.poi_id,
+                       {pivot_columns}
+                FROM poi_ratings r
+                JOIN pois p ON p.id = r.poi_id
+                GROUP BY r.poi_id
+                ON CONFLICT (poi_id) DO NOTHING;
+                """
+            )
+            logger.info(f"poi_rating_pivot oluşturuldu ve {cur.rowcount} POI ile dolduruldu")
+    if not conn.autocommit:
+        conn.commit()
+
 
 class POIDatabase(ABC):
     """POI veritabanı için abstract base class"""
@@ -70,6 +171,9 @@ class POIDatabase(ABC):
 
 class PostgreSQLPOIDatabase(POIDatabase):
     """PostgreSQL/PostGIS POI veritabanı adaptörü"""
+
+    # poi_rating_pivot süreç başına bir kez kurulur/kontrol edilir
+    _rating_pivot_installed = False
     
     def __init__(self, connection_string: str):
         """
@@ -105,7 +209,24 @@ class PostgreSQLPOIDatabase(POIDatabase):
                 cur.execute(
                     "CREATE INDEX IF NOT EXISTS idx_poi_ratings_category ON poi_ratings(category);"
                 )
+                # POI'lerin ağa oturtulmuş düğümleri (mod başına bir satır)
+                cur.execute(
+                    """
+                    CREATE TABLE IF NOT EXISTS poi_graph_nodes (
+                        poi_id INTEGER REFERENCES pois(id) ON DELETE CASCADE,
+                        mode VARCHAR(20),
+                        node_id BIGINT NOT NULL,
+                        snap_distance_m REAL NOT NULL,
+                        graph_version VARCHAR(64) NOT NULL,
+                        updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                        PRIMARY KEY (poi_id, mode)
+                    );
+                    """
+                )
                 self.conn.commit()
+            if not PostgreSQLPOIDatabase._rating_pivot_installed:
+                install_rating_pivot(self.conn)
+                PostgreSQLPOIDatabase._rating_pivot_installed = True
             logger.info("PostgreSQL veritabanına bağlandı")
         except Exception as e:
             logger.error(f"PostgreSQL bağlantı hatası: {e}")
@@ -137,6 +258,94 @@ class PostgreSQLPOIDatabase(POIDatabase):
         
         return {row['name']: (row['lat'], row['lon']) for row in results}
     
+    def get_active_poi_locations(self) -> Dict[int, Tuple[float, float]]:
+        """Tüm aktif POI'lerin konumları: {id: (lat, lon)}"""
+        if not self.conn:
+            raise RuntimeError("Veritabanı bağlantısı yok")
+            
+        query = """
+            SELECT 
+                id,
+                ST_Y(location::geometry) as lat,
+                ST_X(location::geometry) as lon
+            FROM pois
+            WHERE is_active = true
+        """
+        
+        with self.conn.cursor(cursor_factory=RealDictCursor) as cur:
+            cur.execute(query)
+            results = cur.fetchall()
+        
+        return {row['id']: (row['lat'], row['lon']) for row in results}
+    
+    def get_poi_waypoints(self, poi_ids: List[int]) -> Dict[int, Dict[str, Any]]:
+        """
+        Rota waypoint'i olarak kullanılacak POI'ler: ad, konum ve saklanan
+        graph düğümleri {id: {'name', 'lat', 'lon', 'graph_nodes': {mode: {...}}}}
+        """
+        if not self.conn:
+            raise RuntimeError("Veritabanı bağlantısı yok")
+
+        query = """
+            SELECT
+                p.id,
+                p.name,
+                ST_Y(p.location::geometry) as lat,
+                ST_X(p.location::geometry) as lon,
+                n.mode,
+                n.node_id,
+                n.snap_distance_m,
+                n.graph_version
+            FROM pois p
+            LEFT JOIN poi_graph_nodes n ON n.poi_id = p.id
+            WHERE p.id = ANY(%s) AND p.is_active = true
+        """
+
+        with self.conn.cursor(cursor_factory=RealDictCursor) as cur:
+            cur.execute(query, (list(poi_ids),))
+            results = cur.fetchall()
+
+        waypoints: Dict[int, Dict[str, Any]] = {}
+        for row in results:
+            poi = waypoints.setdefault(row['id'], {
+                'name': row['name'], 'lat': row['lat'], 'lon': row['lon'], 'graph_nodes': {}
+            })
+            if row['mode']:
+                poi['graph_nodes'][row['mode']] = {
+                    'node_id': row['node_id'],
+                    'snap_distance_m': row['snap_distance_m'],
+                    'graph_version': row['graph_version'],
+                }
+        return waypoints
+
+    def save_poi_graph_nodes(self, mode: str, nodes: Dict[int, Dict[str, Any]]) -> int:
+        """
+        POI'lerin ağ düğümlerini toplu olarak yaz (varsa güncelle)
+
+        Args:
+            mode: Ulaşım modu ('walking', 'driving')
+            nodes: {poi_id: {'node_id', 'snap_distance_m', 'graph_version'}}
+        """
+        if not self.conn:
+            raise RuntimeError("Veritabanı bağlantısı yok")
+        if not nodes:
+            return 0
+
+        rows = [(int(poi_id), mode, int(node['node_id']), float(node['snap_distance_m']), node['graph_version'])
+                for poi_id, node in nodes.items()]
+        with self.conn.cursor() as cur:
+            execute_values(cur, """
+                INSERT INTO poi_graph_nodes (poi_id, mode, node_id, snap_distance_m, graph_version)
+                VALUES %s
+                ON CONFLICT (poi_id, mode) DO UPDATE SET
+                    node_id = EXCLUDED.node_id,
+                    snap_distance_m = EXCLUDED.snap_distance_m,
+                    graph_version = EXCLUDED.graph_version,
+                    updated_at = CURRENT_TIMESTAMP
+            """, rows, page_size=1000)
+            self.conn.commit()
+        return len(rows)
+
     def get_poi_details(self, poi_id: int) -> Optional[Dict[str, Any]]:
         """POI detaylarını getir"""
         if not self.conn:
@@ -203,12 +412,12 @@ class PostgreSQLPOIDatabase(POIDatabase):
         }
 
     def get_poi_ratings(self, poi_id: int) -> Dict[str, int]:
-        """Belirli bir POI'nin tüm puanlarını döndür"""
-        query = "SELECT category, rating FROM poi_ratings WHERE poi_id = %s"
-        with self.conn.cursor() as cur:
+        """Belirli bir POI'nin tüm puanlarını döndür (puanı olmayan kategoriler hariç)"""
+        query = f"SELECT {', '.join(RATING_COLUMNS)} FROM poi_rating_pivot WHERE poi_id = %s"
+        with self.conn.cursor(cursor_factory=RealDictCursor) as cur:
             cur.execute(query, (poi_id,))
-            rows = cur.fetchall()
-        return {row[0]: row[1] for row in rows}
+            row = cur.fetchone()
+        return {column: value for column, value in (row or {}).items() if value is not None}
 
     def update_poi_ratings(self, poi_id: int, ratings: Dict[str, int]) -> None:
         """POI ratinglerini upsert et"""
@@ -414,23 +623,27 @@ class PostgreSQLPOIDatabase(POIDatabase):
         if not self.conn:
             raise RuntimeError("Veritabanı bağlantısı yok")
 
-        base_query = """
+        # Puanlar aynı sorguda, POI başına tek satırlık pivot tablodan gelir
+        rating_columns = ', '.join(f"r.{column}" for column in RATING_COLUMNS)
+        base_query = f"""
             SELECT
-                id,
-                name,
-                category,
-                ST_Y(location::geometry) as latitude,
-                ST_X(location::geometry) as longitude,
-                description
-            FROM pois
-            WHERE is_active = true
+                p.id,
+                p.name,
+                p.category,
+                ST_Y(p.location::geometry) as latitude,
+                ST_X(p.location::geometry) as longitude,
+                p.description,
+                {rating_columns}
+            FROM pois p
+            LEFT JOIN poi_rating_pivot r ON r.poi_id = p.id
+            WHERE p.is_active = true
         """
         params: List[Any] = []
         if category:
-            base_query += " AND category = %s"
+            base_query += " AND p.category = %s"
             params.append(category)
 
-        base_query += " ORDER BY name"
+        base_query += " ORDER BY p.name"
 
         with self.conn.cursor(cursor_factory=RealDictCursor) as cur:
             cur.execute(base_query, params)
@@ -448,15 +661,11 @@ class PostgreSQLPOIDatabase(POIDatabase):
                 "description": row["description"],
             }
             
-            # Rating sistemini ayrı sorgu ile al
-            poi_ratings = self.get_poi_ratings(row["id"])
-            # Default ratings ile merge et ama sadece mevcut rating'leri göster
+            # Sadece 0'dan büyük rating'leri göster, diğerleri için default 0 kullan
             default_ratings = self.get_default_ratings()
-            if poi_ratings:
-                # Sadece 0'dan büyük rating'leri göster, diğerleri için default 0 kullan
-                for category, value in poi_ratings.items():
-                    if value > 0:
-                        default_ratings[category] = value
+            for column in RATING_COLUMNS:
+                if row[column] is not None and row[column] > 0:
+                    default_ratings[column] = row[column]
             poi_data['ratings'] = default_ratings
             
             formatted.append(poi_data)
@@ -464,6 +673,56 @@ class PostgreSQLPOIDatabase(POIDatabase):
         return formatted
 
 
+# pois / poi_ratings satır değişikliklerinin bildirildiği kanal
+POI_CHANGE_CHANNEL = 'poi_changes'
+
+
+def install_poi_change_notifications(conn) -> None:
+    """
+    pois ve poi_ratings tablolarına, her satır değişikliğinde
+    POI_CHANGE_CHANNEL kanalına 'tablo:poi_id' bildirimi gönderen
+    tetikleyicileri kur (tekrar çağrılabilir).
+
+    Bildirimler işlem commit edilince iletilir; aynı işlemdeki özdeş
+    bildirimleri Postgres tek bildirime indirir.
+    """
+    with conn.cursor() as cur:
+        cur.execute(
+            f"""
+            CREATE OR REPLACE FUNCTION notify_poi_change() RETURNS trigger AS $$
+            DECLARE
+                changed JSONB;
+            BEGIN
+                IF TG_OP = 'DELETE' THEN
+                    changed := to_jsonb(OLD);
+                ELSE
+                    changed := to_jsonb(NEW);
+                END IF;
+                PERFORM pg_notify('{POI_CHANGE_CHANNEL}',
+                                  TG_TABLE_NAME || ':' || COALESCE(changed->>'poi_id', changed->>'id'));
+                RETURN NULL;
+            END;
+            $$ LANGUAGE plpgsql;
+            """
+        )
+        for table in ('pois', 'poi_ratings'):
+            cur.execute(
+                f"""
+                DO $$
+                BEGIN
+                    IF NOT EXISTS (SELECT 1 FROM pg_trigger WHERE tgname = '{table}_notify_change') THEN
+                        CREATE TRIGGER {table}_notify_change
+                        AFTER INSERT OR UPDATE OR DELETE ON {table}
+                        FOR EACH ROW EXECUTE PROCEDURE notify_poi_change();
+                    END IF;
+                END
+                $$;
+                """
+            )
+    if not conn.autocommit:
+        conn.commit()
+
+
 class POIDatabaseFactory:
     """POI veritabanı factory"""
     
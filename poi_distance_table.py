@@ -0,0 +1,332 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+POI Mesafe Tablosu
+Aktif POI'ler arasındaki ağ mesafesi ve sürelerini ulaşım moduna göre
+önceden hesaplayıp yerel ikili dosyada (npz) saklar.
+
+Tablo toplu olarak tek bir çoktan-çoğa arama ile kurulur. Bir POI eklenince
+veya konumu değişince yalnızca o POI'nin satırı ve sütunu yeniden hesaplanır;
+silinen POI'nin satırı ve sütunu çıkarılır; bu aramalar sırasında okuyucular
+beklemez. Tablo, kurulduğu graph sürümüne bağlıdır; graph yeniden derlenirse
+tablo eski sayılır.
+
+Rota matrisi ve sıra optimizasyonu önce bu tabloya bakar, tabloda olmayan
+noktalar için canlı aramaya düşer.
+"""
+
+import logging
+import os
+import threading
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Tables loaded through load_table(), keyed by file path
+_loaded_tables: Dict[str, 'PoiDistanceTable'] = {}
+_loaded_tables_lock = threading.Lock()
+
+
+def poi_distance_table_path(directory: str, name: str) -> str:
+    """Table file of one transport mode"""
+    return os.path.join(directory, f'poi_distances_{name}.npz')
+
+
+def _file_signature(path: str) -> Optional[Tuple[int, int]]:
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return (st.st_size, st.st_mtime_ns)
+
+
+class PoiDistanceTable:
+    """
+    Network distances between POIs of one transport mode.
+
+    Arrays:
+        poi_ids:   POI ids as strings (database ids and JSON uuids alike)
+        lats/lngs: POI coordinates the row was computed for
+        nodes:     int64 snapped graph node, -1 for POIs off the network
+        lengths:   float64 n x n meters, inf where unreachable
+        durations: float64 n x n seconds, inf where unreachable
+    """
+
+    def __init__(self, name: str, graph_version: str, max_snap_distance_m: float,
+                 poi_ids=(), lats=(), lngs=(), nodes=(), lengths=None, durations=None):
+        self.name = name
+        self.graph_version = graph_version
+        self.max_snap_distance_m = float(max_snap_distance_m)
+        self.poi_ids = [str(poi_id) for poi_id in poi_ids]
+        self.lats = np.asarray(lats, dtype=np.float64)
+        self.lngs = np.asarray(lngs, dtype=np.float64)
+        self.nodes = np.asarray(nodes, dtype=np.int64)
+        size = len(self.poi_ids)
+        self.lengths = np.asarray(lengths, dtype=np.float64) if lengths is not None else np.zeros((size, size))
+        self.durations = np.asarray(durations, dtype=np.float64) if durations is not None else np.zeros((size, size))
+        self.path: Optional[str] = None
+        self._signature = None
+        # _lock guards the arrays for readers; _update_lock serialises writers
+        self._lock = threading.Lock()
+        self._update_lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self._reindex()
+
+    def _reindex(self):
+        self._rows = {poi_id: row for row, poi_id in enumerate(self.poi_ids)}
+        # Several POIs may snap to the same node; any of their rows will do
+        self._node_rows = {int(node): row for row, node in enumerate(self.nodes.tolist()) if node >= 0}
+
+    def __len__(self) -> int:
+        return len(self.poi_ids)
+
+    def __contains__(self, poi_id) -> bool:
+        return str(poi_id) in self._rows
+
+    # ------------------------------------------------------------------
+    # Construction and maintenance
+    # ------------------------------------------------------------------
+
+    @classmethod
+    def build(cls, graph, pois: Dict[Any, Tuple[float, float]], max_snap_distance_m: float,
+              matrix: Optional[Callable] = None) -> 'PoiDistanceTable':
+        """
+        Compute the full table with one many-to-many search
+        (``matrix(nodes)``, graph.distance_matrix by default).
+        """
+        poi_ids = list(pois)
+        lats = np.array([float(pois[poi_id][0]) for poi_id in poi_ids])
+        lngs = np.array([float(pois[poi_id][1]) for poi_id in poi_ids])
+        table = cls(graph.name, graph.version, max_snap_distance_m, poi_ids, lats, lngs,
+                    nodes=np.full(len(poi_ids), -1, dtype=np.int64),
+                    lengths=np.full((len(poi_ids), len(poi_ids)), np.inf),
+                    durations=np.full((len(poi_ids), len(poi_ids)), np.inf))
+        if not poi_ids:
+            return table
+
+        table.nodes = table._snap(graph, lats, lngs)
+        on_network = np.flatnonzero(table.nodes >= 0)
+        if on_network.size:
+            lengths, durations = (matrix or graph.distance_matrix)(table.nodes[on_network].tolist())
+            block = np.ix_(on_network, on_network)
+            table.lengths[block] = lengths
+            table.durations[block] = durations
+        np.fill_diagonal(table.lengths, 0.0)
+        np.fill_diagonal(table.durations, 0.0)
+        table._reindex()
+        logger.info(f"POI distance table ({graph.name}): {len(poi_ids)} POIs, "
+                    f"{int(on_network.size)} on the network")
+        return table
+
+    def _snap(self, graph, lats, lngs) -> np.ndarray:
+        nodes, distances = graph.snap(lats, lngs)
+        return np.where(distances <= self.max_snap_distance_m, nodes, -1).astype(np.int64)
+
+    def upsert(self, graph, poi_id, lat: float, lng: float, matrix: Optional[Callable] = None) -> bool:
+        """
+        Add a POI or move it, recomputing only its row and column
+        (``matrix(sources, targets)``, graph.distance_matrix by default).
+
+        The searches run without the read lock, so lookups are not blocked
+        while a POI is edited; the lock is taken only to splice the row in.
+
+        Returns:
+            False when the POI is already stored at these coordinates
+        """
+        poi_id = str(poi_id)
+        lat, lng = float(lat), float(lng)
+        with self._update_lock:
+            row = self._rows.get(poi_id)
+            if row is not None and self.lats[row] == lat and self.lngs[row] == lng:
+                return False
+
+            # Writers are serialised, so the other rows stay as they are until the splice
+            node = int(self._snap(graph, [lat], [lng])[0])
+            others = [r for r in range(len(self.poi_ids)) if r != row]
+            other_nodes = self.nodes[others]
+            out_lengths = np.full(len(others), np.inf)
+            out_durations = np.full(len(others), np.inf)
+            in_lengths = np.full(len(others), np.inf)
+            in_durations = np.full(len(others), np.inf)
+            reachable = np.flatnonzero(other_nodes >= 0)
+            if node >= 0 and reachable.size:
+                matrix = matrix or graph.distance_matrix
+                targets = other_nodes[reachable].tolist()
+                lengths, durations = matrix([node], targets)
+                out_lengths[reachable], out_durations[reachable] = lengths[0], durations[0]
+                lengths, durations = matrix(targets, [node])
+                in_lengths[reachable], in_durations[reachable] = lengths[:, 0], durations[:, 0]
+
+            with self._lock:
+                if row is None:
+                    row = len(self.poi_ids)
+                    self.poi_ids.append(poi_id)
+                    self.lats = np.append(self.lats, lat)
+                    self.lngs = np.append(self.lngs, lng)
+                    self.nodes = np.append(self.nodes, node)
+                    self.lengths = np.pad(self.lengths, ((0, 1), (0, 1)), constant_values=np.inf)
+                    self.durations = np.pad(self.durations, ((0, 1), (0, 1)), constant_values=np.inf)
+                else:
+                    self.lats[row], self.lngs[row], self.nodes[row] = lat, lng, node
+
+                self.lengths[row, others], self.lengths[others, row] = out_lengths, in_lengths
+                self.durations[row, others], self.durations[others, row] = out_durations, in_durations
+                self.lengths[row, row] = self.durations[row, row] = 0.0
+                self._reindex()
+        return True
+
+    def remove(self, poi_id) -> bool:
+        """Drop a POI's row and column; returns False if it was not stored"""
+        poi_id = str(poi_id)
+        with self._update_lock, self._lock:
+            row = self._rows.get(poi_id)
+            if row is None:
+                return False
+            self.poi_ids.pop(row)
+            self.lats = np.delete(self.lats, row)
+            self.lngs = np.delete(self.lngs, row)
+            self.nodes = np.delete(self.nodes, row)
+            self.lengths = np.delete(np.delete(self.lengths, row, axis=0), row, axis=1)
+            self.durations = np.delete(np.delete(self.durations, row, axis=0), row, axis=1)
+            self._reindex()
+        return True
+
+    def is_current(self, graph) -> bool:
+        """True if the table was built on this graph version and mode"""
+        return graph is not None and self.name == graph.name and self.graph_version == graph.version
+
+    # ------------------------------------------------------------------
+    # Lookups
+    # ------------------------------------------------------------------
+
+    def lookup(self, poi_a, poi_b) -> Optional[Tuple[float, float]]:
+        """(meters, seconds) between two stored POIs, None if either is unknown"""
+        a, b = self._rows.get(str(poi_a)), self._rows.get(str(poi_b))
+        if a is None or b is None:
+            return None
+        return float(self.lengths[a, b]), float(self.durations[a, b])
+
+    def distance_matrix(self, graph, nodes: List[int],
+                        live: Optional[Callable] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Matrix between snapped graph nodes, served from the table where possible.
+
+        Nodes that belong to a stored POI are read from the table; rows and
+        columns of the remaining nodes are computed with live searches
+        (``live(sources, targets)``, graph.distance_matrix by default).
+
+        Returns:
+            (lengths in meters, durations in seconds), inf where unreachable
+        """
+        nodes = [int(node) for node in nodes]
+        with self._lock:
+            rows = np.array([self._node_rows.get(node, -1) for node in nodes], dtype=np.int64)
+            known = np.flatnonzero(rows >= 0)
+            lengths = np.full((len(nodes), len(nodes)), np.inf)
+            durations = np.full((len(nodes), len(nodes)), np.inf)
+            block = np.ix_(known, known)
+            lengths[block] = self.lengths[np.ix_(rows[known], rows[known])]
+            durations[block] = self.durations[np.ix_(rows[known], rows[known])]
+
+        unknown = np.flatnonzero(rows < 0)
+        live = live or graph.distance_matrix
+        self.hits += int(known.size)
+        self.misses += int(unknown.size)
+        if unknown.size:
+            unknown_nodes = [nodes[i] for i in unknown]
+            lengths[unknown, :], durations[unknown, :] = live(unknown_nodes, nodes)
+            if known.size:
+                known_nodes = [nodes[i] for i in known]
+                column_lengths, column_durations = live(known_nodes, unknown_nodes)
+                lengths[np.ix_(known, unknown)] = column_lengths
+                durations[np.ix_(known, unknown)] = column_durations
+        return lengths, durations
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            'mode': self.name,
+            'graph_version': self.graph_version,
+            'pois': len(self.poi_ids),
+            'off_network': int((self.nodes < 0).sum()),
+            'hits': self.hits,
+            'misses': self.misses,
+        }
+
+    # ------------------------------------------------------------------
+    # Persistence
+    # ------------------------------------------------------------------
+
+    def save(self, path: str):
+        """Write the table atomically so readers never see a partial file"""
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        tmp_path = f"{path}.tmp.{os.getpid()}"
+        with self._lock, open(tmp_path, 'wb') as f:
+            np.savez(f, name=np.array(self.name), graph_version=np.array(self.graph_version),
+                     max_snap_distance_m=np.array(self.max_snap_distance_m),
+                     poi_ids=np.array(self.poi_ids, dtype=str), lats=self.lats, lngs=self.lngs,
+                     nodes=self.nodes, lengths=self.lengths, durations=self.durations)
+        os.replace(tmp_path, path)
+        self.path = path
+        self._signature = _file_signature(path)
+
+    @classmethod
+    def load(cls, path: str) -> 'PoiDistanceTable':
+        with np.load(path, allow_pickle=False) as data:
+            table = cls(str(data['name']), str(data['graph_version']), float(data['max_snap_distance_m']),
+                        data['poi_ids'].tolist(), data['lats'], data['lngs'], data['nodes'],
+                        data['lengths'], data['durations'])
+        table.path = path
+        table._signature = _file_signature(path)
+        return table
+
+    def file_changed(self) -> bool:
+        """True if another process rewrote the table file since it was loaded"""
+        return self.path is not None and _file_signature(self.path) != self._signature
+
+
+def load_table(path: str, graph) -> Optional[PoiDistanceTable]:
+    """
+    Shared, read-mostly table for ``graph`` from ``path``.
+
+    Reloads when the file was rewritten; returns None if the file is missing,
+    unreadable or built on a different graph version.
+    """
+    with _loaded_tables_lock:
+        table = _loaded_tables.get(path)
+        if table is None or table.file_changed():
+            table = None
+            if os.path.exists(path):
+                try:
+                    table = PoiDistanceTable.load(path)
+                except Exception as e:
+                    logger.warning(f"POI distance table {path} could not be read: {e}")
+            if table is not None:
+                _loaded_tables[path] = table
+            else:
+                _loaded_tables.pop(path, None)
+    if table is None or not table.is_current(graph):
+        return None
+    return table
+
+
+def discard_table(path: str):
+    """
+    Delete a table that could not be kept in sync with the POIs; the next
+    lookup finds no table and rebuilds it from the current POIs.
+    """
+    with _loaded_tables_lock:
+        _loaded_tables.pop(path, None)
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+
+def register_table(table: PoiDistanceTable):
+    """Make a freshly built or updated table visible to load_table()"""
+    if table.path:
+        with _loaded_tables_lock:
+            _loaded_tables[table.path] = table
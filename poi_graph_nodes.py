@@ -0,0 +1,65 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+POI Graph Düğümleri
+POI'lerin yürüyüş ve araç ağlarındaki en yakın düğümünü (OSM node id),
+oturtma mesafesini ve hesaplandığı graph sürümünü saklar.
+
+POI'ler neredeyse hiç yer değiştirmez; rota isteklerinde POI waypoint'leri
+her seferinde yeniden ağa oturtulmaz. Düğümler graph derlendiğinde toplu
+olarak (build_routing_graphs), POI eklenince veya konumu değişince tek tek
+hesaplanır. Saklanan düğüm yalnızca aynı graph sürümünde kullanılır; sürüm
+farklıysa waypoint her zamanki gibi uzamsal aramayla oturtulur.
+
+Veritabanında poi_graph_nodes tablosunda (POI ve mod başına bir satır),
+JSON modunda POI kaydının graph_nodes alanında tutulur.
+"""
+
+from dataclasses import asdict, dataclass
+from typing import Any, Dict, Optional, Tuple
+
+import numpy as np
+
+from routing_engine import RoutingGraph
+
+
+@dataclass(frozen=True)
+class PoiGraphNode:
+    """Snapped node of one POI on one transport mode's graph"""
+    node_id: int            # OSM node id, stable across graph builds
+    snap_distance_m: float
+    graph_version: str
+
+    def to_dict(self) -> Dict[str, Any]:
+        return asdict(self)
+
+    @classmethod
+    def from_dict(cls, data: Optional[Dict[str, Any]]) -> Optional['PoiGraphNode']:
+        if not data or data.get('node_id') is None:
+            return None
+        return cls(int(data['node_id']), float(data['snap_distance_m']), str(data['graph_version']))
+
+
+def snap_poi_nodes(graph: RoutingGraph, locations: Dict[Any, Tuple[float, float]]) -> Dict[Any, PoiGraphNode]:
+    """Snap many POIs with one KD-tree query: {poi_id: PoiGraphNode}"""
+    poi_ids = list(locations)
+    if not poi_ids:
+        return {}
+    lats = np.array([float(locations[poi_id][0]) for poi_id in poi_ids])
+    lngs = np.array([float(locations[poi_id][1]) for poi_id in poi_ids])
+    nodes, distances = graph.snap(lats, lngs)
+    node_ids = graph.node_ids[nodes].tolist()
+    return {
+        poi_id: PoiGraphNode(int(node_id), round(float(distance), 2), graph.version)
+        for poi_id, node_id, distance in zip(poi_ids, node_ids, distances.tolist())
+    }
+
+
+def stored_node_index(graph: RoutingGraph, node: Optional[PoiGraphNode]) -> Optional[int]:
+    """Internal node index of a stored node; None when it was snapped on another graph version"""
+    if node is None or node.graph_version != graph.version:
+        return None
+    try:
+        return graph.index_of(node.node_id)
+    except KeyError:
+        return None
@@ -0,0 +1,378 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+POI Puan Matrisi
+POI'lerin 10 puan kategorisindeki değerlerini bellekte NumPy matrisi
+(POI × kategori) olarak tutar ve öneri skorlarını vektörel hesaplar.
+
+Matris ilk istekte yüklenir. Değişen POI'ler (invalidate(poi_ids)) bir
+sonraki istekte yalnızca kendi satırları sorgulanarak matrise işlenir;
+değişiklikler API'den ve diğer worker'lardan Postgres LISTEN/NOTIFY ile
+gelir (poi_change_listener). Tam yeniden yükleme yalnızca ilk yüklemede,
+invalidate() ile veya POI_RATING_MATRIX_TTL_S süresi dolunca yapılır.
+Yükleme başarısız olursa eldeki matrisle devam edilir.
+
+Skorlama POI başına Python döngüsü yerine tek bir maskeli matris–vektör
+çarpımıdır; en iyi k POI argpartition ile seçilir. Toplu önerilerde
+(recommend_many) profiller parça parça tek bir matris–matris çarpımıyla
+puanlanır.
+
+Konumlu önerilerde (recommend_near) adaylar önce POI koordinatları
+üzerindeki KD-tree ile kuş uçuşu yarıçapa göre elenir, yalnızca adaylar
+puanlanır; ağ üzerindeki yolculuk süresi/mesafesi bütçeye sığmayanlar
+çıkarılır ve yakın POI'ler sıralamada öne alınır.
+"""
+
+import logging
+import math
+import os
+import threading
+import time
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Sequence, Union
+
+import numpy as np
+
+from routing_engine import EARTH_RADIUS_M, cKDTree, haversine_m
+
+logger = logging.getLogger(__name__)
+
+# Column order of the matrix (same as the pivot query and RATING_CATEGORIES)
+RATING_FIELDS = ('tarihi', 'sanat_kultur', 'doga', 'eglence', 'alisveris',
+                 'spor', 'macera', 'rahatlatici', 'yemek', 'gece_hayati')
+
+RATING_MATRIX_TTL_S = float(os.getenv('POI_RATING_MATRIX_TTL_S', '300'))
+
+# Score of unrated POIs in general (all preferences zero) recommendations
+UNRATED_GENERAL_SCORE = 30.0
+
+# Location-aware ranking: a POI at the edge of the travel budget keeps
+# 1 - TRAVEL_DISCOUNT of its preference score, one next door keeps all of it
+TRAVEL_DISCOUNT = 0.5
+
+# Preference profiles scored per matrix-matrix product in recommend_many
+BATCH_CHUNK_SIZE = 128
+
+
+def preference_vector(preferences: Dict[str, Any]) -> np.ndarray:
+    """User preferences in matrix column order; missing categories are 0.
+
+    Raises ValueError for non-numeric values.
+    """
+    try:
+        return np.array([float(preferences.get(field) or 0) for field in RATING_FIELDS])
+    except (TypeError, ValueError):
+        raise ValueError('Preference values must be numbers')
+
+
+def top_k(scores: np.ndarray, k: int) -> np.ndarray:
+    """
+    Indices of the k highest positive scores, highest first. Equal scores
+    keep POI order (like a stable sort), also at the k-th place.
+    """
+    candidates = np.flatnonzero(scores > 0)
+    if len(candidates) > k > 0:
+        kth = scores[candidates[np.argpartition(-scores[candidates], k - 1)[k - 1]]]
+        candidates = candidates[scores[candidates] >= kth]
+    order = np.lexsort((candidates, -scores[candidates]))
+    return candidates[order[:max(k, 0)]]
+
+
+class PoiRatingMatrix:
+    """
+    In-memory POI × rating category matrix.
+
+    ``loader`` returns POI rows: dicts with id, name, category, latitude,
+    longitude, description, tags and one key per rating category (None
+    when the POI has no rating in that category). ``row_loader(poi_ids)``
+    returns the current rows of the given POIs only; POIs missing from its
+    result are dropped from the matrix. Without it every change reloads
+    the whole matrix.
+
+    Arrays of a loaded snapshot:
+        positive: float64 n x 10, rating where > 0 else 0
+        rated:    float64 n x 10, 1.0 where the rating is > 0
+        general:  float64 n, mean positive rating (UNRATED_GENERAL_SCORE if none)
+    """
+
+    def __init__(self, loader: Callable[[], Sequence[Dict[str, Any]]],
+                 row_loader: Optional[Callable[[List[Any]], Sequence[Dict[str, Any]]]] = None,
+                 ttl_s: float = RATING_MATRIX_TTL_S):
+        self.loader = loader
+        self.row_loader = row_loader
+        self.ttl_s = ttl_s
+        self._lock = threading.Lock()
+        self._snapshot: Optional[Dict[str, Any]] = None
+        self._stale = True
+        self._pending = set()
+        self.loads = 0
+        self.deltas = 0
+        self.delta_rows = 0
+
+    def invalidate(self, poi_ids: Optional[Iterable[Any]] = None):
+        """
+        Mark POIs as changed (their rows are re-read on the next request);
+        without ids the whole matrix is reloaded.
+        """
+        with self._lock:
+            if poi_ids is None or self.row_loader is None:
+                self._stale = True
+                self._pending.clear()
+            else:
+                self._pending.update(poi_ids)
+
+    def _current(self) -> Dict[str, Any]:
+        with self._lock:
+            snapshot = self._snapshot
+            expired = snapshot is not None and time.monotonic() - snapshot['loaded_at'] > self.ttl_s
+            if snapshot is None or self._stale or expired:
+                self._stale = False
+                self._pending.clear()
+                try:
+                    snapshot = self._snapshot = self._build(self.loader())
+                    self.loads += 1
+                except Exception:
+                    if snapshot is None:
+                        self._stale = True
+                        raise
+                    logger.exception("⚠️ POI rating matrix could not be reloaded, keeping the previous one")
+            elif self._pending:
+                poi_ids, self._pending = list(self._pending), set()
+                try:
+                    rows = self.row_loader(poi_ids)
+                except Exception:
+                    # Retried on the next request
+                    self._pending.update(poi_ids)
+                    logger.exception("⚠️ Changed POI ratings could not be loaded, keeping the previous rows")
+                else:
+                    snapshot = self._snapshot = self._apply(snapshot, poi_ids, rows)
+                    self.deltas += 1
+                    self.delta_rows += len(poi_ids)
+            return snapshot
+
+    @staticmethod
+    def _rating_arrays(rows: Sequence[Dict[str, Any]]):
+        ratings = np.array([[np.nan if row.get(field) is None else float(row[field]) for field in RATING_FIELDS]
+                            for row in rows], dtype=np.float64).reshape(len(rows), len(RATING_FIELDS))
+        rated = np.nan_to_num(ratings) > 0
+        positive = np.where(rated, ratings, 0.0)
+        counts = rated.sum(axis=1)
+        general = np.full(len(rows), UNRATED_GENERAL_SCORE)
+        np.divide(positive.sum(axis=1), counts, out=general, where=counts > 0)
+        coords = np.array([[np.nan if row.get(key) is None else float(row[key]) for key in ('latitude', 'longitude')]
+                           for row in rows], dtype=np.float64).reshape(len(rows), 2)
+        return positive, rated.astype(np.float64), general, coords
+
+    @classmethod
+    def _build(cls, rows: Sequence[Dict[str, Any]]) -> Dict[str, Any]:
+        rows = list(rows)
+        positive, rated, general, coords = cls._rating_arrays(rows)
+        return {'pois': rows, 'positive': positive, 'rated': rated, 'general': general, 'coords': coords,
+                'loaded_at': time.monotonic()}
+
+    @classmethod
+    def _apply(cls, snapshot: Dict[str, Any], poi_ids: List[Any], rows: Sequence[Dict[str, Any]]) -> Dict[str, Any]:
+        """
+        New snapshot with the rows of changed POIs replaced in place, new
+        POIs appended and POIs without a row removed. Readers of the old
+        snapshot are not affected.
+        """
+        changed = set(poi_ids)
+        updated = {row['id']: row for row in rows}
+        pois, source = [], []
+        for index, poi in enumerate(snapshot['pois']):
+            if poi['id'] not in changed:
+                pois.append(poi)
+                source.append(index)
+            elif poi['id'] in updated:
+                pois.append(updated.pop(poi['id']))
+                source.append(-1)
+        for row in updated.values():
+            pois.append(row)
+            source.append(-1)
+
+        source = np.array(source, dtype=np.int64)
+        kept = source >= 0
+        fresh = cls._rating_arrays([poi for poi, index in zip(pois, source.tolist()) if index < 0])
+        result = {'pois': pois, 'loaded_at': snapshot['loaded_at']}
+        for name, values in zip(('positive', 'rated', 'general', 'coords'), fresh):
+            array = np.empty((len(pois),) + snapshot[name].shape[1:])
+            array[kept] = snapshot[name][source[kept]]
+            array[~kept] = values
+            result[name] = array
+        return result
+
+    def scores(self, preferences: Dict[str, Any]) -> np.ndarray:
+        """Recommendation score of every POI (0 = not recommended), rounded to 2 decimals"""
+        return self._scores(self._current(), preference_vector(preferences))
+
+    @staticmethod
+    def _scores(snapshot: Dict[str, Any], weights: np.ndarray, rows: Optional[np.ndarray] = None) -> np.ndarray:
+        """Scores of all POIs, or of the given matrix rows only"""
+        pick = (lambda name: snapshot[name]) if rows is None else (lambda name: snapshot[name][rows])
+        if not np.any(weights):
+            # General recommendations: mean of the POI's own ratings
+            return np.round(pick('general'), 2)
+        active = weights > 0
+        # Mean of (preference/100) * (rating/100) over categories both are > 0, in percent
+        total = pick('positive') @ np.where(active, weights, 0.0)
+        counts = pick('rated') @ active.astype(np.float64)
+        scores = np.zeros(len(total))
+        np.divide(total, counts * 100.0, out=scores, where=(counts > 0) & (total > 0))
+        return np.round(scores, 2)
+
+    @staticmethod
+    def _batch_scores(snapshot: Dict[str, Any], weights: np.ndarray) -> np.ndarray:
+        """Profile × POI scores for a profile × category weight matrix, same rules as _scores"""
+        active = weights > 0
+        # Profile-major result: each profile's scores are one contiguous row for top_k
+        total = np.where(active, weights, 0.0) @ snapshot['positive'].T
+        counts = active.astype(np.float64) @ snapshot['rated'].T
+        scores = np.zeros(total.shape)
+        np.divide(total, counts * 100.0, out=scores, where=(counts > 0) & (total > 0))
+        # All-zero profiles get general recommendations
+        scores[~weights.any(axis=1)] = snapshot['general']
+        return np.round(scores, 2, out=scores)
+
+    @staticmethod
+    def _entry(poi: Dict[str, Any], score: float) -> Dict[str, Any]:
+        return {
+            'id': poi['id'],
+            'name': poi['name'],
+            'category': poi['category'],
+            'latitude': poi['latitude'],
+            'longitude': poi['longitude'],
+            'description': poi.get('description', ''),
+            'tags': poi.get('tags', ''),
+            'score': float(score),
+            'ratings': {field: poi.get(field, 0) for field in RATING_FIELDS}
+        }
+
+    def recommend(self, preferences: Dict[str, Any], limit: int = 20) -> List[Dict[str, Any]]:
+        """Top ``limit`` POIs with a positive score, highest first"""
+        weights = preference_vector(preferences)
+        snapshot = self._current()
+        scores = self._scores(snapshot, weights)
+        return [self._entry(snapshot['pois'][index], scores[index]) for index in top_k(scores, limit).tolist()]
+
+    def recommend_many(self, profiles: Iterable[Dict[str, Any]], limit: int = 20,
+                       chunk_size: int = BATCH_CHUNK_SIZE) -> Iterator[Union[List[Dict[str, Any]], ValueError]]:
+        """
+        Top ``limit`` POIs for each preference profile, in input order.
+
+        Profiles are consumed lazily and scored ``chunk_size`` at a time with
+        one matrix-matrix product, so neither the input nor the output has to
+        fit in memory at once. Every profile is scored against the same
+        matrix snapshot. An invalid profile (or a ValueError passed in its
+        place, e.g. for an unreadable input line) yields its ValueError
+        instead of stopping the batch.
+        """
+        snapshot = self._current()
+        pois = snapshot['pois']
+        chunk: List[Union[np.ndarray, ValueError]] = []
+
+        def flush():
+            valid = [weights for weights in chunk if not isinstance(weights, ValueError)]
+            scores = self._batch_scores(snapshot, np.array(valid).reshape(len(valid), len(RATING_FIELDS)))
+            row = 0
+            for weights in chunk:
+                if isinstance(weights, ValueError):
+                    yield weights
+                    continue
+                profile_scores = scores[row]
+                row += 1
+                yield [self._entry(pois[index], profile_scores[index])
+                       for index in top_k(profile_scores, limit).tolist()]
+            chunk.clear()
+
+        for preferences in profiles:
+            try:
+                if isinstance(preferences, ValueError):
+                    raise preferences
+                if not isinstance(preferences, dict):
+                    raise ValueError('Preferences must be an object')
+                chunk.append(preference_vector(preferences))
+            except ValueError as e:
+                chunk.append(e)
+            if len(chunk) >= chunk_size:
+                yield from flush()
+        if chunk:
+            yield from flush()
+
+    @staticmethod
+    def _nearby(snapshot: Dict[str, Any], lat: float, lng: float, radius_m: float) -> np.ndarray:
+        """Matrix rows within radius_m (great-circle) of a point, through a KD-tree on the POI coordinates"""
+        coords = snapshot['coords']
+        if 'tree' not in snapshot:
+            # Built once per snapshot; equirectangular meters around the POIs' mean latitude
+            located = np.flatnonzero(~np.isnan(coords).any(axis=1))
+            lat0 = float(coords[located, 0].mean()) if len(located) else 0.0
+            ky = math.radians(1.0) * EARTH_RADIUS_M
+            scale = np.array([ky, ky * math.cos(math.radians(lat0))])
+            points = coords[located] * scale
+            snapshot['tree'] = (cKDTree(points) if cKDTree is not None and len(points) else None,
+                                located, points, scale)
+        tree, located, points, scale = snapshot['tree']
+        if not len(located):
+            return located
+        origin = np.array([lat, lng]) * scale
+        # The projection is approximate over large radii: widen, then check exactly
+        if tree is not None:
+            rows = located[np.asarray(tree.query_ball_point(origin, radius_m * 1.02 + 10.0), dtype=np.int64)]
+        else:
+            rows = located[np.hypot(*(points - origin).T) <= radius_m * 1.02 + 10.0]
+        rows = np.sort(rows)
+        return rows[haversine_m(lat, lng, coords[rows, 0], coords[rows, 1]) <= radius_m]
+
+    def recommend_near(self, preferences: Dict[str, Any], lat: float, lng: float, radius_m: float,
+                       travel: Callable[[np.ndarray, np.ndarray], Any], limit: int = 20,
+                       max_length_m: Optional[float] = None,
+                       max_duration_s: Optional[float] = None) -> List[Dict[str, Any]]:
+        """
+        Top ``limit`` POIs around (lat, lng) that fit the travel budget.
+
+        Candidates within ``radius_m`` straight-line distance are scored;
+        ``travel(lats, lngs)`` returns their (lengths m, durations s) from
+        the origin, inf where unreachable. POIs over max_length_m or
+        max_duration_s are dropped. The rest are ranked by preference score
+        discounted by up to TRAVEL_DISCOUNT with the share of the budget
+        the trip uses.
+        """
+        weights = preference_vector(preferences)
+        snapshot = self._current()
+        rows = self._nearby(snapshot, lat, lng, radius_m)
+        scores = self._scores(snapshot, weights, rows)
+        rows, scores = rows[scores > 0], scores[scores > 0]
+        if not len(rows):
+            return []
+
+        coords = snapshot['coords'][rows]
+        lengths, durations = (np.asarray(values, dtype=np.float64) for values in travel(coords[:, 0], coords[:, 1]))
+        fits = np.isfinite(lengths) & np.isfinite(durations)
+        if max_length_m is not None:
+            fits &= lengths <= max_length_m
+        if max_duration_s is not None:
+            fits &= durations <= max_duration_s
+        rows, scores, lengths, durations = rows[fits], scores[fits], lengths[fits], durations[fits]
+
+        used = durations / max_duration_s if max_duration_s else lengths / (max_length_m or radius_m)
+        ranking = np.round(scores * (1.0 - TRAVEL_DISCOUNT * np.clip(used, 0.0, 1.0)), 2)
+        recommendations = []
+        for i in top_k(ranking, limit).tolist():
+            entry = self._entry(snapshot['pois'][rows[i]], scores[i])
+            entry['ranking_score'] = float(ranking[i])
+            entry['travel_distance'] = round(float(lengths[i]) / 1000, 2)  # km
+            entry['travel_time'] = round(float(durations[i]) / 60, 1)  # minutes
+            recommendations.append(entry)
+        return recommendations
+
+    def stats(self) -> Dict[str, Any]:
+        snapshot = self._snapshot
+        return {
+            'pois': len(snapshot['pois']) if snapshot else 0,
+            'loads': self.loads,
+            'deltas': self.deltas,
+            'delta_rows': self.delta_rows,
+            'pending': len(self._pending),
+            'age_s': round(time.monotonic() - snapshot['loaded_at'], 1) if snapshot else None,
+            'ttl_s': self.ttl_s,
+        }
@@ -0,0 +1,52 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Hazır Olma ve Arka Plan Servisleri
+Yol ağı deposu ve rota süreç havuzu süreç açılışında bir kez başlatılır
+(start_background_services); /ready uç noktası ağlar yüklenene kadar
+Retry-After ile 503 döner.
+
+poi_api ve uygulama fabrikası (app.create_app) aynı /ready işleyicisini
+kaydeder. Kontrol salt okunurdur: yükleme veya worker başlatmaz.
+"""
+
+import logging
+import threading
+
+from flask import jsonify
+
+from graph_store import RETRY_AFTER_S, get_graph_store
+from route_workers import get_route_pool
+
+logger = logging.getLogger(__name__)
+
+_started = False
+_start_lock = threading.Lock()
+
+
+def start_background_services():
+    """Start the graph store watcher (prewarm) and the route worker processes, once per process"""
+    global _started
+    with _start_lock:
+        if _started:
+            return
+        _started = True
+    # Graphs load in the background; requests never wait for them
+    get_graph_store().start()
+    # Route workers are started before the first route request
+    get_route_pool().start()
+    logger.info("🚀 Graph store and route pool started")
+
+
+def ready():
+    """Hazır olma kontrolü: yürüyüş ve araç ağları yüklenene kadar 503 (yük dengeleyici için)"""
+    store = get_graph_store()
+    graphs = {name: graph['state'] for name, graph in store.status().items()}
+    if store.ready():
+        return jsonify({'ready': True, 'graphs': graphs})
+    return jsonify({'ready': False, 'graphs': graphs}), 503, {'Retry-After': str(RETRY_AFTER_S)}
+
+
+def register_readiness(app):
+    """Register GET /ready on a Flask app"""
+    app.add_url_rule('/ready', 'ready', ready, methods=['GET'])
@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+İstek Birleştirme (single-flight)
+Aynı anda gelen özdeş istekleri tek hesaplamada birleştirir.
+
+Bir tur grubunun cihazları aynı rotayı birlikte açtığında milisaniyeler
+içinde onlarca özdeş /api/route/smart ve /api/recommendations isteği gelir.
+İlk istek hesaplamayı yapar; hesaplama sürerken gelen aynı anahtarlı
+istekler onun bitmesini bekler ve sonucunu paylaşır. Hesaplama bittiğinde
+anahtar bırakılır: bu bir önbellek değildir, sonraki istekler yeniden
+hesaplanır.
+
+Anahtar, uç nokta adı ile normalize edilmiş istek gövdesinin (anahtarları
+sıralı, boşluksuz JSON) ve sorgu parametrelerinin SHA-256 özetidir.
+"""
+
+import hashlib
+import json
+import threading
+from typing import Any, Callable, Dict, Hashable, Optional, Tuple
+
+
+def request_fingerprint(endpoint: str, body: Any = None, args: Optional[Dict[str, Any]] = None) -> str:
+    """
+    Stable key for a request: key order and whitespace in the JSON body
+    and the order of query parameters do not matter.
+    """
+    if isinstance(body, (bytes, bytearray)):
+        body_text = hashlib.sha256(body).hexdigest()
+    else:
+        body_text = json.dumps(body, sort_keys=True, separators=(',', ':'), ensure_ascii=False, default=str)
+    args_text = json.dumps(sorted((args or {}).items()), separators=(',', ':'), ensure_ascii=False, default=str)
+    digest = hashlib.sha256(f"{endpoint}\n{args_text}\n{body_text}".encode('utf-8')).hexdigest()
+    return f"{endpoint}:{digest}"
+
+
+class _Call:
+    __slots__ = ('done', 'result', 'error', 'waiters')
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error: Optional[BaseException] = None
+        self.waiters = 0
+
+
+class SingleFlight:
+    """
+    Aynı anahtarla eşzamanlı çağrıları tek hesaplamaya indirger.
+
+    Counters are kept per group (endpoint): ``computed`` calls ran the
+    function, ``coalesced`` calls shared the result of an in-flight one.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls: Dict[Hashable, _Call] = {}
+        self._counters: Dict[str, Dict[str, int]] = {}
+
+    def do(self, key: Hashable, fn: Callable[[], Any], group: str = 'default') -> Tuple[Any, bool]:
+        """
+        Run ``fn`` unless an identical call is already running.
+
+        Returns:
+            (result, shared): shared is True when the result came from
+            another caller's computation. Exceptions are shared as well.
+        """
+        with self._lock:
+            counters = self._counters.setdefault(group, {'computed': 0, 'coalesced': 0, 'peak_waiters': 0})
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+                counters['computed'] += 1
+            else:
+                call.waiters += 1
+                counters['coalesced'] += 1
+                counters['peak_waiters'] = max(counters['peak_waiters'], call.waiters)
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result, True
+
+        try:
+            call.result = fn()
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                self._calls.pop(key, None)
+            call.done.set()
+        return call.result, False
+
+    def in_flight(self) -> int:
+        with self._lock:
+            return len(self._calls)
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        """Uç nokta başına: hesaplanan, paylaşılan (önlenen hesaplama) istek sayısı"""
+        with self._lock:
+            stats = {}
+            for group, counters in self._counters.items():
+                total = counters['computed'] + counters['coalesced']
+                stats[group] = dict(counters, avoided_ratio=round(counters['coalesced'] / total, 4) if total else 0.0)
+            return stats
@@ -0,0 +1,269 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Rota Geometrisi Kodlama
+Rota koordinatlarını yanıt boyutunu küçülten kompakt biçimlere dönüştürür.
+
+- polyline: Google encoded polyline (ayarlanabilir hassasiyet, varsayılan 5
+  ondalık ≈ 1 m). Mobil istemcilerde yanıt boyutu ve JSON serileştirme
+  süresi nokta başına sözlüğe göre kat kat azalır.
+- flat: [lat0, lng0, lat1, lng1, ...] düz sayı dizisi, hassasiyete yuvarlanır.
+
+Harita uzak yakınlaştırmadayken tam çözünürlüklü çizgi gereksizdir:
+Douglas-Peucker sadeleştirmesi verilen metre toleransına ya da harita
+zoom seviyesine (bir ekran pikseli) göre noktaları azaltır. Kayıtlı rotalar
+için birkaç zoom seviyesinin sadeleştirilmiş hali kayıt sırasında
+hesaplanır (build_lod), okuma sırasında yalnızca seçilir (select_lod).
+
+Kodlama, çözme ve sadeleştirme NumPy ile vektörize edilmiştir; nokta
+başına Python döngüsü yoktur.
+"""
+
+import math
+from typing import Dict, List, Optional, Tuple, Union
+
+import numpy as np
+
+COORDINATE_FORMATS = ('polyline', 'flat')
+DEFAULT_PRECISION = 5
+MIN_PRECISION = 1
+MAX_PRECISION = 7
+
+EARTH_RADIUS_M = 6371000.0
+# Web Mercator ground resolution at zoom 0 on the equator (256 px tiles)
+METERS_PER_PIXEL_Z0 = 156543.03392
+MIN_ZOOM = 0
+MAX_ZOOM = 22
+
+# Zoom levels precomputed for stored routes; deeper zooms use full geometry
+LOD_ZOOMS = (10, 12, 14, 16)
+LOD_PRECISION = 6
+
+
+def _as_coords(coords) -> np.ndarray:
+    return np.asarray(coords, dtype=np.float64).reshape(-1, 2)
+
+
+def encode_polyline(coords, precision: int = DEFAULT_PRECISION) -> str:
+    """
+    Encode (lat, lng) pairs with the Google polyline algorithm.
+
+    Args:
+        coords: sequence or (n, 2) array of (lat, lng)
+        precision: decimal places kept (5 is the Google default, 6 is used by OSRM)
+    """
+    points = np.round(_as_coords(coords) * 10 ** precision).astype(np.int64)
+    if not len(points):
+        return ''
+    deltas = np.diff(points, axis=0, prepend=np.zeros((1, 2), dtype=np.int64)).ravel()
+    values = np.where(deltas < 0, ~(deltas << 1), deltas << 1)  # zigzag
+
+    # Split every value into 5-bit chunks, least significant first; all but
+    # the last chunk of a value carry the 0x20 continuation bit.
+    chunk_count = np.ones(len(values), dtype=np.int64)
+    remaining = values >> 5
+    while remaining.any():
+        chunk_count += remaining > 0
+        remaining >>= 5
+    width = int(chunk_count.max())
+    shifts = 5 * np.arange(width, dtype=np.int64)
+    chunks = (values[:, None] >> shifts[None, :]) & 0x1F
+    position = np.arange(width)[None, :]
+    chunks |= np.where(position < chunk_count[:, None] - 1, 0x20, 0)
+    chunks += 63
+    return chunks[position < chunk_count[:, None]].astype(np.uint8).tobytes().decode('ascii')
+
+
+def decode_polyline(encoded: str, precision: int = DEFAULT_PRECISION) -> List[Tuple[float, float]]:
+    """Decode a Google encoded polyline into (lat, lng) tuples"""
+    data = np.frombuffer(encoded.encode('ascii'), dtype=np.uint8).astype(np.int64) - 63
+    if not len(data):
+        return []
+    last_chunk = (data & 0x20) == 0
+    value_id = np.concatenate(([0], np.cumsum(last_chunk)[:-1]))
+    value_start = np.flatnonzero(np.concatenate(([True], last_chunk[:-1])))
+    shift = 5 * (np.arange(len(data)) - value_start[value_id])
+    values = np.zeros(int(last_chunk.sum()), dtype=np.int64)
+    np.add.at(values, value_id, (data & 0x1F) << shift)
+
+    deltas = np.where(values & 1, ~(values >> 1), values >> 1)
+    coords = np.cumsum(deltas.reshape(-1, 2), axis=0) / 10 ** precision
+    return list(zip(coords[:, 0].tolist(), coords[:, 1].tolist()))
+
+
+def encode_flat(coords, precision: int = DEFAULT_PRECISION) -> List[float]:
+    """Flat [lat0, lng0, lat1, lng1, ...] list rounded to ``precision`` decimals"""
+    return np.round(_as_coords(coords), precision).ravel().tolist()
+
+
+def encode_coordinates(coords, coordinate_format: str,
+                       precision: int = DEFAULT_PRECISION) -> Union[str, List[float]]:
+    """Encode (lat, lng) pairs in one of COORDINATE_FORMATS"""
+    if coordinate_format == 'polyline':
+        return encode_polyline(coords, precision)
+    if coordinate_format == 'flat':
+        return encode_flat(coords, precision)
+    raise ValueError(f"Unknown coordinate format: {coordinate_format}")
+
+
+def parse_coordinate_options(coordinate_format, precision) -> Tuple[Optional[str], int]:
+    """
+    Validate the ``format`` / ``precision`` request options.
+
+    Returns:
+        (format or None for the default per-point objects, precision)
+
+    Raises:
+        ValueError: unknown format or precision out of range
+    """
+    if coordinate_format in (None, '', 'json', 'objects'):
+        coordinate_format = None
+    elif coordinate_format not in COORDINATE_FORMATS:
+        raise ValueError(f"format must be one of: json, {', '.join(COORDINATE_FORMATS)}")
+
+    if precision in (None, ''):
+        precision = DEFAULT_PRECISION
+    try:
+        precision = int(precision)
+    except (TypeError, ValueError):
+        raise ValueError("precision must be an integer")
+    if not MIN_PRECISION <= precision <= MAX_PRECISION:
+        raise ValueError(f"precision must be between {MIN_PRECISION} and {MAX_PRECISION}")
+    return coordinate_format, precision
+
+
+def tolerance_for_zoom(zoom: float, latitude: float) -> float:
+    """Simplification tolerance in meters: one screen pixel at ``zoom``"""
+    return METERS_PER_PIXEL_Z0 * math.cos(math.radians(latitude)) / 2 ** zoom
+
+
+def simplify(coords, tolerance_m: float) -> np.ndarray:
+    """
+    Douglas-Peucker simplification of (lat, lng) pairs.
+
+    All ranges still to be split are processed together: every iteration
+    measures the distance of all their interior points to their chords in
+    one vectorised pass, so the number of Python-level steps grows with
+    the recursion depth (about log n), not with the number of points.
+
+    Args:
+        coords: sequence or (n, 2) array of (lat, lng)
+        tolerance_m: maximum distance in meters between the input and the result
+
+    Returns:
+        (k, 2) array of the kept points; the first and last are always kept
+    """
+    points = _as_coords(coords)
+    n = len(points)
+    if n < 3 or tolerance_m <= 0:
+        return points
+
+    # Local equirectangular projection in meters is accurate enough at route scale
+    lat0 = math.radians(float(points[:, 0].mean()))
+    xy = np.radians(points[:, ::-1]) * EARTH_RADIUS_M
+    xy[:, 0] *= math.cos(lat0)
+
+    keep = np.zeros(n, dtype=bool)
+    keep[[0, -1]] = True
+    starts, ends = np.array([0]), np.array([n - 1])
+    while starts.size:
+        counts = ends - starts - 1
+        open_ranges = counts > 0
+        starts, ends, counts = starts[open_ranges], ends[open_ranges], counts[open_ranges]
+        if not starts.size:
+            break
+
+        # Interior point indices of all ranges, concatenated
+        first = np.cumsum(counts) - counts
+        range_id = np.repeat(np.arange(len(starts)), counts)
+        index = np.repeat(starts + 1 - first, counts) + np.arange(int(counts.sum()))
+        distances = _segment_distances(xy[index], xy[starts[range_id]], xy[ends[range_id]])
+
+        farthest = np.maximum.reduceat(distances, first)
+        is_farthest = distances == farthest[range_id]
+        candidates = np.flatnonzero(is_farthest)
+        _, first_candidate = np.unique(range_id[candidates], return_index=True)
+        pivots = index[candidates[first_candidate]]
+
+        split = farthest > tolerance_m
+        pivots = pivots[split]
+        keep[pivots] = True
+        starts, ends = np.concatenate((starts[split], pivots)), np.concatenate((pivots, ends[split]))
+
+    return points[keep]
+
+
+def _segment_distances(p: np.ndarray, a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    """Distance of points p to segments a-b (row-wise, planar meters)"""
+    ab = b - a
+    length_sq = (ab ** 2).sum(axis=1)
+    t = np.where(length_sq > 0, ((p - a) * ab).sum(axis=1) / np.where(length_sq > 0, length_sq, 1), 0.0)
+    closest = a + np.clip(t, 0.0, 1.0)[:, None] * ab
+    return np.sqrt(((p - closest) ** 2).sum(axis=1))
+
+
+def simplify_for_view(coords, tolerance_m: Optional[float] = None,
+                      zoom: Optional[float] = None) -> np.ndarray:
+    """Simplify by an explicit tolerance, or by one pixel at ``zoom``; unchanged if neither"""
+    points = _as_coords(coords)
+    if tolerance_m is None and zoom is not None and len(points):
+        tolerance_m = tolerance_for_zoom(zoom, float(points[:, 0].mean()))
+    return simplify(points, tolerance_m) if tolerance_m else points
+
+
+def parse_simplify_options(tolerance, zoom) -> Tuple[Optional[float], Optional[float]]:
+    """
+    Validate the ``tolerance`` (meters) / ``zoom`` request options.
+
+    Raises:
+        ValueError: non-numeric or out-of-range values
+    """
+    if tolerance in (None, ''):
+        tolerance = None
+    else:
+        try:
+            tolerance = float(tolerance)
+        except (TypeError, ValueError):
+            raise ValueError("tolerance must be a number of meters")
+        if not 0 <= tolerance <= 10000:
+            raise ValueError("tolerance must be between 0 and 10000 meters")
+
+    if zoom in (None, ''):
+        zoom = None
+    else:
+        try:
+            zoom = float(zoom)
+        except (TypeError, ValueError):
+            raise ValueError("zoom must be a number")
+        if not MIN_ZOOM <= zoom <= MAX_ZOOM:
+            raise ValueError(f"zoom must be between {MIN_ZOOM} and {MAX_ZOOM}")
+    return tolerance, zoom
+
+
+def build_lod(coords) -> Dict[str, str]:
+    """
+    Precompute simplified versions for LOD_ZOOMS.
+
+    Returns:
+        {str(zoom): encoded polyline at LOD_PRECISION}, ready to store as JSON
+    """
+    points = _as_coords(coords)
+    if not len(points):
+        return {}
+    latitude = float(points[:, 0].mean())
+    return {str(zoom): encode_polyline(simplify(points, tolerance_for_zoom(zoom, latitude)), LOD_PRECISION)
+            for zoom in LOD_ZOOMS}
+
+
+def select_lod(lod: Optional[Dict[str, str]], zoom: float) -> Optional[Tuple[int, List[Tuple[float, float]]]]:
+    """
+    Pick the precomputed level for a map zoom: the coarsest level that is
+    still at least as detailed as ``zoom`` needs.
+
+    Returns:
+        (level zoom, (lat, lng) points), or None when full geometry is needed
+    """
+    levels = sorted(int(level) for level in (lod or {}) if int(level) >= zoom)
+    if not levels:
+        return None
+    return levels[0], decode_polyline(lod[str(levels[0])], LOD_PRECISION)
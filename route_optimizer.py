@@ -0,0 +1,259 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Rota Sırası Optimizasyonu
+Ağ mesafe matrisi üzerinde durakların ziyaret sırasını bulur (açık yol TSP).
+
+Az duraklı rotalar Held-Karp dinamik programlaması ile kesin olarak çözülür.
+Daha büyük rotalarda en yakın komşu ile başlangıç turu kurulur, ardından
+2-opt ve Or-opt yerel aramaları ve zaman bütçesi kalırsa "double bridge"
+pertürbasyonu ile iyileştirilir. Tüm hamle değerlendirmeleri NumPy ile
+vektörize edilmiştir; matris asimetrik olabilir (tek yönlü sokaklar).
+Başlangıç ve bitiş durakları isteğe bağlı olarak sabitlenebilir.
+"""
+
+import logging
+import time
+from typing import List, Optional
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Routes with at most this many free stops are solved exactly (2^n * n^2 work)
+EXACT_MAX_STOPS = 12
+
+# Default wall-clock budget of the heuristic search in seconds
+DEFAULT_TIME_BUDGET_S = 0.2
+
+# Iterated local search stops after this many perturbations without improvement
+MAX_STALLED_ROUNDS = 30
+
+
+def route_cost(matrix: np.ndarray, order: List[int]) -> float:
+    """Total cost of visiting ``order`` as an open path"""
+    order = np.asarray(order, dtype=np.int64)
+    return float(matrix[order[:-1], order[1:]].sum())
+
+
+def optimize_order(matrix, start: Optional[int] = None, end: Optional[int] = None,
+                   time_budget_s: float = DEFAULT_TIME_BUDGET_S, seed: int = 0) -> List[int]:
+    """
+    Find a short open path that visits every row of ``matrix`` once.
+
+    Args:
+        matrix: n x n (possibly asymmetric) cost matrix; inf marks unreachable pairs
+        start: index that must come first (optional)
+        end: index that must come last (optional)
+        time_budget_s: wall-clock limit for the heuristic search
+        seed: random seed for perturbations, so results are reproducible
+
+    Returns:
+        Visiting order as a list of matrix indices
+    """
+    matrix = np.asarray(matrix, dtype=np.float64)
+    n = matrix.shape[0]
+    if matrix.shape != (n, n):
+        raise ValueError("matrix must be square")
+    if start is not None and end is not None and start == end and n > 1:
+        raise ValueError("start and end must differ")
+    if n <= 1:
+        return list(range(n))
+
+    matrix = _finite(matrix)
+    free = [i for i in range(n) if i != start and i != end]
+
+    if len(free) <= EXACT_MAX_STOPS:
+        order = _held_karp(matrix, free, start, end)
+    else:
+        order = _local_search(matrix, free, start, end, time_budget_s, seed)
+
+    logger.debug(f"Route order for {n} stops: cost {route_cost(matrix, order):.1f}")
+    return order
+
+
+def _finite(matrix: np.ndarray) -> np.ndarray:
+    """Replace unreachable pairs with a penalty larger than any real route"""
+    finite = np.isfinite(matrix)
+    if finite.all():
+        return matrix
+    penalty = (np.abs(matrix[finite]).max() if finite.any() else 1.0) * matrix.shape[0] + 1.0
+    return np.where(finite, matrix, penalty)
+
+
+def _held_karp(matrix: np.ndarray, free: List[int],
+               start: Optional[int], end: Optional[int]) -> List[int]:
+    """Exact open-path TSP by dynamic programming over subsets of free stops"""
+    k = len(free)
+    fixed = ([start] if start is not None else []) + ([end] if end is not None else [])
+    if k == 0:
+        return fixed
+
+    idx = np.asarray(free, dtype=np.int64)
+    sub = matrix[np.ix_(idx, idx)]
+    bits = 1 << np.arange(k, dtype=np.int64)
+
+    # cost[mask, j]: cheapest path over the stops in mask that ends at free stop j
+    cost = np.full((1 << k, k), np.inf)
+    parent = np.full((1 << k, k), -1, dtype=np.int8)
+    cost[bits, np.arange(k)] = matrix[start, idx] if start is not None else 0.0
+
+    masks = np.arange(1 << k, dtype=np.int64)
+    popcount = np.zeros(1 << k, dtype=np.int64)
+    for b in bits:
+        popcount += (masks & b) > 0
+
+    for size in range(2, k + 1):
+        layer = masks[popcount == size]
+        previous = layer[:, None] ^ bits[None, :]              # (M, j)
+        # candidates[m, j, i] = cost[mask - j, i] + sub[i, j]
+        candidates = cost[previous] + sub.T[None, :, :]
+        best = candidates.argmin(axis=2)
+        values = np.take_along_axis(candidates, best[:, :, None], axis=2)[:, :, 0]
+        in_mask = (layer[:, None] & bits[None, :]) > 0
+        cost[layer] = np.where(in_mask, values, np.inf)
+        parent[layer] = np.where(in_mask, best, -1)
+
+    full = (1 << k) - 1
+    final = cost[full] + (matrix[idx, end] if end is not None else 0.0)
+    last = int(final.argmin())
+
+    path = []
+    mask = full
+    while last >= 0:
+        path.append(int(idx[last]))
+        previous = int(parent[mask, last])
+        mask ^= 1 << last
+        last = previous if mask else -1
+    path.reverse()
+
+    return ([start] if start is not None else []) + path + ([end] if end is not None else [])
+
+
+def _local_search(matrix: np.ndarray, free: List[int], start: Optional[int], end: Optional[int],
+                  time_budget_s: float, seed: int) -> List[int]:
+    """Nearest-neighbour seed improved by 2-opt / Or-opt within a time budget"""
+    deadline = time.perf_counter() + time_budget_s
+    n = matrix.shape[0]
+
+    # Pad with a dummy node n that costs nothing to leave or enter, so the
+    # open path becomes the fixed cycle dummy -> ... -> dummy.
+    padded = np.zeros((n + 1, n + 1))
+    padded[:n, :n] = matrix
+
+    tour = np.asarray([n] + _nearest_neighbour(matrix, free, start, end) + [n], dtype=np.int64)
+    lo = 2 if start is not None else 1                  # first movable position
+    hi = len(tour) - (3 if end is not None else 2)      # last movable position
+
+    tour = _descend(padded, tour, lo, hi, deadline)
+    best, best_cost = tour, route_cost(padded, tour)
+
+    rng = np.random.default_rng(seed)
+    stalled = 0
+    while hi - lo >= 7 and stalled < MAX_STALLED_ROUNDS and time.perf_counter() < deadline:
+        candidate = _descend(padded, _double_bridge(best, lo, hi, rng), lo, hi, deadline)
+        candidate_cost = route_cost(padded, candidate)
+        if candidate_cost < best_cost - 1e-9:
+            best, best_cost, stalled = candidate, candidate_cost, 0
+        else:
+            stalled += 1
+
+    return [int(node) for node in best[1:-1]]
+
+
+def _nearest_neighbour(matrix: np.ndarray, free: List[int],
+                       start: Optional[int], end: Optional[int]) -> List[int]:
+    """Greedy seed tour; without a fixed start it begins at the first free stop"""
+    remaining = np.zeros(matrix.shape[0], dtype=bool)
+    remaining[free] = True
+    order = [start] if start is not None else []
+    current = start
+    if current is None:
+        current = free[0]
+        order.append(current)
+        remaining[current] = False
+
+    while remaining.any():
+        current = int(np.where(remaining, matrix[current], np.inf).argmin())
+        order.append(current)
+        remaining[current] = False
+
+    if end is not None:
+        order.append(end)
+    return order
+
+
+def _descend(matrix: np.ndarray, tour: np.ndarray, lo: int, hi: int, deadline: float) -> np.ndarray:
+    """Apply the best improving 2-opt or Or-opt move until none is left"""
+    while time.perf_counter() < deadline:
+        improved = _best_two_opt(matrix, tour, lo, hi)
+        if improved is None:
+            improved = _best_or_opt(matrix, tour, lo, hi)
+        if improved is None:
+            break
+        tour = improved
+    return tour
+
+
+def _best_two_opt(matrix: np.ndarray, tour: np.ndarray, lo: int, hi: int) -> Optional[np.ndarray]:
+    """Reverse the segment tour[i..j] that saves most; reversal costs count on asymmetric input"""
+    forward = matrix[tour[:-1], tour[1:]]
+    backward = matrix[tour[1:], tour[:-1]]
+    forward_prefix = np.concatenate(([0.0], np.cumsum(forward)))
+    backward_prefix = np.concatenate(([0.0], np.cumsum(backward)))
+
+    positions = np.arange(lo, hi + 1)
+    i = positions[:, None]
+    j = positions[None, :]
+    # Edges inside the segment are forward[i..j-1]; reversed they cost backward[i..j-1]
+    inner = (backward_prefix[j] - backward_prefix[i]) - (forward_prefix[j] - forward_prefix[i])
+    delta = (matrix[tour[i - 1], tour[j]] + matrix[tour[i], tour[j + 1]]
+             - forward[i - 1] - forward[j] + inner)
+    delta = np.where(j > i, delta, 0.0)
+
+    flat = int(delta.argmin())
+    a, b = divmod(flat, len(positions))
+    if delta[a, b] >= -1e-9:
+        return None
+    i, j = lo + a, lo + b
+    return np.concatenate((tour[:i], tour[i:j + 1][::-1], tour[j + 1:]))
+
+
+def _best_or_opt(matrix: np.ndarray, tour: np.ndarray, lo: int, hi: int) -> Optional[np.ndarray]:
+    """Move a run of 1-3 consecutive stops to the position where it saves most"""
+    forward = matrix[tour[:-1], tour[1:]]
+    best_delta, best_move = -1e-9, None
+
+    for length in (1, 2, 3):
+        if hi - lo + 1 <= length:
+            break
+        first = np.arange(lo, hi - length + 2)              # segment tour[i..i+length-1]
+        last = first + length - 1
+        removal = (matrix[tour[first - 1], tour[last + 1]]
+                   - forward[first - 1] - forward[last])
+        gaps = np.arange(lo - 1, hi + 1)                     # insert between tour[p] and tour[p+1]
+        insertion = (matrix[tour[gaps][None, :], tour[first][:, None]]
+                     + matrix[tour[last][:, None], tour[gaps + 1][None, :]]
+                     - forward[gaps][None, :])
+        delta = removal[:, None] + insertion
+        overlaps = (gaps[None, :] >= first[:, None] - 1) & (gaps[None, :] <= last[:, None])
+        delta = np.where(overlaps, np.inf, delta)
+
+        flat = int(delta.argmin())
+        a, b = divmod(flat, len(gaps))
+        if delta[a, b] < best_delta:
+            best_delta, best_move = delta[a, b], (int(first[a]), length, int(gaps[b]))
+
+    if best_move is None:
+        return None
+    i, length, p = best_move
+    segment = tour[i:i + length]
+    rest = np.concatenate((tour[:i], tour[i + length:]))
+    insert_at = p + 1 if p < i else p + 1 - length
+    return np.concatenate((rest[:insert_at], segment, rest[insert_at:]))
+
+
+def _double_bridge(tour: np.ndarray, lo: int, hi: int, rng: np.random.Generator) -> np.ndarray:
+    """Reconnect three random cuts of the movable part (A B C D -> A C B D)"""
+    a, b, c = np.sort(rng.choice(np.arange(lo + 1, hi + 1), size=3, replace=False))
+    return np.concatenate((tour[:a], tour[b:c], tour[a:b], tour[c:]))
@@ -33,6 +33,7 @@ import time
 import hashlib
 from functools import wraps
 from elevation_service import ElevationService
+from route_geometry import LOD_ZOOMS, build_lod, select_lod, simplify_for_view
 
 logger = logging.getLogger(__name__)
 
@@ -112,6 +113,8 @@ class RouteService:
                 self.connection_string = f"postgresql://{user}:{password}@{host}:{port}/{database}"
         
         self.conn = None
+        # False once a query shows the geometry_lod column is missing (migration not run)
+        self.geometry_lod_available = True
     
     def connect(self):
         """Veritabanına bağlan"""
@@ -775,6 +778,10 @@ class RouteService:
                 self.conn.commit()
                 logger.info("Transaction committed")
 
+            # Zoom seviyeleri için sadeleştirilmiş geometriyi önceden hesapla;
+            # okuma sırasında sadeleştirme yapılmaz
+            self._save_geometry_lod(route_id, [(lat, lng) for lng, lat in linestring_coords])
+
             # Verify the update
             verify_query = "SELECT route_geometry IS NOT NULL as has_geometry FROM routes WHERE id = %s;"
             verify_result = self._execute_query(verify_query, (route_id,), fetch_one=True)
@@ -792,17 +799,79 @@ class RouteService:
                 self.conn.rollback()
             return False
     
-    def get_route_geometry(self, route_id: int) -> Optional[Dict]:
+    def _save_geometry_lod(self, route_id: int, coords: List[Tuple[float, float]]) -> bool:
+        """
+        Sadeleştirilmiş geometri seviyelerini (geometry_lod) kaydet.
+
+        Ayrı bir sorgu olarak çalışır; kolon henüz eklenmemişse ana kayıt
+        etkilenmez.
+        """
+        if not self.geometry_lod_available:
+            return False
+        query = "UPDATE routes SET geometry_lod = %s WHERE id = %s;"
+        result = self._execute_query(query, (Json(build_lod(coords)), route_id), fetch_all=False)
+        if result is None:
+            logger.warning("geometry_lod not saved; run add_route_geometry_lod.py")
+            self.geometry_lod_available = False
+            return False
+        return True
+
+    def _get_route_geometry_lod(self, route_id: int, zoom: float) -> Optional[Dict]:
+        """Precomputed geometry for a zoom level, or None when full geometry is needed"""
+        if not self.geometry_lod_available:
+            return None
+        query = """
+            SELECT geometry_lod, total_distance, estimated_duration, waypoints
+            FROM routes
+            WHERE id = %s AND route_geometry IS NOT NULL;
+        """
+        result = self._execute_query(query, (route_id,), fetch_one=True)
+        if result is None:
+            # Missing route and missing column look the same here; the
+            # column check only runs once per service
+            self.geometry_lod_available = self._has_geometry_lod_column()
+            return None
+
+        level = select_lod(result['geometry_lod'], zoom)
+        if level is None:
+            return None
+        lod_zoom, coords = level
+        return {
+            'route_id': route_id,
+            'geometry': {'type': 'LineString', 'coordinates': [[lng, lat] for lat, lng in coords]},
+            'total_distance': result['total_distance'],
+            'estimated_duration': result['estimated_duration'],
+            'waypoints': result['waypoints'] or [],
+            'lod_zoom': lod_zoom
+        }
+
+    def _has_geometry_lod_column(self) -> bool:
+        query = """
+            SELECT 1 FROM information_schema.columns
+            WHERE table_name = 'routes' AND column_name = 'geometry_lod';
+        """
+        return bool(self._execute_query(query, fetch_one=True))
+
+    def get_route_geometry(self, route_id: int, zoom: Optional[float] = None,
+                           tolerance: Optional[float] = None) -> Optional[Dict]:
         """
         Rota geometrisini getir
         
         Args:
             route_id: Rota ID'si
+            zoom: Harita zoom seviyesi; kayıtlı sadeleştirilmiş seviye seçilir
+            tolerance: Sadeleştirme toleransı (metre); zoom yerine kullanılır
             
         Returns:
             Rota geometrisi veya None
         """
         try:
+            if zoom is not None and tolerance is None:
+                geometry_data = self._get_route_geometry_lod(route_id, zoom)
+                if geometry_data:
+                    logger.info(f"Retrieved geometry for route {route_id} (zoom {zoom} -> level {geometry_data['lod_zoom']})")
+                    return geometry_data
+
             query = """
                 SELECT 
                     ST_AsGeoJSON(route_geometry) as geometry,
@@ -823,6 +892,16 @@ class RouteService:
                     'estimated_duration': result['estimated_duration'],
                     'waypoints': result['waypoints'] or []
                 }
+
+                geometry = geometry_data['geometry']
+                # Zooms deeper than the finest stored level get full geometry
+                simplify_needed = tolerance is not None or (zoom is not None and zoom <= max(LOD_ZOOMS))
+                if simplify_needed and geometry and geometry.get('type') == 'LineString':
+                    # Kayıtlı seviye yok (eski kayıt) ya da özel tolerans: anında sadeleştir
+                    coords = [(lat, lng) for lng, lat, *_ in geometry['coordinates']]
+                    simplified = simplify_for_view(coords, tolerance, zoom)
+                    geometry['coordinates'] = simplified[:, ::-1].tolist()
+                    geometry_data['simplified'] = True
                 
                 logger.info(f"Retrieved geometry for route {route_id}")
                 return geometry_data
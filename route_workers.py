@@ -0,0 +1,308 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Rota Hesaplama Süreç Havuzu
+CPU yoğun rota, mesafe matrisi, erişilebilirlik (sınırlı Dijkstra) ve durak
+sırası (TSP) hesaplarını Flask worker thread'inden ayrı bir süreç havuzuna
+taşır.
+
+Dijkstra / CH aramaları saf Python döngüleridir ve süre boyunca GIL'i
+tutar; aynı süreçte çalışınca pahalı bir araç rotası /api/pois gibi ucuz
+okumaları da bekletir. Havuzda istek thread'i yalnızca sonucu bekler (GIL
+serbest kalır).
+
+- Worker süreçleri derlenmiş graph dosyasını yoluyla mmap ile açar; graph
+  sayfaları işletim sisteminin sayfa önbelleğinden paylaşılır, görevlerle
+  graph kopyalanmaz. Graph sürümü değişince worker dosyayı yeniden açar.
+  Diskteki sürüm isteğin düğümleri oturttuğu sürümden farklıysa (graph
+  yeniden yükleme sırasında) worker hesap yapmaz; görev
+  StaleGraphVersionError ile döner ve istek kendi graph'ında aynı süreçte
+  hesaplanır.
+- Her isteğin bir zaman aşımı vardır (RouteTimeoutError). Zaman aşımına
+  uğrayan görev worker'da bitene kadar kapasiteyi kullanmaya devam eder.
+- Bekleyen iş sayısı sınırlıdır; havuz doluysa istek hemen
+  RoutePoolSaturatedError ile reddedilir (uç noktalar 503 döner).
+  Doluluk stats() ile raporlanır.
+- POI_ROUTE_WORKERS=0 veya dosyadan yüklenmemiş (bellekteki) graph'lar
+  için hesap aynı süreçte yapılır.
+
+Worker'lar forkserver/spawn ile başlatıldığından ana modül worker'da
+``__mp_main__`` olarak yeniden içe aktarılır; sunucu ve havuz başlatma kodu
+bu durumda çalışmamalıdır (bkz. poi_api sonundaki start_background_services).
+"""
+
+import logging
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeoutError
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from route_optimizer import optimize_order
+from routing_engine import NoPathError, RouteLeg, RoutingGraph
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_WORKERS = int(os.getenv('POI_ROUTE_WORKERS', str(min(4, os.cpu_count() or 1))))
+DEFAULT_TIMEOUT_S = float(os.getenv('POI_ROUTE_TIMEOUT', '20'))
+# Requests allowed in the pool (running + queued) per worker before rejecting
+PENDING_PER_WORKER = 4
+
+
+class RoutePoolError(RuntimeError):
+    """Route computation could not be completed by the process pool"""
+
+
+class RoutePoolSaturatedError(RoutePoolError):
+    """Too many route computations are already pending"""
+
+
+class RouteTimeoutError(RoutePoolError):
+    """A route computation did not finish within its timeout"""
+
+
+class StaleGraphVersionError(RoutePoolError):
+    """The worker's graph file is not the version the request's node indices refer to"""
+
+
+# ----------------------------------------------------------------------
+# Worker side
+# ----------------------------------------------------------------------
+
+# Graphs opened by this worker process, keyed by compiled file path
+_worker_graphs: Dict[str, RoutingGraph] = {}
+
+
+def _open_graph(path: str, version: str) -> RoutingGraph:
+    graph = _worker_graphs.get(path)
+    # Reopen only when the file was replaced
+    if graph is None or (graph.version != version and graph.file_changed()):
+        graph = RoutingGraph.load(path)
+        _worker_graphs[path] = graph
+    # Node indices are only meaningful on the graph they were snapped on
+    if graph.version != version:
+        raise StaleGraphVersionError(f"Worker has graph {graph.version or '?'} of {path}, request needs {version}")
+    return graph
+
+
+def _route_legs(graph: RoutingGraph, pairs: List[Tuple[int, int]],
+                with_geometry: bool) -> List[Optional[RouteLeg]]:
+    legs = []
+    for source, target in pairs:
+        try:
+            legs.append(graph.route_leg(int(source), int(target), with_geometry=with_geometry))
+        except NoPathError:
+            legs.append(None)
+    return legs
+
+
+def _route_legs_task(path, version, pairs, with_geometry):
+    return _route_legs(_open_graph(path, version), pairs, with_geometry)
+
+
+def _distance_matrix_task(path, version, sources, targets):
+    return _open_graph(path, version).distance_matrix(sources, targets)
+
+
+def _reachable_task(path, version, source, max_duration_s, max_length_m):
+    return _open_graph(path, version).reachable(source, max_duration_s=max_duration_s, max_length_m=max_length_m)
+
+
+# ----------------------------------------------------------------------
+# Request side
+# ----------------------------------------------------------------------
+
+class RouteWorkerPool:
+    """
+    Rota hesapları için sınırlı, zaman aşımlı süreç havuzu.
+
+    Args:
+        workers: Worker süreç sayısı (0: aynı süreçte hesapla)
+        timeout_s: Varsayılan istek zaman aşımı
+        max_pending: Aynı anda havuzda bulunabilecek iş sayısı (çalışan + kuyruk)
+    """
+
+    def __init__(self, workers: int = DEFAULT_WORKERS, timeout_s: float = DEFAULT_TIMEOUT_S,
+                 max_pending: Optional[int] = None):
+        self.workers = max(0, workers)
+        self.timeout_s = timeout_s
+        self.max_pending = max_pending or max(1, self.workers) * PENDING_PER_WORKER
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._lock = threading.Lock()
+        self.in_flight = 0
+        self.peak_in_flight = 0
+        self.submitted = 0
+        self.completed = 0
+        self.failed = 0
+        self.timeouts = 0
+        self.rejected = 0
+        self.inline = 0
+        self.stale = 0
+        self._waits = 0
+        self._wait_ms_total = 0.0
+
+    def _get_executor(self) -> Optional[ProcessPoolExecutor]:
+        if self.workers == 0:
+            return None
+        with self._lock:
+            if self._executor is None:
+                methods = multiprocessing.get_all_start_methods()
+                # forkserver/spawn: the Flask process is multi-threaded, fork is not safe
+                context = multiprocessing.get_context('forkserver' if 'forkserver' in methods else 'spawn')
+                self._executor = ProcessPoolExecutor(max_workers=self.workers, mp_context=context)
+            return self._executor
+
+    def start(self):
+        """Worker süreçlerini önceden başlat (ilk rota isteği beklemesin)"""
+        executor = self._get_executor()
+        if executor is not None:
+            for _ in range(self.workers):
+                executor.submit(os.getpid)
+
+    def shutdown(self, wait: bool = True):
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=wait, cancel_futures=True)
+
+    def _run(self, task: Callable, args: tuple, inline: Callable[[], Any],
+             timeout_s: Optional[float], use_pool: bool = True):
+        executor = self._get_executor() if use_pool else None
+        if executor is None:
+            with self._lock:
+                self.inline += 1
+            return inline()
+
+        with self._lock:
+            if self.in_flight >= self.max_pending:
+                self.rejected += 1
+                raise RoutePoolSaturatedError(
+                    f"Route pool saturated: {self.in_flight} computations pending on {self.workers} workers")
+            self.in_flight += 1
+            self.submitted += 1
+            self.peak_in_flight = max(self.peak_in_flight, self.in_flight)
+
+        started = time.perf_counter()
+        try:
+            future = executor.submit(task, *args)
+        except (BrokenProcessPool, RuntimeError) as e:
+            self._task_done(None)
+            self._reset_executor(executor)
+            raise RoutePoolError(f"Route pool unavailable: {e}")
+        future.add_done_callback(self._task_done)
+
+        timeout_s = self.timeout_s if timeout_s is None else timeout_s
+        try:
+            return future.result(timeout=timeout_s)
+        except StaleGraphVersionError as e:
+            # Graph hot reload between snapping and the task: use the request's own graph
+            logger.info(f"🔄 {e}; computing in the request process")
+            with self._lock:
+                self.stale += 1
+                self.inline += 1
+            return inline()
+        except FutureTimeoutError:
+            future.cancel()  # only effective while still queued
+            with self._lock:
+                self.timeouts += 1
+            raise RouteTimeoutError(f"Route computation exceeded {timeout_s:.0f}s")
+        except BrokenProcessPool as e:
+            self._reset_executor(executor)
+            raise RoutePoolError(f"Route worker crashed: {e}")
+        finally:
+            with self._lock:
+                self._waits += 1
+                self._wait_ms_total += (time.perf_counter() - started) * 1000
+
+    def _task_done(self, future):
+        with self._lock:
+            self.in_flight -= 1
+            if future is None or future.cancelled() or future.exception() is not None:
+                self.failed += 1
+            else:
+                self.completed += 1
+
+    def _reset_executor(self, broken: ProcessPoolExecutor):
+        with self._lock:
+            if self._executor is broken:
+                self._executor = None
+        broken.shutdown(wait=False, cancel_futures=True)
+
+    # ------------------------------------------------------------------
+    # Computations
+    # ------------------------------------------------------------------
+
+    def route_legs(self, graph: RoutingGraph, pairs: List[Tuple[int, int]], with_geometry: bool = True,
+                   timeout_s: Optional[float] = None) -> List[Optional[RouteLeg]]:
+        """Route every (source, target) pair in one task; None where there is no path"""
+        pairs = [(int(s), int(t)) for s, t in pairs]
+        if not pairs:
+            return []
+        return self._run(_route_legs_task, (graph.path, graph.version, pairs, with_geometry),
+                         lambda: _route_legs(graph, pairs, with_geometry), timeout_s,
+                         use_pool=graph.path is not None)
+
+    def distance_matrix(self, graph: RoutingGraph, sources: List[int], targets: Optional[List[int]] = None,
+                        timeout_s: Optional[float] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """graph.distance_matrix() computed in a worker"""
+        sources = [int(s) for s in sources]
+        targets = sources if targets is None else [int(t) for t in targets]
+        return self._run(_distance_matrix_task, (graph.path, graph.version, sources, targets),
+                         lambda: graph.distance_matrix(sources, targets), timeout_s,
+                         use_pool=graph.path is not None)
+
+    def reachable(self, graph: RoutingGraph, source: int, max_duration_s: Optional[float] = None,
+                  max_length_m: Optional[float] = None,
+                  timeout_s: Optional[float] = None) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """graph.reachable() (bounded search for isochrones / travel trees) computed in a worker"""
+        source = int(source)
+        return self._run(_reachable_task, (graph.path, graph.version, source, max_duration_s, max_length_m),
+                         lambda: graph.reachable(source, max_duration_s=max_duration_s, max_length_m=max_length_m),
+                         timeout_s, use_pool=graph.path is not None)
+
+    def optimize_order(self, matrix, start: Optional[int] = None, end: Optional[int] = None,
+                       time_budget_s: float = 0.2, timeout_s: Optional[float] = None) -> List[int]:
+        """route_optimizer.optimize_order() computed in a worker"""
+        matrix = np.asarray(matrix, dtype=np.float64)
+        return self._run(optimize_order, (matrix, start, end, time_budget_s),
+                         lambda: optimize_order(matrix, start, end, time_budget_s), timeout_s)
+
+    def stats(self) -> Dict[str, Any]:
+        """Doluluk bilgisi: çalışan/kuyruktaki iş, reddedilen ve zaman aşımına uğrayan istekler"""
+        with self._lock:
+            busy = min(self.in_flight, self.workers)
+            return {
+                'workers': self.workers,
+                'max_pending': self.max_pending,
+                'in_flight': self.in_flight,
+                'queued': max(0, self.in_flight - self.workers),
+                'utilization': round(busy / self.workers, 3) if self.workers else 0.0,
+                'saturated': self.workers > 0 and self.in_flight >= self.workers,
+                'peak_in_flight': self.peak_in_flight,
+                'submitted': self.submitted,
+                'completed': self.completed,
+                'failed': self.failed,
+                'timeouts': self.timeouts,
+                'rejected': self.rejected,
+                'inline': self.inline,
+                'stale': self.stale,
+                'avg_wait_ms': round(self._wait_ms_total / self._waits, 1) if self._waits else 0.0,
+                'timeout_s': self.timeout_s,
+            }
+
+
+_default_pool: Optional[RouteWorkerPool] = None
+_default_pool_lock = threading.Lock()
+
+
+def get_route_pool() -> RouteWorkerPool:
+    """Süreç genelindeki rota havuzu (POI_ROUTE_WORKERS, POI_ROUTE_TIMEOUT ile ayarlanır)"""
+    global _default_pool
+    with _default_pool_lock:
+        if _default_pool is None:
+            _default_pool = RouteWorkerPool()
+        return _default_pool
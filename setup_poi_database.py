@@ -194,6 +194,10 @@ def setup_postgresql_database(connection_string):
         cur.execute("CREATE INDEX IF NOT EXISTS idx_poi_ratings_poi_id ON poi_ratings(poi_id);")
         cur.execute("CREATE INDEX IF NOT EXISTS idx_poi_ratings_category ON poi_ratings(category);")
         
+        # POI başına tek satırlık puan tablosu (poi_ratings tetikleyicisiyle güncellenir)
+        from poi_database_adapter import install_rating_pivot
+        install_rating_pivot(conn)
+        
         print("✅ Tablolar ve indeksler oluşturuldu")
         
         # Kategorileri ekle
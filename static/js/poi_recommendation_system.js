@@ -4496,8 +4496,10 @@ function showRouteInfo(routeInfo) {
     }
 
     if (routeInfoDiv) {
-        const networkIcon = routeInfo.network_type === 'walking' ? '🚶' : '🚗';
-        const networkName = routeInfo.network_type === 'walking' ? 'Yürüyüş Rotası' : 'Araba Rotası';
+        const networkIcon = routeInfo.network_type === 'walking' ? '🚶' :
+            routeInfo.network_type === 'multimodal' ? '🚶🚗' : '🚗';
+        const networkName = routeInfo.network_type === 'walking' ? 'Yürüyüş Rotası' :
+            routeInfo.network_type === 'multimodal' ? 'Yürüyüş + Araba Rotası' : 'Araba Rotası';
 
         routeInfoDiv.innerHTML = `
                     <h6 style="margin: 0 0 10px 0; color: #27ae60; font-size: 14px;">
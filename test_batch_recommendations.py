@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+"""
+Unit tests for /api/recommendations/batch
+Profiles are sent as JSON or NDJSON; results stream back as NDJSON lines
+"""
+
+import json
+import random
+import unittest
+from unittest.mock import patch
+
+from poi_rating_matrix import RATING_FIELDS, PoiRatingMatrix
+
+
+class TestBatchRecommendations(unittest.TestCase):
+    """Toplu öneri uç noktası testleri"""
+
+    @classmethod
+    def setUpClass(cls):
+        import poi_api
+
+        cls.poi_api = poi_api
+        cls.client = poi_api.app.test_client()
+        rng = random.Random(1)
+        cls.pois = [dict({field: rng.choice([0, 20, 50, 80, 100]) for field in RATING_FIELDS},
+                         id=i, name=f'POI {i}', category='tarihi', latitude=38.63, longitude=34.91)
+                    for i in range(60)]
+
+    def setUp(self):
+        self.matrix = PoiRatingMatrix(lambda: self.pois)
+        patcher = patch.object(self.poi_api, 'RATING_MATRIX', self.matrix)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def lines(self, response):
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.mimetype, 'application/x-ndjson')
+        return [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+
+    def test_json_profiles_stream_top_k_per_profile(self):
+        profiles = [{'id': 'guest-1', 'preferences': {'tarihi': 100, 'doga': 40}},
+                    {'yemek': 80},
+                    {'id': 'guest-3', 'preferences': {'tarihi': 'much'}}]
+        lines = self.lines(self.client.post('/api/recommendations/batch', json={'profiles': profiles, 'limit': 5}))
+
+        self.assertEqual([(line['index'], line['id']) for line in lines], [(0, 'guest-1'), (1, None), (2, 'guest-3')])
+        self.assertEqual(lines[0]['recommendations'], self.matrix.recommend({'tarihi': 100, 'doga': 40}, limit=5))
+        self.assertEqual(lines[1]['total'], 5)
+        self.assertIn('error', lines[2])
+
+    def test_ndjson_profiles_and_limits(self):
+        body = '\n'.join([json.dumps({'id': 7, 'preferences': {'spor': 90}}), '{broken', json.dumps({'doga': 50}), ''])
+        with patch.object(self.poi_api, 'MAX_BATCH_PROFILES', 2):
+            # The body is generated while the response is read
+            lines = self.lines(self.client.post('/api/recommendations/batch?limit=3', data=body,
+                                                content_type='application/x-ndjson'))
+        self.assertEqual(lines[0]['recommendations'], self.matrix.recommend({'spor': 90}, limit=3))
+        self.assertTrue(lines[1]['error'].startswith('Invalid JSON line'))
+        # The third profile is over the limit
+        self.assertEqual(lines[2], {'index': 2, 'error': 'At most 2 profiles per request'})
+
+        self.assertEqual(self.client.post('/api/recommendations/batch', json={'profiles': [], 'limit': 0}).status_code, 400)
+        self.assertEqual(self.client.post('/api/recommendations/batch', json={'preferences': {}}).status_code, 400)
+        # Valid JSON that is not an object
+        for body in ([{'tarihi': 100}], 'x'):
+            response = self.client.post('/api/recommendations/batch', json=body)
+            self.assertEqual(response.status_code, 400)
+            self.assertIn('profiles', response.get_json()['error'])
+
+
+if __name__ == '__main__':
+    unittest.main()
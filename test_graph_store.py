@@ -0,0 +1,149 @@
+#!/usr/bin/env python3
+"""
+Unit tests for the hot-reloadable graph store
+Graphs are written as compiled files; no GraphML parsing is involved
+"""
+
+import os
+import shutil
+import tempfile
+import threading
+import unittest
+from unittest.mock import patch
+
+from graph_store import GraphLoadingError, GraphStore, GraphUnavailableError
+from routing_engine import RoutingGraph, compiled_graph_path
+from test_routing_engine import build_grid_graph
+
+
+class TestGraphStore(unittest.TestCase):
+    """Graph deposu testleri"""
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        # Only the compiled file exists, as on a deployed worker
+        self.source_path = os.path.join(self.tmpdir, 'walking.graphml')
+        self.store = GraphStore(poll_interval_s=3600, wait_s=5)
+        self.store.register('walking', self.source_path)
+
+    def tearDown(self):
+        self.store.stop(timeout=5)
+        shutil.rmtree(self.tmpdir)
+
+    def write_graph(self, rows, sha):
+        graph = RoutingGraph.from_networkx(build_grid_graph(rows=rows, cols=rows, seed=rows), name='walking')
+        graph.save(compiled_graph_path(self.source_path), metadata={'source_sha256': sha * 64})
+
+    def test_get_waits_for_background_load(self):
+        self.write_graph(4, 'a')
+        self.assertEqual(self.store.status()['walking']['state'], 'loading')
+        # get() never starts loading by itself
+        with self.assertRaises(GraphLoadingError):
+            self.store.get('walking', wait_s=0)
+        self.assertIsNone(self.store._thread)
+
+        self.store.start()
+        graph = self.store.get('walking')
+        self.assertEqual(graph.version, 'a' * 12)
+        self.assertEqual(graph.node_count, 16)
+        self.assertTrue(self.store._thread.is_alive())
+
+        status = self.store.status()['walking']
+        self.assertEqual((status['state'], status['version'], status['reloads']), ('ready', 'a' * 12, 0))
+
+    def test_changed_file_is_swapped_atomically(self):
+        """In-flight requests keep their graph; new requests see the new version"""
+        self.write_graph(4, 'a')
+        self.store.refresh()
+        in_flight = self.store.get('walking')
+        self.assertEqual(self.store.refresh(), [])
+
+        self.write_graph(5, 'b')
+        self.assertEqual(self.store.refresh(), ['walking'])
+        current = self.store.get('walking')
+        self.assertEqual(current.version, 'b' * 12)
+        self.assertEqual(current.node_count, 25)
+        self.assertEqual(self.store.status()['walking']['reloads'], 1)
+
+        # The replaced graph's mmap is still readable
+        self.assertEqual(in_flight.version, 'a' * 12)
+        self.assertEqual(in_flight.route_leg(0, 15).nodes[-1], 15)
+
+    def test_broken_file_keeps_previous_graph(self):
+        self.write_graph(4, 'a')
+        self.store.refresh()
+        with open(compiled_graph_path(self.source_path), 'wb') as f:
+            f.write(b'not a graph')
+
+        self.assertEqual(self.store.refresh(), [])
+        self.assertEqual(self.store.get('walking').version, 'a' * 12)
+        self.assertIsNotNone(self.store.status()['walking']['error'])
+
+        self.write_graph(5, 'c')
+        self.assertEqual(self.store.refresh(), ['walking'])
+        self.assertIsNone(self.store.status()['walking']['error'])
+
+    def test_requests_do_not_wait_for_prewarm(self):
+        """While the background load (here: a download) runs, get() fails fast and ready() is False"""
+        release = threading.Event()
+
+        def download():
+            release.wait(10)
+            self.write_graph(4, 'a')
+
+        store = GraphStore(poll_interval_s=3600, wait_s=0)
+        store.register('walking', self.source_path, prepare=download)
+        try:
+            store.start()
+            self.assertFalse(store.ready())
+            with self.assertRaises(GraphLoadingError):
+                store.get('walking')
+            self.assertEqual(store.status()['walking']['state'], 'loading')
+
+            release.set()
+            self.assertEqual(store.get('walking', wait_s=10).version, 'a' * 12)
+            self.assertTrue(store.ready())
+        finally:
+            release.set()
+            store.stop(timeout=5)
+
+    def test_missing_graph_fails_fast(self):
+        """Request threads do not wait the full timeout when loading already failed"""
+        errors = []
+        self.store.start()
+
+        def request():
+            try:
+                self.store.get('walking', wait_s=30)
+            except GraphUnavailableError as e:
+                errors.append(e)
+
+        thread = threading.Thread(target=request)
+        thread.start()
+        thread.join(timeout=10)
+        self.assertFalse(thread.is_alive())
+        self.assertEqual(len(errors), 1)
+        self.assertEqual(self.store.status()['walking']['state'], 'unavailable')
+        with self.assertRaises(GraphUnavailableError):
+            self.store.get('cycling')
+
+    def test_ready_probe_has_no_side_effects(self):
+        from flask import Flask
+
+        from readiness import register_readiness
+
+        app = Flask(__name__)
+        register_readiness(app)
+        self.write_graph(4, 'a')
+        with patch('readiness.get_graph_store', return_value=self.store):
+            response = app.test_client().get('/ready')
+            self.assertEqual(response.status_code, 503)
+            self.assertIn('Retry-After', response.headers)
+            self.assertIsNone(self.store._thread)
+
+            self.store.refresh()
+            self.assertEqual(app.test_client().get('/ready').get_json(), {'ready': True, 'graphs': {'walking': 'ready'}})
+
+
+if __name__ == '__main__':
+    unittest.main()
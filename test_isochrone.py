@@ -0,0 +1,178 @@
+#!/usr/bin/env python3
+"""
+Unit tests for bounded searches and isochrones
+Reachable sets are compared against NetworkX Dijkstra with a cutoff
+"""
+
+import random
+import threading
+import time
+import unittest
+from unittest.mock import patch
+
+import networkx as nx
+import numpy as np
+
+from isochrone import IsochroneCache, compute_isochrone
+from route_workers import RoutePoolSaturatedError
+from routing_engine import RoutingGraph
+from test_routing_engine import build_grid_graph
+
+try:
+    import shapely
+except ImportError:  # pragma: no cover
+    shapely = None
+
+
+class TestIsochrone(unittest.TestCase):
+    """İzokron testleri"""
+
+    @classmethod
+    def setUpClass(cls):
+        cls.G = build_grid_graph(rows=10, cols=10, seed=11)
+        rng = random.Random(5)
+        # Mixed speeds so that the fastest and the shortest paths differ
+        for _, _, data in cls.G.edges(data=True):
+            data['travel_time'] = data['length'] / rng.choice((1.0, 1.4, 2.5))
+        cls.graph = RoutingGraph.from_networkx(cls.G, name='walking')
+        cls.graph.metadata['source_sha256'] = 'a' * 64
+        cls.source_id = 1000000 + 4 * 10 + 5
+        cls.source = cls.graph.index_of(cls.source_id)
+
+    def assertMatchesNetworkx(self, weight, budget, reached, costs):
+        expected = nx.single_source_dijkstra_path_length(self.G, self.source_id, cutoff=budget, weight=weight)
+        ids = self.graph.node_ids[reached].tolist()
+        self.assertEqual(sorted(ids), sorted(expected))
+        np.testing.assert_allclose(costs, [expected[i] for i in ids], rtol=1e-5)
+
+    def test_time_budget_matches_networkx(self):
+        nodes, lengths, durations = self.graph.reachable(self.source, max_duration_s=300)
+        self.assertMatchesNetworkx('travel_time', 300, nodes, durations)
+        self.assertEqual(nodes[0], self.source)
+        self.assertTrue(np.all(np.diff(durations) >= 0))
+
+    def test_length_budget_matches_networkx(self):
+        nodes, lengths, durations = self.graph.reachable(self.source, max_length_m=450)
+        self.assertMatchesNetworkx('length', 450, nodes, lengths)
+        with self.assertRaises(ValueError):
+            self.graph.reachable(self.source)
+
+    def test_polygon_and_lookup(self):
+        isochrone = compute_isochrone(self.graph, self.source, max_duration_s=240)
+        polygon = isochrone.geojson()
+        self.assertEqual(polygon['type'], 'Polygon')
+        ring = polygon['coordinates'][0]
+        self.assertEqual(ring[0], ring[-1])
+
+        if shapely is not None:
+            area = shapely.Polygon(ring).buffer(1e-4)
+            inside = shapely.contains_xy(area, self.graph.node_x[isochrone.nodes], self.graph.node_y[isochrone.nodes])
+            self.assertTrue(inside.all())
+
+        outside = next(i for i in range(self.graph.node_count) if i not in set(isochrone.nodes.tolist()))
+        lengths, durations = isochrone.lookup([self.source, outside])
+        self.assertEqual((lengths[0], durations[0]), (0.0, 0.0))
+        self.assertTrue(np.isinf(durations[1]))
+
+        # Travel costs only: same nodes, no hull
+        tree = compute_isochrone(self.graph, self.source, max_duration_s=240, with_polygon=False)
+        self.assertIsNone(tree.geojson())
+        self.assertEqual(tree.nodes.tolist(), isochrone.nodes.tolist())
+
+    def test_cache_buckets_and_versions(self):
+        """Budgets in the same bucket share an entry; a new graph version does not"""
+        cache = IsochroneCache(max_entries=2)
+        first, hit = cache.get(self.graph, self.source, max_duration_s=870)
+        self.assertFalse(hit)
+        self.assertEqual(first.budget, 900)
+        second, hit = cache.get(self.graph, self.source, max_duration_s=900)
+        self.assertTrue(hit)
+        self.assertIs(first, second)
+
+        rebuilt = RoutingGraph.from_networkx(self.G, name='walking')
+        rebuilt.metadata['source_sha256'] = 'b' * 64
+        _, hit = cache.get(rebuilt, self.source, max_duration_s=900)
+        self.assertFalse(hit)
+        cache.get(self.graph, self.source, max_length_m=120)
+        self.assertEqual(cache.stats()['evictions'], 1)
+
+    def test_concurrent_misses_share_one_search(self):
+        """Identical misses wait for the running search; the search function is pluggable"""
+        calls = []
+
+        def slow_reachable(graph, source, **budget):
+            calls.append((source, budget))
+            time.sleep(0.2)
+            return graph.reachable(source, **budget)
+
+        cache = IsochroneCache(with_polygon=False, reachable=slow_reachable)
+        results = []
+        threads = [threading.Thread(target=lambda budget=budget: results.append(
+            cache.get(self.graph, self.source, max_duration_s=budget)[0])) for budget in (150, 170, 180, 200)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        # 150-180 s fall into one bucket, 200 s into the next
+        self.assertEqual(sorted(budget['max_duration_s'] for _, budget in calls), [180, 240])
+        self.assertEqual(cache.stats()['coalesced'], 2)
+        self.assertEqual(len({id(isochrone) for isochrone in results}), 2)
+        expected = compute_isochrone(self.graph, self.source, max_duration_s=180, with_polygon=False)
+        self.assertIn(expected.nodes.tolist(), [isochrone.nodes.tolist() for isochrone in results])
+
+
+class TestIsochroneEndpoint(unittest.TestCase):
+    """/api/route/isochrone testleri"""
+
+    @classmethod
+    def setUpClass(cls):
+        import poi_api
+
+        cls.poi_api = poi_api
+        cls.client = poi_api.app.test_client()
+        cls.graph = RoutingGraph.from_networkx(build_grid_graph(rows=6, cols=6, seed=4), name='walking')
+        cls.graph.metadata['source_sha256'] = 'c' * 64
+
+    def test_search_runs_in_route_pool(self):
+        self.assertEqual(self.poi_api.ISOCHRONE_CACHE.reachable, self.poi_api.ROUTE_POOL.reachable)
+
+    def test_poi_nodes_are_reused_across_requests(self):
+        """Only new or moved POIs are snapped again; the response stays the same"""
+        pois = {index: (float(self.graph.node_y[index]), float(self.graph.node_x[index])) for index in range(36)}
+        origin = {'lat': pois[0][0], 'lng': pois[0][1], 'minutes': 3}
+        snapped = []
+        snap = self.graph.snap
+
+        def counting_snap(lats, lngs):
+            snapped.append(len(lats))
+            return snap(lats, lngs)
+
+        self.poi_api.ACTIVE_POI_NODES.clear()
+        with patch.object(self.poi_api, 'load_graph_for_mode', return_value=self.graph), \
+                patch.object(self.poi_api, 'load_active_poi_locations', side_effect=lambda: dict(pois)), \
+                patch.object(self.graph, 'snap', side_effect=counting_snap):
+            first = self.client.get('/api/route/isochrone', query_string=origin).get_json()['isochrone']
+            second = self.client.get('/api/route/isochrone', query_string=origin).get_json()['isochrone']
+            pois[35] = pois[1]
+            third = self.client.get('/api/route/isochrone', query_string=origin).get_json()['isochrone']
+        self.poi_api.ACTIVE_POI_NODES.clear()
+
+        # Origin + all POIs, then origin only, then origin + the moved POI
+        self.assertEqual(snapped, [1, 36, 1, 1, 1])
+        self.assertTrue(first['pois'])
+        self.assertEqual(first['pois'], second['pois'])
+        self.assertIn(35, [poi['id'] for poi in third['pois']])
+
+    def test_saturated_route_pool_returns_503(self):
+        origin = {'lat': float(self.graph.node_y[0]), 'lng': float(self.graph.node_x[0]), 'minutes': 5}
+        saturated = RoutePoolSaturatedError('Route pool saturated')
+        with patch.object(self.poi_api, 'load_graph_for_mode', return_value=self.graph), \
+                patch.object(self.poi_api.ISOCHRONE_CACHE, 'get', side_effect=saturated):
+            response = self.client.get('/api/route/isochrone', query_string=origin)
+        self.assertEqual(response.status_code, 503)
+        self.assertIn('Retry-After', response.headers)
+
+
+if __name__ == '__main__':
+    unittest.main()
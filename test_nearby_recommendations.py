@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+"""
+Unit tests for location and time-budget aware /api/recommendations
+POIs are placed on an in-memory walking grid; travel times come from its isochrones
+"""
+
+import unittest
+from unittest.mock import patch
+
+from graph_store import GraphLoadingError
+from poi_rating_matrix import RATING_FIELDS, PoiRatingMatrix
+from route_workers import RoutePoolSaturatedError
+from routing_engine import RoutingGraph
+from test_routing_engine import build_grid_graph
+
+
+class TestNearbyRecommendations(unittest.TestCase):
+    """Konum ve zaman bütçeli öneri testleri"""
+
+    @classmethod
+    def setUpClass(cls):
+        import poi_api
+
+        cls.poi_api = poi_api
+        cls.client = poi_api.app.test_client()
+        cls.walking = RoutingGraph.from_networkx(build_grid_graph(rows=8, cols=8, seed=2), name='walking')
+        cls.walking.metadata['source_sha256'] = 'e' * 64
+        cls.pois = []
+        for index in range(len(cls.walking.node_y)):
+            poi = {'id': index, 'name': f'POI {index}', 'category': 'tarihi',
+                   'latitude': float(cls.walking.node_y[index]), 'longitude': float(cls.walking.node_x[index])}
+            poi.update({field: 0 for field in RATING_FIELDS}, tarihi=40 + index % 3 * 25)
+            cls.pois.append(poi)
+        # Best rated, but ~25 km away
+        cls.pois.append(dict(cls.pois[0], id=999, name='Far', latitude=38.85, longitude=34.90, tarihi=100))
+
+    def recommend(self, body, graph_error=None):
+        matrix = PoiRatingMatrix(lambda: [dict(poi) for poi in self.pois])
+        routing_graph = patch.object(self.poi_api, 'routing_graph', side_effect=graph_error,
+                                     return_value=self.walking)
+        with patch.object(self.poi_api, 'RATING_MATRIX', matrix), routing_graph:
+            return self.client.post('/api/recommendations', json=dict(body, preferences={'tarihi': 100}))
+
+    def test_time_budget_limits_recommendations_to_reachable_pois(self):
+        origin = {'lat': float(self.walking.node_y[0]), 'lng': float(self.walking.node_x[0])}
+        response = self.recommend(dict(origin, time_budget=12))
+        self.assertEqual(response.status_code, 200)
+        body = response.get_json()
+        self.assertEqual((body['mode'], body['travel_source']), ('walking', 'network'))
+
+        # 12 minutes there and back: POIs within 6 minutes' walk on the network
+        nodes, _, _ = self.walking.reachable(0, max_duration_s=360)
+        self.assertLessEqual(len(nodes), 20)
+        self.assertEqual({poi['id'] for poi in body['recommendations']}, set(nodes.tolist()))
+        self.assertNotIn(999, [poi['id'] for poi in body['recommendations']])
+        self.assertTrue(all(poi['travel_time'] <= 6 for poi in body['recommendations']))
+        ranking = [poi['ranking_score'] for poi in body['recommendations']]
+        self.assertEqual(ranking, sorted(ranking, reverse=True))
+
+    def test_without_graph_straight_line_distances_are_used(self):
+        origin = {'lat': float(self.walking.node_y[0]), 'lng': float(self.walking.node_x[0])}
+        response = self.recommend(dict(origin, max_distance=0.3),
+                                  graph_error=GraphLoadingError('walking graph is loading'))
+        body = response.get_json()
+        self.assertEqual(body['travel_source'], 'straight_line')
+        self.assertTrue(body['recommendations'])
+        self.assertTrue(all(poi['travel_distance'] <= 0.3 for poi in body['recommendations']))
+
+    def test_saturated_route_pool_falls_back_to_straight_line(self):
+        origin = {'lat': float(self.walking.node_y[0]), 'lng': float(self.walking.node_x[0])}
+        saturated = RoutePoolSaturatedError('Route pool saturated')
+        with patch.object(self.poi_api.TRAVEL_TREE_CACHE, 'get', side_effect=saturated):
+            response = self.recommend(dict(origin, time_budget=12))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.get_json()['travel_source'], 'straight_line')
+
+    def test_without_location_ranking_is_unchanged(self):
+        response = self.recommend({})
+        self.assertEqual(response.get_json()['recommendations'][0]['id'], 999)
+        self.assertNotIn('travel_time', response.get_json()['recommendations'][0])
+
+        self.assertEqual(self.recommend({'time_budget': 60}).status_code, 400)
+        self.assertEqual(self.recommend({'lat': 38.63, 'lng': 34.91, 'time_budget': -5}).status_code, 400)
+        self.assertEqual(self.recommend({'lat': 38.63, 'lng': 34.91, 'mode': 'flying'}).status_code, 400)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+"""
+Unit tests for the POI change listener
+A socket pair stands in for the LISTEN connection
+"""
+
+import socket
+import threading
+import time
+import unittest
+from collections import namedtuple
+
+from poi_change_listener import PoiChangeListener, parse_change
+
+Notify = namedtuple('Notify', 'pid channel payload')
+
+
+class FakeListenConnection:
+    """psycopg2-like connection: readable when the peer socket writes"""
+
+    def __init__(self):
+        self.sock, self.peer = socket.socketpair()
+        self.notifies = []
+        self.queued = []
+        self.executed = []
+        self.autocommit = False
+
+    def fileno(self):
+        return self.sock.fileno()
+
+    def cursor(self):
+        conn = self
+
+        class Cursor:
+            def __enter__(self):
+                return self
+
+            def __exit__(self, *exc):
+                return False
+
+            def execute(self, sql):
+                conn.executed.append(sql)
+        return Cursor()
+
+    def notify(self, *payloads):
+        self.queued.extend(Notify(1, 'poi_changes', payload) for payload in payloads)
+        self.peer.send(b'x')
+
+    def poll(self):
+        self.sock.recv(1024)
+        self.notifies.extend(self.queued)
+        self.queued = []
+
+    def close(self):
+        self.sock.close()
+        self.peer.close()
+
+
+class TestPoiChangeListener(unittest.TestCase):
+    """POI değişiklik dinleyicisi testleri"""
+
+    def test_parse_change(self):
+        self.assertEqual(parse_change('poi_ratings:42'), 42)
+        self.assertEqual(parse_change('pois:7'), 7)
+        self.assertIsNone(parse_change('pois:'))
+        self.assertIsNone(parse_change('garbage'))
+
+    def test_notifications_are_batched(self):
+        conn = FakeListenConnection()
+        setups = []
+        batches = []
+        received = threading.Event()
+
+        def subscriber(poi_ids):
+            batches.append(poi_ids)
+            if poi_ids:
+                received.set()
+
+        listener = PoiChangeListener(lambda: conn, 'poi_changes', setup=setups.append, debounce_s=0.2)
+        listener.subscribe(subscriber)
+        listener.start()
+        try:
+            self.assertTrue(listener.connected.wait(5))
+            conn.notify('poi_ratings:5', 'poi_ratings:5')
+            time.sleep(0.05)
+            conn.notify('pois:7')
+            self.assertTrue(received.wait(5))
+        finally:
+            listener.stop()
+
+        self.assertEqual(setups, [conn])
+        self.assertTrue(conn.autocommit)
+        self.assertEqual(conn.executed, ['LISTEN poi_changes'])
+        # Connecting asks for a full refresh, then one batch for the burst
+        self.assertEqual(batches, [None, {5, 7}])
+        self.assertEqual(listener.stats()['notifications'], 3)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,181 @@
+#!/usr/bin/env python3
+"""
+Unit tests for the persisted POI distance table
+Incremental updates are compared against a table rebuilt from scratch
+"""
+
+import os
+import random
+import shutil
+import tempfile
+import threading
+import time
+import unittest
+from unittest.mock import patch
+
+import numpy as np
+
+from poi_distance_table import PoiDistanceTable, load_table, poi_distance_table_path, register_table
+from routing_engine import RoutingGraph
+from test_routing_engine import build_grid_graph
+
+
+class TestPoiDistanceTable(unittest.TestCase):
+    """POI mesafe tablosu testleri"""
+
+    @classmethod
+    def setUpClass(cls):
+        cls.graph = RoutingGraph.from_networkx(build_grid_graph(rows=9, cols=9, seed=4), name='walking').contract()
+        cls.graph.metadata['source_sha256'] = 'a' * 64
+        rng = random.Random(3)
+        nodes = rng.sample(range(cls.graph.node_count), 8)
+        cls.pois = {100 + i: (float(cls.graph.node_y[n]), float(cls.graph.node_x[n])) for i, n in enumerate(nodes)}
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def assertSameTable(self, table, expected):
+        order = [table.poi_ids.index(poi_id) for poi_id in expected.poi_ids]
+        np.testing.assert_allclose(table.lengths[np.ix_(order, order)], expected.lengths, atol=0.05)
+        np.testing.assert_allclose(table.durations[np.ix_(order, order)], expected.durations, atol=0.05)
+
+    def test_build_matches_distance_matrix(self):
+        """Bulk build equals the graph's many-to-many matrix"""
+        table = PoiDistanceTable.build(self.graph, self.pois, max_snap_distance_m=750)
+        lengths, durations = self.graph.distance_matrix(table.nodes.tolist())
+        np.testing.assert_allclose(table.lengths, lengths, atol=0.05)
+        np.testing.assert_allclose(table.durations, durations, atol=0.05)
+        self.assertEqual(table.lookup(100, 100), (0.0, 0.0))
+        self.assertIsNone(table.lookup(100, 999))
+
+    def test_incremental_updates_match_rebuild(self):
+        """Adding, moving and removing a POI only touches its row and column"""
+        table = PoiDistanceTable.build(self.graph, dict(list(self.pois.items())[:6]), max_snap_distance_m=750)
+        pois = dict(list(self.pois.items())[:6])
+
+        new_id, new_location = 106, self.pois[106]
+        self.assertTrue(table.upsert(self.graph, new_id, *new_location))
+        pois[new_id] = new_location
+        self.assertSameTable(table, PoiDistanceTable.build(self.graph, pois, 750))
+
+        moved = self.pois[107]
+        self.assertTrue(table.upsert(self.graph, 101, *moved))
+        self.assertFalse(table.upsert(self.graph, 101, *moved))
+        pois[101] = moved
+        self.assertSameTable(table, PoiDistanceTable.build(self.graph, pois, 750))
+
+        self.assertTrue(table.remove(103))
+        self.assertFalse(table.remove(103))
+        del pois[103]
+        self.assertSameTable(table, PoiDistanceTable.build(self.graph, pois, 750))
+
+    def test_matrix_mixes_table_and_live_search(self):
+        """Nodes outside the table are searched live and give the same matrix"""
+        table = PoiDistanceTable.build(self.graph, self.pois, max_snap_distance_m=750)
+        nodes = table.nodes[:4].tolist() + [0, self.graph.node_count - 1]
+        lengths, durations = table.distance_matrix(self.graph, nodes)
+        expected_lengths, expected_durations = self.graph.distance_matrix(nodes)
+        np.testing.assert_allclose(lengths, expected_lengths, atol=0.05)
+        np.testing.assert_allclose(durations, expected_durations, atol=0.05)
+        self.assertEqual(table.stats()['hits'], 4)
+        self.assertEqual(table.stats()['misses'], 2)
+
+    def test_persistence_and_graph_version(self):
+        """Saved tables reload, and a table from another graph version is ignored"""
+        path = poi_distance_table_path(self.tmpdir, 'walking')
+        table = PoiDistanceTable.build(self.graph, self.pois, max_snap_distance_m=750)
+        table.save(path)
+
+        loaded = load_table(path, self.graph)
+        self.assertIsNotNone(loaded)
+        self.assertEqual(loaded.poi_ids, [str(poi_id) for poi_id in self.pois])
+        np.testing.assert_array_equal(loaded.lengths, table.lengths)
+
+        loaded.remove(100)
+        loaded.save(path)
+        register_table(loaded)
+        self.assertNotIn(100, load_table(path, self.graph))
+
+        other = RoutingGraph.from_networkx(build_grid_graph(rows=5, cols=5, seed=9), name='walking')
+        other.metadata['source_sha256'] = 'b' * 64
+        self.assertIsNone(load_table(path, other))
+        self.assertIsNone(load_table(os.path.join(self.tmpdir, 'missing.npz'), self.graph))
+
+    def test_missing_table_is_built_in_background(self):
+        """Requests use live searches while the table is built off the request thread"""
+        import poi_api
+        from route_workers import RouteWorkerPool
+
+        nodes = self.graph.snap([lat for lat, _ in self.pois.values()], [lng for _, lng in self.pois.values()])[0]
+        with patch.object(poi_api, 'POI_DISTANCE_TABLE_DIR', self.tmpdir), \
+                patch.object(poi_api, 'load_active_poi_locations', return_value=self.pois), \
+                patch.object(poi_api, 'ROUTE_POOL', RouteWorkerPool(workers=0)):
+            lengths, _ = poi_api.poi_network_distance_matrix(self.graph, 'walking', nodes[:3].tolist())
+            np.testing.assert_allclose(lengths, self.graph.distance_matrix(nodes[:3].tolist())[0], atol=0.05)
+
+            deadline = time.time() + 10
+            while 'walking' in poi_api.POI_DISTANCE_TABLE_BUILDS and time.time() < deadline:
+                time.sleep(0.01)
+            table = poi_api.get_poi_distance_table('walking', self.graph)
+        self.assertIsNotNone(table)
+        self.assertEqual(len(table), len(self.pois))
+
+    def test_update_sync_handles_reactivation_and_partial_coordinates(self):
+        import poi_api
+
+        stored = {'latitude': 38.63, 'longitude': 34.91}
+        with patch.object(poi_api, 'update_poi_distances') as update:
+            for update_data in ({'latitude': 38.64}, {'isActive': True}):
+                self.assertTrue(poi_api.needs_stored_coordinates(update_data))
+                poi_api.sync_poi_distances_after_update(7, poi_api.complete_coordinates(update_data, stored))
+            poi_api.sync_poi_distances_after_update(7, {'isActive': False})
+        self.assertEqual([c.args for c in update.call_args_list], [(7, 38.64, 34.91), (7, 38.63, 34.91), (7,)])
+        self.assertEqual(update.call_args_list[2].kwargs, {'removed': True})
+        self.assertFalse(poi_api.needs_stored_coordinates({'name': 'x'}))
+        self.assertFalse(poi_api.needs_stored_coordinates({'latitude': 1, 'longitude': 2, 'isActive': True}))
+
+    def test_upsert_searches_do_not_block_lookups(self):
+        """Lookups are served while an edited POI's row is being searched"""
+        table = PoiDistanceTable.build(self.graph, dict(list(self.pois.items())[:6]), max_snap_distance_m=750)
+        searching, release = threading.Event(), threading.Event()
+
+        def slow_matrix(sources, targets):
+            searching.set()
+            release.wait(5)
+            return self.graph.distance_matrix(sources, targets)
+
+        writer = threading.Thread(target=table.upsert, args=(self.graph, 106, *self.pois[106]),
+                                  kwargs={'matrix': slow_matrix})
+        writer.start()
+        self.assertTrue(searching.wait(5))
+        started = time.perf_counter()
+        self.assertEqual(table.lookup(100, 100), (0.0, 0.0))
+        table.distance_matrix(self.graph, table.nodes[:3].tolist())
+        self.assertLess(time.perf_counter() - started, 1)
+        self.assertNotIn(106, table)
+        release.set()
+        writer.join()
+        self.assertIn(106, table)
+
+    def test_update_without_loaded_graph_marks_table_stale(self):
+        """POI edits never wait for a loading graph; the table is rebuilt later"""
+        import poi_api
+
+        table = PoiDistanceTable.build(self.graph, self.pois, max_snap_distance_m=750)
+        path = poi_distance_table_path(self.tmpdir, 'walking')
+        table.save(path)
+        register_table(table)
+        with patch.object(poi_api, 'POI_DISTANCE_TABLE_DIR', self.tmpdir), \
+                patch.object(poi_api.GRAPH_STORE, 'peek', return_value=None), \
+                patch.object(poi_api, 'load_graph_for_mode') as load_graph:
+            poi_api.update_poi_distances(100, 38.63, 34.91)
+        load_graph.assert_not_called()
+        self.assertFalse(os.path.exists(path))
+        self.assertIsNone(load_table(path, self.graph))
+
+
+if __name__ == '__main__':
+    unittest.main()
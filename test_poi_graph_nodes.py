@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+"""
+Unit tests for persisted POI graph nodes
+Stored nodes must give the same result as snapping, without the spatial lookup
+"""
+
+import unittest
+from unittest.mock import patch
+
+from poi_graph_nodes import PoiGraphNode, snap_poi_nodes, stored_node_index
+from routing_engine import RoutingGraph
+from test_routing_engine import build_grid_graph
+
+
+class TestPoiGraphNodes(unittest.TestCase):
+    """POI graph düğümü testleri"""
+
+    @classmethod
+    def setUpClass(cls):
+        cls.graph = RoutingGraph.from_networkx(build_grid_graph(rows=6, cols=6, seed=4), name='walking')
+        cls.graph.metadata['source_sha256'] = 'c' * 64
+        cls.locations = {
+            'a': (float(cls.graph.node_y[3]) + 0.0001, float(cls.graph.node_x[3])),
+            'b': (float(cls.graph.node_y[20]), float(cls.graph.node_x[20]) - 0.0001),
+        }
+
+    def test_bulk_snap_matches_spatial_lookup(self):
+        nodes = snap_poi_nodes(self.graph, self.locations)
+        for poi_id, (lat, lng) in self.locations.items():
+            index, distance = self.graph.snap(lat, lng)
+            self.assertEqual(nodes[poi_id].node_id, int(self.graph.node_ids[index[0]]))
+            self.assertAlmostEqual(nodes[poi_id].snap_distance_m, float(distance[0]), places=1)
+            self.assertEqual(nodes[poi_id].graph_version, 'c' * 12)
+            self.assertEqual(stored_node_index(self.graph, nodes[poi_id]), int(index[0]))
+        self.assertEqual(PoiGraphNode.from_dict(nodes['a'].to_dict()), nodes['a'])
+
+    def test_other_graph_version_is_ignored(self):
+        stale = PoiGraphNode(int(self.graph.node_ids[3]), 5.0, 'd' * 12)
+        self.assertIsNone(stored_node_index(self.graph, stale))
+        self.assertIsNone(stored_node_index(self.graph, None))
+        self.assertIsNone(stored_node_index(self.graph, PoiGraphNode(-1, 5.0, 'c' * 12)))
+
+    def test_poi_waypoints_use_stored_nodes(self):
+        import poi_api
+
+        nodes = snap_poi_nodes(self.graph, self.locations)
+        # The stored node deliberately differs from the nearest node
+        stored = PoiGraphNode(int(self.graph.node_ids[35]), 12.5, 'c' * 12)
+        test_data = {'tarihi': [
+            {'_id': 'a', 'name': 'A', 'latitude': self.locations['a'][0], 'longitude': self.locations['a'][1],
+             'graph_nodes': {'walking': stored.to_dict()}},
+            {'_id': 'b', 'name': 'B', 'latitude': self.locations['b'][0], 'longitude': self.locations['b'][1]},
+        ]}
+        with patch.object(poi_api, 'JSON_FALLBACK', True), \
+                patch.object(poi_api, 'load_test_data', return_value=test_data):
+            waypoints = poi_api.resolve_waypoints([
+                {'poi_id': 'a'}, {'poi_id': 'b'}, {'lat': 38.62, 'lng': 34.90, '_graph_nodes': {'walking': stored}}])
+            with self.assertRaises(ValueError):
+                poi_api.resolve_waypoints([{'poi_id': 'missing'}, {'poi_id': 'a'}])
+
+        self.assertEqual([wp['name'] for wp in waypoints[:2]], ['A', 'B'])
+        self.assertEqual(waypoints[0]['lat'], self.locations['a'][0])
+        with patch.object(self.graph, 'snap', wraps=self.graph.snap) as snap:
+            route_nodes, distances = poi_api.snap_waypoints(self.graph, waypoints)
+        self.assertEqual(route_nodes[0], 35)
+        self.assertEqual(distances[0], 12.5)
+        self.assertEqual(route_nodes[1], stored_node_index(self.graph, nodes['b']))
+        # Only the POI without a stored node and the coordinate waypoint are snapped
+        self.assertEqual(len(snap.call_args[0][0]), 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,184 @@
+#!/usr/bin/env python3
+"""
+Unit tests for the cached POI rating matrix
+Vectorized recommendations are compared against the per-POI scoring loop
+"""
+
+import random
+import unittest
+
+import numpy as np
+
+from poi_rating_matrix import RATING_FIELDS, PoiRatingMatrix, top_k
+from routing_engine import haversine_m
+
+
+def loop_recommendations(pois, preferences, limit=20):
+    """Reference: the original per-POI Python scoring"""
+    recommendations = []
+    all_zero = all(preferences.get(field, 0) == 0 for field in RATING_FIELDS)
+    for poi in pois:
+        ratings = [poi.get(field) or 0 for field in RATING_FIELDS]
+        if all_zero:
+            positive = [rating for rating in ratings if rating > 0]
+            score = sum(positive) / len(positive) if positive else 30
+        else:
+            products = [preferences.get(field, 0) / 100.0 * rating / 100.0
+                        for field, rating in zip(RATING_FIELDS, ratings)
+                        if preferences.get(field, 0) > 0 and rating > 0]
+            score = sum(products) / len(products) * 100 if sum(products) > 0 else 0
+        if score > 0:
+            recommendations.append((poi['id'], round(score, 2)))
+    recommendations.sort(key=lambda item: item[1], reverse=True)
+    return recommendations[:limit]
+
+
+def random_pois(count, seed):
+    rng = random.Random(seed)
+    pois = []
+    for i in range(count):
+        poi = {'id': i, 'name': f'POI {i}', 'category': 'tarihi', 'latitude': 38.6, 'longitude': 34.9}
+        for field in RATING_FIELDS:
+            # Coarse values so that equal scores (ties) are common
+            poi[field] = rng.choice([None, 0, 20, 40, 40, 60, 80, 100])
+        pois.append(poi)
+    return pois
+
+
+class TestPoiRatingMatrix(unittest.TestCase):
+    """POI puan matrisi testleri"""
+
+    def test_matches_loop_scoring(self):
+        pois = random_pois(400, seed=1)
+        matrix = PoiRatingMatrix(lambda: pois)
+        rng = random.Random(2)
+        cases = [{'tarihi': 0, 'doga': 0}, {'tarihi': 100}, {'tarihi': -10}, {'tarihi': 80, 'doga': 40, 'yemek': 100}]
+        cases += [{field: rng.choice([0, 0, 30, 70, 100]) for field in RATING_FIELDS} for _ in range(20)]
+        for preferences in cases:
+            result = [(poi['id'], poi['score']) for poi in matrix.recommend(preferences, limit=20)]
+            self.assertEqual(result, loop_recommendations(pois, preferences), preferences)
+        self.assertEqual(matrix.loads, 1)
+
+        first = matrix.recommend({'tarihi': 50})[0]
+        self.assertEqual(set(first['ratings']), set(RATING_FIELDS))
+        with self.assertRaises(ValueError):
+            matrix.recommend({'tarihi': 'a lot'})
+
+    def test_recommend_many_matches_single_profiles(self):
+        pois = random_pois(400, seed=7)
+        matrix = PoiRatingMatrix(lambda: pois)
+        rng = random.Random(8)
+        profiles = [{field: rng.choice([0, 0, 30, 70, 100]) for field in RATING_FIELDS} for _ in range(50)]
+        profiles[3] = {'tarihi': 0}
+        profiles[10] = {'tarihi': 'a lot'}
+        profiles[11] = ['not', 'a', 'dict']
+
+        results = list(matrix.recommend_many(iter(profiles), limit=15, chunk_size=8))
+        self.assertEqual(len(results), len(profiles))
+        for preferences, result in zip(profiles, results):
+            if preferences in (profiles[10], profiles[11]):
+                self.assertIsInstance(result, ValueError)
+            else:
+                self.assertEqual(result, matrix.recommend(preferences, limit=15))
+        self.assertEqual(matrix.loads, 1)
+
+    def test_top_k_uses_poi_order_for_ties(self):
+        scores = np.array([5.0, 9.0, 0.0, 9.0, 5.0, 7.0, 5.0, -1.0])
+        self.assertEqual(top_k(scores, 4).tolist(), [1, 3, 5, 0])
+        self.assertEqual(top_k(scores, 20).tolist(), [1, 3, 5, 0, 4, 6])
+        self.assertEqual(top_k(np.zeros(3), 5).tolist(), [])
+
+    def test_reload_after_invalidate_and_failed_reload(self):
+        pois = random_pois(5, seed=3)
+        calls = []
+
+        def loader():
+            calls.append(1)
+            if len(calls) == 3:
+                raise RuntimeError('database down')
+            return [dict(poi) for poi in pois]
+
+        matrix = PoiRatingMatrix(loader, ttl_s=3600)
+        matrix.recommend({'tarihi': 100})
+        matrix.recommend({'doga': 100})
+        self.assertEqual(len(calls), 1)
+
+        for field in RATING_FIELDS:
+            pois[0][field] = 100
+        matrix.invalidate()
+        self.assertEqual(matrix.recommend({'tarihi': 100})[0]['score'], 100.0)
+        self.assertEqual(len(calls), 2)
+
+        # A failed reload keeps serving the previous matrix
+        matrix.invalidate()
+        self.assertEqual(matrix.recommend({'tarihi': 100})[0]['id'], 0)
+        self.assertEqual(len(calls), 3)
+        self.assertEqual(matrix.stats()['pois'], 5)
+
+    def test_changed_rows_are_applied_as_deltas(self):
+        pois = {poi['id']: poi for poi in random_pois(50, seed=4)}
+        requested = []
+
+        def row_loader(poi_ids):
+            requested.append(sorted(poi_ids))
+            return [dict(pois[poi_id]) for poi_id in poi_ids if poi_id in pois]
+
+        matrix = PoiRatingMatrix(lambda: [dict(poi) for poi in pois.values()], row_loader=row_loader, ttl_s=3600)
+        matrix.recommend({'tarihi': 100})
+
+        pois[10] = dict(pois[10], **{field: 100 for field in RATING_FIELDS})
+        del pois[20]
+        pois[99] = dict(pois[11], id=99, name='POI 99', tarihi=100, doga=100)
+        matrix.invalidate([10, 20])
+        matrix.invalidate([99])
+
+        preferences = {'tarihi': 100, 'doga': 60}
+        result = [(poi['id'], poi['score']) for poi in matrix.recommend(preferences, limit=60)]
+        self.assertEqual(requested, [[10, 20, 99]])
+        self.assertEqual(matrix.loads, 1)
+        self.assertEqual(sorted(result), sorted(loop_recommendations(list(pois.values()), preferences, limit=60)))
+        self.assertEqual([poi['id'] for poi in matrix._snapshot['pois']][:12], list(range(12)))
+        self.assertEqual(matrix.stats()['delta_rows'], 3)
+
+        # Without ids (e.g. after a listener reconnect) the matrix is reloaded
+        matrix.invalidate()
+        matrix.recommend(preferences)
+        self.assertEqual(matrix.loads, 2)
+
+    def test_recommend_near_filters_by_radius_and_budget(self):
+        pois = random_pois(300, seed=5)
+        rng = random.Random(6)
+        for poi in pois:
+            poi['latitude'] = 38.6 + rng.uniform(-0.1, 0.1)
+            poi['longitude'] = 34.9 + rng.uniform(-0.1, 0.1)
+        pois[7]['latitude'] = None
+        matrix = PoiRatingMatrix(lambda: pois)
+        origin = (38.6, 34.9)
+
+        def travel(lats, lngs):
+            lengths = haversine_m(origin[0], origin[1], lats, lngs) * 1.2
+            return lengths, lengths / 1.4
+
+        preferences = {'tarihi': 100, 'doga': 50}
+        result = matrix.recommend_near(preferences, *origin, radius_m=5000, travel=travel, limit=500,
+                                       max_duration_s=3000)
+        by_id = {poi['id']: poi for poi in pois}
+        expected = {poi_id for poi_id, _ in loop_recommendations(pois, preferences, limit=500)
+                    if by_id[poi_id]['latitude'] is not None
+                    and haversine_m(*origin, by_id[poi_id]['latitude'], by_id[poi_id]['longitude']) <= 5000
+                    and haversine_m(*origin, by_id[poi_id]['latitude'], by_id[poi_id]['longitude']) * 1.2 / 1.4 <= 3000}
+        self.assertEqual({poi['id'] for poi in result}, expected)
+        self.assertTrue(expected)
+        self.assertTrue(all(poi['travel_time'] <= 50 for poi in result))
+        ranking = [poi['ranking_score'] for poi in result]
+        self.assertEqual(ranking, sorted(ranking, reverse=True))
+        # Equal preference scores: the nearer POI ranks first
+        for first, second in zip(result, result[1:]):
+            if first['score'] == second['score']:
+                self.assertLessEqual(first['travel_time'], second['travel_time'])
+
+        self.assertEqual(matrix.recommend_near(preferences, 10.0, 10.0, radius_m=5000, travel=travel), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
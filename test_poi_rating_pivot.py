@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+"""
+Unit tests for the poi_rating_pivot table setup and the read paths using it
+A recording fake connection stands in for PostgreSQL
+"""
+
+import unittest
+from unittest.mock import patch
+
+from poi_database_adapter import RATING_COLUMNS, PostgreSQLPOIDatabase, install_rating_pivot
+
+
+class RecordingConnection:
+    """Records executed SQL and returns queued rows"""
+
+    def __init__(self, table_missing=True, rows=()):
+        self.autocommit = False
+        self.statements = []
+        self.commits = 0
+        self.table_missing = table_missing
+        self.rows = list(rows)
+        self.rowcount = 0
+
+    def cursor(self, cursor_factory=None):
+        return self
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def execute(self, sql, params=None):
+        self.statements.append((' '.join(sql.split()), params))
+
+    def fetchone(self):
+        return (self.table_missing,)
+
+    def fetchall(self):
+        return self.rows
+
+    def commit(self):
+        self.commits += 1
+
+
+class TestPoiRatingPivot(unittest.TestCase):
+    """POI puan pivot tablosu testleri"""
+
+    def test_install_creates_indexes_trigger_and_backfills_once(self):
+        conn = RecordingConnection(table_missing=True)
+        install_rating_pivot(conn)
+        sql = [statement for statement, _ in conn.statements]
+        for column in RATING_COLUMNS:
+            self.assertTrue(any(f'idx_poi_rating_pivot_{column} ON poi_rating_pivot ({column} DESC)' in s for s in sql))
+        self.assertTrue(any('CREATE TRIGGER poi_ratings_refresh_pivot' in s for s in sql))
+        self.assertTrue(any(s.startswith('INSERT INTO poi_rating_pivot') for s in sql))
+        self.assertEqual(conn.commits, 1)
+
+        # An existing table is not backfilled again
+        conn = RecordingConnection(table_missing=False)
+        install_rating_pivot(conn)
+        self.assertFalse(any(s.startswith('INSERT INTO poi_rating_pivot') for s, _ in conn.statements))
+
+    def test_list_pois_reads_ratings_from_pivot(self):
+        row = {'id': 3, 'name': 'Müze', 'category': 'kulturel', 'latitude': 38.63, 'longitude': 34.91,
+               'description': ''}
+        row.update({column: None for column in RATING_COLUMNS})
+        row.update({'tarihi': 90, 'sanat_kultur': 0})
+        db = PostgreSQLPOIDatabase('postgresql://unused')
+        db.conn = RecordingConnection(rows=[row])
+
+        with patch.object(db, 'get_poi_ratings', side_effect=AssertionError('per-POI rating query')):
+            pois = db.list_pois('kulturel')
+
+        self.assertEqual(len(db.conn.statements), 1)
+        statement, params = db.conn.statements[0]
+        self.assertIn('LEFT JOIN poi_rating_pivot r ON r.poi_id = p.id', statement)
+        self.assertEqual(params, ['kulturel'])
+        self.assertEqual(pois[0]['_id'], 3)
+        self.assertEqual(pois[0]['ratings'], dict(db.get_default_ratings(), tarihi=90))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+"""
+Unit tests for single-flight request coalescing
+"""
+
+import threading
+import time
+import unittest
+
+from request_coalescing import SingleFlight, request_fingerprint
+
+
+class TestRequestCoalescing(unittest.TestCase):
+    """İstek birleştirme testleri"""
+
+    def test_fingerprint_normalizes_body(self):
+        first = request_fingerprint('create_smart_route', {'waypoints': [{'lat': 1, 'lng': 2}], 'format': 'polyline'})
+        second = request_fingerprint('create_smart_route', {'format': 'polyline', 'waypoints': [{'lng': 2, 'lat': 1}]})
+        self.assertEqual(first, second)
+        self.assertNotEqual(first, request_fingerprint('get_recommendations', {'format': 'polyline'}))
+        self.assertNotEqual(first, request_fingerprint('create_smart_route', {'waypoints': [{'lat': 1, 'lng': 3}]}))
+        self.assertNotEqual(request_fingerprint('x', {}, {'zoom': ['12']}), request_fingerprint('x', {}, {'zoom': ['14']}))
+
+    def test_concurrent_duplicates_share_one_computation(self):
+        flight = SingleFlight()
+        started = threading.Event()
+        release = threading.Event()
+        calls = []
+        results = []
+
+        def compute():
+            calls.append(1)
+            started.set()
+            release.wait(5)
+            return {'route': 'shared'}
+
+        def request():
+            results.append(flight.do('key', compute, group='smart'))
+
+        leader = threading.Thread(target=request)
+        leader.start()
+        started.wait(5)
+        followers = [threading.Thread(target=request) for _ in range(5)]
+        for thread in followers:
+            thread.start()
+        while flight.stats()['smart']['coalesced'] < 5:
+            time.sleep(0.01)
+        release.set()
+        for thread in [leader] + followers:
+            thread.join(5)
+
+        self.assertEqual(len(calls), 1)
+        self.assertEqual([result for result, _ in results], [{'route': 'shared'}] * 6)
+        self.assertEqual(sum(shared for _, shared in results), 5)
+        stats = flight.stats()['smart']
+        self.assertEqual((stats['computed'], stats['coalesced'], stats['peak_waiters']), (1, 5, 5))
+        self.assertEqual(flight.in_flight(), 0)
+
+        # Finished calls are not cached
+        flight.do('key', compute, group='smart')
+        self.assertEqual(len(calls), 2)
+
+    def test_errors_are_shared_and_released(self):
+        flight = SingleFlight()
+        release = threading.Event()
+        errors = []
+
+        def failing():
+            release.wait(5)
+            raise RuntimeError('boom')
+
+        def request():
+            try:
+                flight.do('key', failing)
+            except RuntimeError as e:
+                errors.append(e)
+
+        threads = [threading.Thread(target=request) for _ in range(3)]
+        for thread in threads:
+            thread.start()
+        while flight.stats().get('default', {}).get('coalesced', 0) < 2:
+            time.sleep(0.01)
+        release.set()
+        for thread in threads:
+            thread.join(5)
+        self.assertEqual(len(errors), 3)
+        self.assertEqual(flight.do('key', lambda: 'ok'), ('ok', False))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+"""
+Unit tests for compact route coordinate encodings
+"""
+
+import unittest
+
+import numpy as np
+
+from route_geometry import (
+    LOD_PRECISION, build_lod, decode_polyline, encode_coordinates, encode_flat, encode_polyline,
+    parse_coordinate_options, parse_simplify_options, select_lod, simplify, tolerance_for_zoom
+)
+
+
+def max_deviation_m(coords, simplified):
+    """Largest distance from an input point to the simplified line (planar meters)"""
+    lat0 = np.radians(coords[:, 0].mean())
+
+    def project(points):
+        return np.c_[np.radians(points[:, 1]) * np.cos(lat0), np.radians(points[:, 0])] * 6371000.0
+
+    p, line = project(coords), project(simplified)
+    a, b = line[:-1][None], line[1:][None]
+    ab = b - a
+    t = np.clip(((p[:, None] - a) * ab).sum(-1) / np.maximum((ab ** 2).sum(-1), 1e-12), 0, 1)
+    closest = a + t[..., None] * ab
+    return np.sqrt(((p[:, None] - closest) ** 2).sum(-1)).min(axis=1).max()
+
+
+class TestRouteGeometryEncoding(unittest.TestCase):
+    """Rota koordinat kodlama testleri"""
+
+    def test_google_reference_polyline(self):
+        """Matches the example from the polyline algorithm documentation"""
+        coords = [(38.5, -120.2), (40.7, -120.95), (43.252, -126.453)]
+        self.assertEqual(encode_polyline(coords), '_p~iF~ps|U_ulLnnqC_mqNvxq`@')
+        self.assertEqual(decode_polyline('_p~iF~ps|U_ulLnnqC_mqNvxq`@'), coords)
+
+    def test_roundtrip_within_precision(self):
+        """Random walks survive encode/decode at every supported precision"""
+        rng = np.random.default_rng(0)
+        coords = np.cumsum(rng.normal(0, 1e-3, (2000, 2)), axis=0) + [38.63, 34.91]
+        for precision in (1, 5, 6, 7):
+            decoded = np.array(decode_polyline(encode_polyline(coords, precision), precision))
+            self.assertEqual(decoded.shape, coords.shape)
+            self.assertLessEqual(np.abs(decoded - coords).max(), 0.5 * 10 ** -precision + 1e-12)
+
+    def test_polyline_is_compact(self):
+        """An encoded route is far smaller than per-point JSON"""
+        coords = [(38.63 + i * 1e-4, 34.91 - i * 5e-5) for i in range(500)]
+        objects = str([{'lat': lat, 'lng': lng} for lat, lng in coords])
+        self.assertLess(len(encode_polyline(coords)) * 10, len(objects))
+
+    def test_flat_and_empty(self):
+        self.assertEqual(encode_flat([(38.123456, 34.987654)], 4), [38.1235, 34.9877])
+        self.assertEqual(encode_coordinates([], 'flat'), [])
+        self.assertEqual(encode_polyline([]), '')
+        self.assertEqual(decode_polyline(''), [])
+
+    def test_parse_options(self):
+        self.assertEqual(parse_coordinate_options(None, None), (None, 5))
+        self.assertEqual(parse_coordinate_options('json', '6'), (None, 6))
+        self.assertEqual(parse_coordinate_options('polyline', 6), ('polyline', 6))
+        for bad in (('geojson', None), ('flat', 0), ('flat', 'x'), ('polyline', 8)):
+            with self.assertRaises(ValueError):
+                parse_coordinate_options(*bad)
+
+
+
+class TestRouteSimplification(unittest.TestCase):
+    """Douglas-Peucker sadeleştirme ve zoom seviyeleri testleri"""
+
+    def setUp(self):
+        rng = np.random.default_rng(1)
+        self.coords = np.cumsum(rng.normal(0, 2e-5, (3000, 2)), axis=0) + [38.63, 34.91]
+
+    def test_simplify_stays_within_tolerance(self):
+        for tolerance in (1.0, 5.0, 25.0):
+            simplified = simplify(self.coords, tolerance)
+            self.assertLess(len(simplified), len(self.coords))
+            np.testing.assert_array_equal(simplified[[0, -1]], self.coords[[0, -1]])
+            self.assertLessEqual(max_deviation_m(self.coords, simplified), tolerance + 1e-6)
+
+    def test_straight_line_and_short_inputs(self):
+        line = [(38.6 + i * 1e-4, 34.9 + i * 1e-4) for i in range(50)]
+        self.assertEqual(len(simplify(line, 0.5)), 2)
+        self.assertEqual(len(simplify(line[:2], 10)), 2)
+        self.assertEqual(len(simplify(line, 0)), 50)
+
+    def test_lod_levels(self):
+        """Deeper zooms keep more points; requests pick the coarsest sufficient level"""
+        lod = build_lod(self.coords)
+        sizes = [len(decode_polyline(lod[str(zoom)], LOD_PRECISION)) for zoom in (10, 12, 14, 16)]
+        self.assertEqual(sizes, sorted(sizes))
+        self.assertLess(tolerance_for_zoom(16, 38.63), tolerance_for_zoom(10, 38.63))
+
+        level, points = select_lod(lod, 13)
+        self.assertEqual(level, 14)
+        self.assertEqual(len(points), sizes[2])
+        self.assertIsNone(select_lod(lod, 17))
+        self.assertIsNone(select_lod(None, 10))
+
+    def test_parse_simplify_options(self):
+        self.assertEqual(parse_simplify_options(None, ''), (None, None))
+        self.assertEqual(parse_simplify_options('5', '14'), (5.0, 14.0))
+        for bad in (('x', None), (-1, None), (None, 30), (None, 'far')):
+            with self.assertRaises(ValueError):
+                parse_simplify_options(*bad)
+
+
+if __name__ == '__main__':
+    unittest.main()
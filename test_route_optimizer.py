@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+"""
+Unit tests for the route order optimizer
+Exact results are checked against brute force, heuristic results against
+the nearest-neighbour seed on random asymmetric matrices
+"""
+
+import itertools
+import time
+import unittest
+
+import numpy as np
+
+from route_optimizer import EXACT_MAX_STOPS, _nearest_neighbour, optimize_order, route_cost
+
+
+def random_matrix(n, seed):
+    """Street-like asymmetric distances: euclidean times a random detour"""
+    rng = np.random.default_rng(seed)
+    points = rng.random((n, 2)) * 3000
+    distances = np.linalg.norm(points[:, None] - points[None, :], axis=2)
+    return distances * (1 + 0.3 * rng.random((n, n)))
+
+
+def brute_force_cost(matrix, start, end):
+    n = len(matrix)
+    free = [i for i in range(n) if i != start and i != end]
+    head = [start] if start is not None else []
+    tail = [end] if end is not None else []
+    return min(route_cost(matrix, head + list(p) + tail) for p in itertools.permutations(free))
+
+
+class TestRouteOptimizer(unittest.TestCase):
+    """Rota sırası optimizasyonu testleri"""
+
+    def test_exact_matches_brute_force(self):
+        """Held-Karp finds the optimum with and without fixed endpoints"""
+        for seed, (start, end) in enumerate([(None, None), (0, None), (None, 6), (0, 6), (3, 1)]):
+            matrix = random_matrix(7, seed)
+            order = optimize_order(matrix, start=start, end=end)
+            self.assertEqual(sorted(order), list(range(7)))
+            if start is not None:
+                self.assertEqual(order[0], start)
+            if end is not None:
+                self.assertEqual(order[-1], end)
+            self.assertAlmostEqual(route_cost(matrix, order), brute_force_cost(matrix, start, end), places=6)
+
+    def test_large_route_within_budget(self):
+        """60 stops finish inside the time budget and beat the greedy seed"""
+        n = 60
+        self.assertGreater(n, EXACT_MAX_STOPS)
+        matrix = random_matrix(n, 11)
+        started = time.perf_counter()
+        order = optimize_order(matrix, start=0, end=n - 1, time_budget_s=0.2)
+        elapsed = time.perf_counter() - started
+
+        self.assertLess(elapsed, 0.5)
+        self.assertEqual(order[0], 0)
+        self.assertEqual(order[-1], n - 1)
+        self.assertEqual(sorted(order), list(range(n)))
+        greedy = _nearest_neighbour(matrix, list(range(1, n - 1)), 0, n - 1)
+        self.assertLess(route_cost(matrix, order), route_cost(matrix, greedy))
+
+    def test_unreachable_pairs_are_avoided(self):
+        """Infinite entries are penalised rather than breaking the search"""
+        matrix = random_matrix(20, 5)
+        matrix[4, 9] = np.inf
+        matrix[9, 4] = np.inf
+        order = optimize_order(matrix, start=4)
+        self.assertEqual(sorted(order), list(range(20)))
+        self.assertTrue(np.isfinite(route_cost(matrix, order)))
+
+    def test_trivial_inputs(self):
+        """Empty, single-stop and start == end inputs"""
+        self.assertEqual(optimize_order(np.zeros((0, 0))), [])
+        self.assertEqual(optimize_order(np.zeros((1, 1)), start=0), [0])
+        self.assertEqual(optimize_order(random_matrix(2, 1), start=1), [1, 0])
+        with self.assertRaises(ValueError):
+            optimize_order(random_matrix(3, 1), start=1, end=1)
+
+
+if __name__ == '__main__':
+    unittest.main()
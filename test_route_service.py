@@ -11,6 +11,7 @@ import sys
 import json
 from unittest.mock import Mock, patch, MagicMock
 from route_service import RouteService
+from route_geometry import build_lod
 
 
 class TestRouteService(unittest.TestCase):
@@ -547,7 +548,7 @@ class TestRouteService(unittest.TestCase):
             ]}
         ]
 
-        with patch.object(self.service, '_execute_query', side_effect=[1, {'has_geometry': True}]) as mock_exec:
+        with patch.object(self.service, '_execute_query', side_effect=[1, 1, {'has_geometry': True}]) as mock_exec:
             result = self.service.save_route_geometry(
                 1,
                 geometry_segments,
@@ -561,6 +562,43 @@ class TestRouteService(unittest.TestCase):
             mock_instance.generate_elevation_profile_from_geometry.assert_called_once()
             first_call = mock_exec.call_args_list[0]
             self.assertIn('elevation_profile', first_call[0][0])
+            lod_call = mock_exec.call_args_list[1]
+            self.assertIn('geometry_lod', lod_call[0][0])
+
+    def test_route_geometry_uses_precomputed_lod(self):
+        """A zoom request reads the stored level instead of the full geometry"""
+        coords = [(38.63 + i * 1e-4, 34.91 + (i % 7) * 1e-5) for i in range(300)]
+        stored = {
+            'geometry_lod': build_lod(coords),
+            'total_distance': 3.3,
+            'estimated_duration': 40,
+            'waypoints': []
+        }
+        with patch.object(self.service, '_execute_query', return_value=stored) as mock_exec:
+            geometry = self.service.get_route_geometry(1, zoom=11)
+
+        mock_exec.assert_called_once()
+        self.assertEqual(geometry['lod_zoom'], 12)
+        self.assertEqual(geometry['geometry']['type'], 'LineString')
+        self.assertLess(len(geometry['geometry']['coordinates']), len(coords))
+
+    def test_route_geometry_simplifies_without_lod(self):
+        """Routes saved before the migration are simplified on the fly"""
+        coords = [[34.91 + (i % 7) * 1e-5, 38.63 + i * 1e-4] for i in range(300)]
+        full = {
+            'geometry': json.dumps({'type': 'LineString', 'coordinates': coords}),
+            'total_distance': 3.3,
+            'estimated_duration': 40,
+            'waypoints': []
+        }
+        self.service.geometry_lod_available = False
+        with patch.object(self.service, '_execute_query', return_value=full):
+            simplified = self.service.get_route_geometry(1, zoom=11)
+            unchanged = self.service.get_route_geometry(1, zoom=18)
+
+        self.assertTrue(simplified['simplified'])
+        self.assertLess(len(simplified['geometry']['coordinates']), len(coords))
+        self.assertEqual(len(unchanged['geometry']['coordinates']), len(coords))
 
 
 class TestRouteServiceIntegration(unittest.TestCase):
@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+"""
+Unit tests for the route computation process pool
+Worker results are compared against in-process searches on the same compiled graph
+"""
+
+import os
+import shutil
+import tempfile
+import threading
+import time
+import unittest
+
+import numpy as np
+
+from route_workers import (
+    RoutePoolSaturatedError, RouteTimeoutError, RouteWorkerPool, StaleGraphVersionError, _open_graph
+)
+from routing_engine import RoutingGraph
+from test_routing_engine import build_grid_graph
+
+
+class TestRouteWorkerPool(unittest.TestCase):
+    """Rota süreç havuzu testleri"""
+
+    @classmethod
+    def setUpClass(cls):
+        cls.tmpdir = tempfile.mkdtemp()
+        path = os.path.join(cls.tmpdir, 'walking.rgraph')
+        graph = RoutingGraph.from_networkx(build_grid_graph(rows=8, cols=8, seed=3), name='walking')
+        graph.save(path, metadata={'source_sha256': 'a' * 64})
+        cls.graph = RoutingGraph.load(path)
+        cls.pool = RouteWorkerPool(workers=1, timeout_s=60, max_pending=1)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.pool.shutdown()
+        shutil.rmtree(cls.tmpdir)
+
+    def test_worker_results_match_in_process(self):
+        inline = self.pool.stats()['inline']
+        pairs = [(0, 63), (7, 56), (5, 5)]
+        legs = self.pool.route_legs(self.graph, pairs)
+        for (source, target), leg in zip(pairs, legs):
+            expected = self.graph.route_leg(source, target)
+            self.assertEqual(leg.nodes, expected.nodes)
+            self.assertAlmostEqual(leg.length_m, expected.length_m, places=3)
+            self.assertEqual(leg.geometry, expected.geometry)
+
+        lengths, durations = self.pool.distance_matrix(self.graph, [0, 9, 30], [63, 1])
+        expected_lengths, expected_durations = self.graph.distance_matrix([0, 9, 30], [63, 1])
+        np.testing.assert_allclose(lengths, expected_lengths)
+        np.testing.assert_allclose(durations, expected_durations)
+
+        nodes, lengths, durations = self.pool.reachable(self.graph, 9, max_duration_s=300)
+        expected_nodes, expected_lengths, expected_durations = self.graph.reachable(9, max_duration_s=300)
+        self.assertEqual(nodes.tolist(), expected_nodes.tolist())
+        np.testing.assert_allclose(durations, expected_durations)
+        np.testing.assert_allclose(lengths, expected_lengths)
+
+        square, _ = self.graph.distance_matrix([0, 9, 30, 63])
+        order = self.pool.optimize_order(square, start=0)
+        self.assertEqual(order, [0, 1, 2, 3])
+        self.assertEqual(self.pool.stats()['inline'], inline)
+
+    def test_in_memory_graph_runs_inline(self):
+        """Graphs without a compiled file (and workers=0) are searched in the request process"""
+        pool = RouteWorkerPool(workers=0)
+        in_memory = RoutingGraph.from_networkx(build_grid_graph(rows=4, cols=4, seed=1), name='walking')
+        legs = pool.route_legs(in_memory, [(0, 15)])
+        self.assertEqual(legs[0].nodes, in_memory.route_leg(0, 15).nodes)
+        self.assertEqual(self.pool.route_legs(in_memory, [(0, 3)])[0].nodes[-1], 3)
+        self.assertEqual(pool.stats()['inline'], 1)
+
+    def test_graph_swapped_between_snap_and_task(self):
+        """Node indices snapped on the old graph are never used on the new file"""
+        path = os.path.join(self.tmpdir, 'swapped.rgraph')
+        RoutingGraph.from_networkx(build_grid_graph(rows=8, cols=8, seed=3), name='walking').save(
+            path, metadata={'source_sha256': 'c' * 64})
+        snapped_on = RoutingGraph.load(path)
+
+        # Hot reload before the worker opens the file: a smaller graph (no node 63) replaces it
+        replacement = path + '.new'
+        RoutingGraph.from_networkx(build_grid_graph(rows=4, cols=4, seed=5), name='walking').save(
+            replacement, metadata={'source_sha256': 'd' * 64})
+        os.replace(replacement, path)
+        with self.assertRaises(StaleGraphVersionError):
+            _open_graph(path, snapped_on.version)
+
+        stale = self.pool.stats()['stale']
+        lengths, _ = self.pool.distance_matrix(snapped_on, [0, 9], [63])
+        np.testing.assert_allclose(lengths, snapped_on.distance_matrix([0, 9], [63])[0])
+        self.assertEqual(self.pool.route_legs(snapped_on, [(0, 63)])[0].nodes, snapped_on.route_leg(0, 63).nodes)
+        self.assertEqual(self.pool.stats()['stale'], stale + 2)
+
+    def test_saturation_and_timeout(self):
+        # A sleeping task keeps the only pool slot busy
+        errors = []
+
+        def slow_request():
+            try:
+                self.pool._run(time.sleep, (3,), lambda: None, timeout_s=0.5)
+            except RouteTimeoutError as e:
+                errors.append(e)
+
+        thread = threading.Thread(target=slow_request)
+        thread.start()
+        deadline = time.time() + 10
+        while self.pool.stats()['in_flight'] == 0 and time.time() < deadline:
+            time.sleep(0.01)
+
+        with self.assertRaises(RoutePoolSaturatedError):
+            self.pool.route_legs(self.graph, [(0, 63)])
+        thread.join(timeout=10)
+        self.assertEqual(len(errors), 1)
+
+        stats = self.pool.stats()
+        self.assertGreaterEqual(stats['rejected'], 1)
+        self.assertGreaterEqual(stats['timeouts'], 1)
+
+        # The slot is released once the timed out task finishes in the worker
+        deadline = time.time() + 10
+        while self.pool.stats()['in_flight'] and time.time() < deadline:
+            time.sleep(0.05)
+        self.assertEqual(self.pool.route_legs(self.graph, [(0, 63)])[0].nodes[-1], 63)
+
+
+if __name__ == '__main__':
+    unittest.main()
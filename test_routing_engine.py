@@ -0,0 +1,494 @@
+#!/usr/bin/env python3
+"""
+Unit tests for the CSR routing engine
+Compares search results against NetworkX on small synthetic street grids
+"""
+
+import math
+import os
+import random
+import shutil
+import tempfile
+import unittest
+
+from unittest.mock import patch
+
+import networkx as nx
+import numpy as np
+from shapely.geometry import LineString
+
+import routing_engine
+from routing_engine import (
+    RoutingGraph, NoPathError, GraphFormatError, LegCache, NodeSpatialIndex, compile_graphml,
+    compiled_graph_path, haversine_m, is_compiled_graph_current, load_compiled_graph,
+    read_graph_header, weak_component_labels
+)
+
+
+def build_grid_graph(rows=12, cols=12, spacing_deg=0.0008, seed=7):
+    """Build an OSMnx-like MultiDiGraph laid out as a jittered street grid"""
+    rng = random.Random(seed)
+    G = nx.MultiDiGraph()
+    lat0, lng0 = 38.6250, 34.9050
+
+    def node_id(r, c):
+        return 1000000 + r * cols + c
+
+    for r in range(rows):
+        for c in range(cols):
+            G.add_node(node_id(r, c),
+                       y=lat0 + r * spacing_deg + rng.uniform(-1e-4, 1e-4),
+                       x=lng0 + c * spacing_deg + rng.uniform(-1e-4, 1e-4))
+
+    def straight_length(u, v):
+        lat1, lng1 = math.radians(G.nodes[u]['y']), math.radians(G.nodes[u]['x'])
+        lat2, lng2 = math.radians(G.nodes[v]['y']), math.radians(G.nodes[v]['x'])
+        a = (math.sin((lat2 - lat1) / 2) ** 2 +
+             math.cos(lat1) * math.cos(lat2) * math.sin((lng2 - lng1) / 2) ** 2)
+        return 2 * 6371009 * math.asin(math.sqrt(a))
+
+    for r in range(rows):
+        for c in range(cols):
+            u = node_id(r, c)
+            for dr, dc in ((0, 1), (1, 0)):
+                if r + dr >= rows or c + dc >= cols:
+                    continue
+                v = node_id(r + dr, c + dc)
+                # Streets are never shorter than the straight line
+                length = straight_length(u, v) * rng.uniform(1.0, 1.6)
+                G.add_edge(u, v, length=length)
+                if rng.random() > 0.15:  # some one-way streets
+                    G.add_edge(v, u, length=length)
+    return G
+
+
+class TestRoutingGraph(unittest.TestCase):
+    """RoutingGraph derleme ve arama testleri"""
+
+    @classmethod
+    def setUpClass(cls):
+        cls.G = build_grid_graph()
+        cls.graph = RoutingGraph.from_networkx(cls.G, name='test')
+
+    def test_compile_shapes(self):
+        """CSR arrays match the source graph"""
+        self.assertEqual(self.graph.node_count, self.G.number_of_nodes())
+        self.assertEqual(self.graph.edge_count, self.G.number_of_edges())
+        self.assertEqual(self.graph.offsets[-1], self.graph.edge_count)
+        self.assertEqual(str(self.graph.lengths.dtype), 'float32')
+
+    def test_shortest_path_matches_networkx(self):
+        """A* and Dijkstra agree with nx.shortest_path_length"""
+        rng = random.Random(3)
+        nodes = list(self.G.nodes)
+        checked = 0
+        while checked < 40:
+            u, v = rng.choice(nodes), rng.choice(nodes)
+            try:
+                expected = nx.shortest_path_length(self.G, u, v, weight='length')
+            except nx.NetworkXNoPath:
+                continue
+            src, dst = self.graph.index_of(u), self.graph.index_of(v)
+            for use_heuristic in (True, False):
+                path, length = self.graph.shortest_path(src, dst, use_heuristic=use_heuristic)
+                self.assertAlmostEqual(length, expected, delta=0.05)
+                self.assertEqual(path[0], src)
+                self.assertEqual(path[-1], dst)
+            checked += 1
+
+    def test_parallel_edges_use_shortest(self):
+        """Parallel edges collapse to the shortest one"""
+        G = nx.MultiDiGraph()
+        G.add_node(1, x=34.90, y=38.62)
+        G.add_node(2, x=34.91, y=38.62)
+        G.add_edge(1, 2, length=900.0)
+        G.add_edge(1, 2, length=870.0)
+        graph = RoutingGraph.from_networkx(G)
+        path, length = graph.shortest_path(graph.index_of(1), graph.index_of(2))
+        self.assertEqual(len(path), 2)
+        self.assertAlmostEqual(length, 870.0, places=3)
+
+    def test_no_path(self):
+        """Unreachable targets raise NoPathError"""
+        G = nx.MultiDiGraph()
+        G.add_node(1, x=34.90, y=38.62)
+        G.add_node(2, x=34.91, y=38.62)
+        G.add_edge(1, 2, length=900.0)
+        graph = RoutingGraph.from_networkx(G)
+        with self.assertRaises(NoPathError):
+            graph.shortest_path(graph.index_of(2), graph.index_of(1))
+
+    def test_unknown_node(self):
+        """Unknown OSM ids raise KeyError"""
+        with self.assertRaises(KeyError):
+            self.graph.index_of(42)
+
+
+class TestContractionHierarchy(unittest.TestCase):
+    """Contraction hierarchy ön işleme ve sorgu testleri"""
+
+    @classmethod
+    def setUpClass(cls):
+        cls.G = build_grid_graph(rows=10, cols=10, seed=11)
+        cls.graph = RoutingGraph.from_networkx(cls.G, name='test').contract()
+
+    def test_every_node_ranked(self):
+        """Each node gets a unique contraction rank"""
+        ranks = np.sort(self.graph.hierarchy.rank)
+        np.testing.assert_array_equal(ranks, np.arange(self.graph.node_count))
+
+    def test_query_matches_networkx(self):
+        """Bidirectional CH queries return exact shortest path lengths"""
+        rng = random.Random(5)
+        nodes = list(self.G.nodes)
+        checked = 0
+        while checked < 60:
+            u, v = rng.choice(nodes), rng.choice(nodes)
+            try:
+                expected = nx.shortest_path_length(self.G, u, v, weight='length')
+            except nx.NetworkXNoPath:
+                with self.assertRaises(NoPathError):
+                    self.graph.shortest_path(self.graph.index_of(u), self.graph.index_of(v))
+                continue
+            path, length = self.graph.shortest_path(self.graph.index_of(u), self.graph.index_of(v))
+            self.assertAlmostEqual(length, expected, delta=0.05)
+            checked += 1
+
+    def test_shortcuts_unpack_to_original_edges(self):
+        """Unpacked paths only use edges of the original graph"""
+        src, dst = 0, self.graph.node_count - 1
+        path, length = self.graph.shortest_path(src, dst)
+        self.assertEqual((path[0], path[-1]), (src, dst))
+        total = 0.0
+        for u, v in zip(path, path[1:]):
+            edge = self.graph.edge_index(u, v)
+            self.assertIsNotNone(edge)
+            total += float(self.graph.lengths[edge])
+        self.assertAlmostEqual(total, length, delta=0.05)
+
+    def test_hierarchy_survives_save_load(self):
+        """The hierarchy is stored in the compiled file and used after load"""
+        tmpdir = tempfile.mkdtemp()
+        try:
+            path = os.path.join(tmpdir, 'ch.rgraph')
+            self.graph.save(path)
+            loaded = RoutingGraph.load(path)
+            self.assertIsNotNone(loaded.hierarchy)
+            self.assertEqual(loaded.hierarchy.shortcut_count, self.graph.hierarchy.shortcut_count)
+            src, dst = 3, self.graph.node_count - 4
+            self.assertEqual(loaded.shortest_path(src, dst), self.graph.shortest_path(src, dst))
+        finally:
+            shutil.rmtree(tmpdir)
+
+
+class TestDistanceMatrix(unittest.TestCase):
+    """Çoktan çoğa mesafe matrisi testleri"""
+
+    @classmethod
+    def setUpClass(cls):
+        cls.G = build_grid_graph(rows=9, cols=9, seed=21)
+        cls.graph = RoutingGraph.from_networkx(cls.G, name='driving').contract()
+        rng = random.Random(8)
+        cls.nodes = rng.sample(range(cls.graph.node_count), 12)
+
+    def test_matches_networkx(self):
+        """Matrix entries equal pairwise shortest path lengths"""
+        lengths, durations = self.graph.distance_matrix(self.nodes)
+        self.assertEqual(lengths.shape, (12, 12))
+        for i, u in enumerate(self.nodes):
+            expected = nx.single_source_dijkstra_path_length(
+                self.G, int(self.graph.node_ids[u]), weight='length')
+            for j, v in enumerate(self.nodes):
+                osm_v = int(self.graph.node_ids[v])
+                if osm_v in expected:
+                    self.assertAlmostEqual(lengths[i, j], expected[osm_v], delta=0.05)
+                else:
+                    self.assertTrue(np.isinf(lengths[i, j]))
+        np.testing.assert_array_equal(np.diag(lengths), 0.0)
+
+    def test_hierarchy_and_dijkstra_agree(self):
+        """Bucket many-to-many and one-to-many Dijkstra give the same matrix"""
+        ch_lengths, ch_durations = self.graph.distance_matrix(self.nodes[:6], self.nodes[6:])
+        lengths, durations = self.graph.distance_matrix(self.nodes[:6], self.nodes[6:], use_hierarchy=False)
+        np.testing.assert_allclose(ch_lengths, lengths, atol=0.05)
+        np.testing.assert_allclose(ch_durations, durations, atol=0.05)
+
+    def test_durations_follow_route_leg(self):
+        """Matrix durations match the travel time of the routed leg"""
+        _, durations = self.graph.distance_matrix([self.nodes[0]], [self.nodes[1]])
+        try:
+            leg = self.graph.route_leg(self.nodes[0], self.nodes[1], with_geometry=False)
+        except NoPathError:
+            self.assertTrue(np.isinf(durations[0, 0]))
+            return
+        self.assertAlmostEqual(durations[0, 0], leg.duration_s, delta=0.05)
+
+
+class TestRouteLeg(unittest.TestCase):
+    """Tek aramalı rota bacağı testleri"""
+
+    def setUp(self):
+        self.G = build_grid_graph(rows=6, cols=6, seed=3)
+        u, v, k = next(iter(self.G.edges(keys=True)))
+        a, b = self.G.nodes[u], self.G.nodes[v]
+        self.shaped_edge = (u, v)
+        self.G.edges[u, v, k]['geometry'] = LineString(
+            [(a['x'], a['y']), (a['x'] + 1e-4, a['y'] + 2e-4), (b['x'], b['y'])])
+        self.G.edges[u, v, k]['speed_kph'] = 36.0
+        # An island that can never be reached from the grid
+        self.G.add_node(1, x=34.99, y=38.70)
+        self.G.add_node(2, x=34.991, y=38.70)
+        self.G.add_edge(1, 2, length=90.0)
+        self.graph = RoutingGraph.from_networkx(self.G, name='walking').contract()
+
+    def test_leg_matches_path(self):
+        """Length, duration and geometry come from the same path"""
+        src, dst = self.graph.index_of(1000000), self.graph.index_of(1000035)
+        leg = self.graph.route_leg(src, dst)
+        path, length = self.graph.shortest_path(src, dst)
+        self.assertEqual(leg.nodes, path)
+        self.assertAlmostEqual(leg.length_m, length, delta=0.05)
+        # Walking speed (5 km/h) for edges without speed attributes
+        expected_s = 0.0
+        for u, v in zip(path, path[1:]):
+            osm_u, osm_v = int(self.graph.node_ids[u]), int(self.graph.node_ids[v])
+            data = min(self.G[osm_u][osm_v].values(), key=lambda d: d['length'])
+            expected_s += data['length'] / (data.get('speed_kph', 5.0) / 3.6)
+        self.assertAlmostEqual(leg.duration_s, expected_s, delta=0.1)
+        self.assertEqual(leg.geometry[0], (float(self.graph.node_y[src]), float(self.graph.node_x[src])))
+        self.assertEqual(leg.geometry[-1], (float(self.graph.node_y[dst]), float(self.graph.node_x[dst])))
+
+    def test_geometry_includes_edge_shape(self):
+        """Curved edges contribute their shape points"""
+        u, v = (self.graph.index_of(n) for n in self.shaped_edge)
+        leg = self.graph.route_leg(u, v)
+        self.assertEqual(leg.nodes, [u, v])
+        self.assertEqual(len(leg.geometry), 3)
+        # speed_kph on the edge overrides the mode default
+        self.assertAlmostEqual(leg.duration_s, leg.length_m / 10.0, delta=0.01)
+
+    def test_path_coords_match_edge_by_edge_stitching(self):
+        """Vectorised assembly equals concatenating each edge's shape"""
+        src, dst = self.graph.index_of(1000000), self.graph.index_of(1000035)
+        path, _ = self.graph.shortest_path(src, dst)
+        G = self.G.copy()
+        for i, (u, v) in enumerate(zip(path, path[1:])):
+            if i % 2:
+                continue
+            osm_u, osm_v = int(self.graph.node_ids[u]), int(self.graph.node_ids[v])
+            a, b = G.nodes[osm_u], G.nodes[osm_v]
+            bends = [(a['x'] + j * 1e-5, a['y'] - j * 1e-5) for j in range(1, i + 2)]
+            for data in G[osm_u][osm_v].values():
+                data['geometry'] = LineString([(a['x'], a['y'])] + bends + [(b['x'], b['y'])])
+        graph = RoutingGraph.from_networkx(G, name='walking')
+
+        expected = [(float(graph.node_y[path[0]]), float(graph.node_x[path[0]]))]
+        for u, v in zip(path, path[1:]):
+            shape = graph.edge_geometry(u, v)
+            if shape:
+                expected.extend((lat, lng) for lng, lat in shape[1:-1])
+            expected.append((float(graph.node_y[v]), float(graph.node_x[v])))
+
+        self.assertEqual(graph.path_geometry(path), expected)
+        self.assertGreater(len(expected), len(path))
+        self.assertEqual(graph.path_geometry([src]), [expected[0]])
+
+    def test_without_geometry(self):
+        leg = self.graph.route_leg(0, 5, with_geometry=False)
+        self.assertIsNone(leg.geometry)
+
+    def test_components_rule_out_search(self):
+        """Pairs in different components fail before any search runs"""
+        island = self.graph.index_of(1)
+        self.assertFalse(self.graph.connected(0, island))
+        with patch.object(self.graph.hierarchy, 'query', side_effect=AssertionError('searched')):
+            with self.assertRaises(NoPathError):
+                self.graph.route_leg(0, island)
+
+    def test_component_labels_without_scipy(self):
+        """Union-find fallback gives the same partition"""
+        expected = weak_component_labels(self.graph.offsets, self.graph.targets)
+        with patch.object(routing_engine, 'connected_components', None):
+            labels = weak_component_labels(self.graph.offsets, self.graph.targets)
+        self.assertEqual(len(set(zip(expected.tolist(), labels.tolist()))), int(expected.max()) + 1)
+
+
+class TestLegCache(unittest.TestCase):
+    """Rota bacağı LRU önbelleği testleri"""
+
+    def setUp(self):
+        self.graph = RoutingGraph.from_networkx(build_grid_graph(rows=5, cols=5), name='walking')
+        self.graph.metadata['source_sha256'] = 'aaaa'
+        self.cache = LegCache(max_entries=2)
+
+    def test_hit_and_miss(self):
+        """Repeated legs are served from the cache"""
+        first = self.cache.route_leg(self.graph, 0, 24)
+        with patch.object(self.graph, 'route_leg', side_effect=AssertionError('recomputed')):
+            second = self.cache.route_leg(self.graph, 0, 24)
+        self.assertIs(first, second)
+        stats = self.cache.stats()
+        self.assertEqual((stats['hits'], stats['misses']), (1, 1))
+
+    def test_lru_eviction(self):
+        """The least recently used leg is evicted first"""
+        self.cache.route_leg(self.graph, 0, 24)
+        self.cache.route_leg(self.graph, 0, 12)
+        self.cache.route_leg(self.graph, 0, 24)  # refresh
+        self.cache.route_leg(self.graph, 0, 6)
+        self.assertEqual(self.cache.stats()['evictions'], 1)
+        self.cache.route_leg(self.graph, 0, 24)
+        self.assertEqual(self.cache.stats()['hits'], 2)
+
+    def test_geometry_added_on_demand(self):
+        """A leg cached without geometry gains it when asked for"""
+        leg = self.cache.route_leg(self.graph, 0, 24, with_geometry=False)
+        self.assertIsNone(leg.geometry)
+        leg = self.cache.route_leg(self.graph, 0, 24)
+        self.assertEqual(len(leg.geometry), len(leg.nodes))
+
+    def test_new_graph_version_invalidates(self):
+        """Legs of an older graph version are dropped"""
+        self.cache.route_leg(self.graph, 0, 24)
+        rebuilt = RoutingGraph.from_networkx(build_grid_graph(rows=5, cols=5), name='walking')
+        rebuilt.metadata['source_sha256'] = 'bbbb'
+        self.cache.route_leg(rebuilt, 0, 24)
+        stats = self.cache.stats()
+        self.assertEqual((stats['misses'], stats['invalidations'], stats['size']), (2, 1, 1))
+
+    def test_file_changed(self):
+        """Loaded graphs notice when their file is replaced"""
+        tmpdir = tempfile.mkdtemp()
+        try:
+            path = os.path.join(tmpdir, 'walk.rgraph')
+            self.graph.save(path)
+            loaded = RoutingGraph.load(path)
+            self.assertFalse(loaded.file_changed())
+            self.graph.save(path)
+            self.assertTrue(loaded.file_changed())
+        finally:
+            shutil.rmtree(tmpdir)
+
+
+class TestNodeSpatialIndex(unittest.TestCase):
+    """KD-tree snapping testleri"""
+
+    @classmethod
+    def setUpClass(cls):
+        cls.graph = RoutingGraph.from_networkx(build_grid_graph(), name='test')
+        rng = np.random.default_rng(5)
+        cls.lats = rng.uniform(38.624, 38.635, 50)
+        cls.lngs = rng.uniform(34.904, 34.915, 50)
+
+    def brute_force(self, lat, lng):
+        d = haversine_m(lat, lng, self.graph.node_y, self.graph.node_x)
+        return int(np.argmin(d)), float(d.min())
+
+    def test_snap_matches_brute_force(self):
+        """Batched snapping returns the nearest node and its distance"""
+        nodes, distances = self.graph.snap(self.lats, self.lngs)
+        self.assertEqual(nodes.shape, (50,))
+        for lat, lng, distance in zip(self.lats, self.lngs, distances):
+            # Compare distances so near-ties within projection error pass
+            _, expected_distance = self.brute_force(lat, lng)
+            self.assertAlmostEqual(distance, expected_distance, delta=0.5)
+
+    def test_snap_distance_for_far_point(self):
+        """Points far from the network report a large snap distance"""
+        _, distances = self.graph.snap([38.70], [34.91])
+        self.assertGreater(distances[0], 5000)
+
+    def test_index_built_once(self):
+        """The index is cached on the graph"""
+        self.assertIs(self.graph.spatial_index, self.graph.spatial_index)
+
+    def test_fallback_without_scipy(self):
+        """Brute-force scan is used when SciPy is missing"""
+        with patch.object(routing_engine, 'cKDTree', None):
+            index = NodeSpatialIndex(self.graph.node_y, self.graph.node_x)
+        nodes, _ = index.query(self.lats, self.lngs)
+        expected, _ = self.graph.snap(self.lats, self.lngs)
+        np.testing.assert_array_equal(nodes, expected)
+
+
+class TestCompiledGraphFile(unittest.TestCase):
+    """İkili graph dosyası testleri"""
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.G = build_grid_graph(rows=6, cols=6)
+        u, v, k = next(iter(self.G.edges(keys=True)))
+        a, b = self.G.nodes[u], self.G.nodes[v]
+        self.shaped_edge = (u, v)
+        self.G.edges[u, v, k]['geometry'] = LineString(
+            [(a['x'], a['y']), (a['x'] + 1e-4, a['y'] + 2e-4), (b['x'], b['y'])])
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def test_save_load_roundtrip(self):
+        """Arrays survive a save/load cycle and load() memory-maps them"""
+        graph = RoutingGraph.from_networkx(self.G, name='walking')
+        path = os.path.join(self.tmpdir, 'walk.rgraph')
+        graph.save(path, metadata={'source_sha256': 'abc123'})
+
+        loaded = RoutingGraph.load(path)
+        self.assertEqual(loaded.name, 'walking')
+        self.assertEqual(loaded.version, 'abc123')
+        for key in routing_engine.GRAPH_ARRAYS:
+            np.testing.assert_array_equal(getattr(loaded, key), getattr(graph, key))
+        self.assertFalse(loaded.targets.flags.writeable)
+
+        src, dst = 0, loaded.node_count - 1
+        self.assertEqual(loaded.shortest_path(src, dst), graph.shortest_path(src, dst))
+
+    def test_edge_geometry(self):
+        """Edge shapes are stored and decoded per edge"""
+        graph = RoutingGraph.from_networkx(self.G)
+        path = os.path.join(self.tmpdir, 'walk.rgraph')
+        graph.save(path)
+        loaded = RoutingGraph.load(path)
+
+        u, v = (loaded.index_of(n) for n in self.shaped_edge)
+        coords = loaded.edge_geometry(u, v)
+        self.assertEqual(len(coords), 3)
+        self.assertAlmostEqual(coords[0][0], float(loaded.node_x[u]))
+        self.assertAlmostEqual(coords[-1][1], float(loaded.node_y[v]))
+
+        straight = [(a, b) for a, b in self.G.edges() if (a, b) != self.shaped_edge][0]
+        self.assertIsNone(loaded.edge_geometry(*(loaded.index_of(n) for n in straight)))
+
+    def test_rejects_foreign_file(self):
+        """Files without the magic header are rejected"""
+        path = os.path.join(self.tmpdir, 'bogus.rgraph')
+        with open(path, 'wb') as f:
+            f.write(b'not a graph at all')
+        with self.assertRaises(GraphFormatError):
+            read_graph_header(path)
+
+    def test_compile_graphml_keyed_by_source(self):
+        """Compiled file tracks the GraphML it was built from"""
+        import osmnx as ox
+        source = os.path.join(self.tmpdir, 'net.graphml')
+        self.G.graph['crs'] = 'epsg:4326'
+        ox.save_graphml(self.G, source)
+
+        self.assertFalse(is_compiled_graph_current(source, compiled_graph_path(source)))
+        graph = load_compiled_graph(source, name='walking')
+        self.assertEqual(graph.node_count, self.G.number_of_nodes())
+        self.assertIsNotNone(graph.hierarchy)
+        self.assertTrue(is_compiled_graph_current(source, compiled_graph_path(source)))
+
+        # Touching the file without changing it keeps the compiled graph valid
+        os.utime(source, None)
+        self.assertTrue(is_compiled_graph_current(source, compiled_graph_path(source)))
+
+        with open(source, 'a') as f:
+            f.write('\n')
+        self.assertFalse(is_compiled_graph_current(source, compiled_graph_path(source)))
+        compile_graphml(source)
+        self.assertTrue(is_compiled_graph_current(source, compiled_graph_path(source)))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+"""
+Unit tests for per-leg mode selection in /api/route/smart
+Central legs are walked on the walking graph, the others are driven
+"""
+
+import unittest
+from unittest.mock import patch
+
+from routing_engine import RoutingGraph
+from test_routing_engine import build_grid_graph
+
+
+class TestSmartRoute(unittest.TestCase):
+    """Akıllı rota (yürüyüş + araç) testleri"""
+
+    @classmethod
+    def setUpClass(cls):
+        import poi_api
+
+        cls.poi_api = poi_api
+        cls.client = poi_api.app.test_client()
+        # A dense walking grid in the center and a sparse driving grid reaching ~9 km out
+        cls.walking = RoutingGraph.from_networkx(build_grid_graph(rows=8, cols=8, seed=2), name='walking')
+        cls.walking.metadata['source_sha256'] = 'e' * 64
+        cls.driving = RoutingGraph.from_networkx(build_grid_graph(rows=8, cols=8, spacing_deg=0.01, seed=3),
+                                                 name='driving')
+        cls.driving.metadata['source_sha256'] = 'f' * 64
+
+    def point(self, graph, index, name):
+        return {'name': name, 'lat': float(graph.node_y[index]), 'lng': float(graph.node_x[index])}
+
+    def smart_route(self, waypoints):
+        with patch.object(self.poi_api, 'load_walking_graph', return_value=self.walking), \
+                patch.object(self.poi_api, 'load_driving_graph', return_value=self.driving) as driving:
+            response = self.client.post('/api/route/smart', json={'waypoints': waypoints})
+        return response, driving
+
+    def test_central_trip_uses_walking_graph_only(self):
+        waypoints = [self.point(self.walking, 0, 'A'), self.point(self.walking, 63, 'B'),
+                     self.point(self.walking, 7, 'C')]
+        response, driving = self.smart_route(waypoints)
+        self.assertEqual(response.status_code, 200)
+        route = response.get_json()['route']
+        self.assertEqual(route['network_type'], 'walking')
+        self.assertEqual([leg['mode'] for leg in route['legs']], ['walking', 'walking'])
+        self.assertEqual(route['transfers'], [])
+        driving.assert_not_called()
+
+        expected = self.walking.route_leg(0, 63).length_m + self.walking.route_leg(63, 7).length_m
+        self.assertAlmostEqual(route['total_distance'], round(expected / 1000, 2))
+
+    def test_mixed_trip_switches_mode_per_leg(self):
+        """Without a driving node on the walking network the mode changes at the waypoints"""
+        waypoints = [self.point(self.walking, 0, 'A'), self.point(self.walking, 63, 'B'),
+                     self.point(self.driving, 63, 'Far'), self.point(self.walking, 9, 'C')]
+        with patch.object(self.poi_api, 'PARK_AND_WALK_MAX_GAP_M', 0):
+            self.poi_api.PARKING_CANDIDATES.clear()
+            response, _ = self.smart_route(waypoints)
+        self.poi_api.PARKING_CANDIDATES.clear()
+        self.assertEqual(response.status_code, 200)
+        route = response.get_json()['route']
+        self.assertEqual(route['network_type'], 'multimodal')
+        self.assertEqual([leg['mode'] for leg in route['legs']], ['walking', 'driving', 'driving'])
+        self.assertEqual([(t['type'], t['waypoint_index'], t['name'], t['from_mode'], t['to_mode'])
+                          for t in route['transfers']],
+                         [('waypoint', 1, 'B', 'walking', 'driving')])
+        self.assertEqual(route['instructions'][0].split()[0], 'Walk')
+        self.assertEqual(route['instructions'][1].split()[0], 'Drive')
+        self.assertAlmostEqual(route['total_distance'], round(sum(leg['distance'] for leg in route['legs']), 2), places=1)
+
+    def test_park_and_walk_transfers_at_walking_network_edge(self):
+        """The car is left at the driving node on the walking network; the rest is walked"""
+        # Only the driving grid's corner node lies on the walking grid (its node 0)
+        driving_nodes, walking_nodes = self.poi_api.parking_candidates(self.driving, self.walking)
+        self.assertEqual((driving_nodes.tolist(), walking_nodes.tolist()), ([0], [0]))
+
+        waypoints = [self.point(self.walking, 0, 'A'), self.point(self.walking, 63, 'B'),
+                     self.point(self.driving, 63, 'Far'), self.point(self.walking, 9, 'C')]
+        response, _ = self.smart_route(waypoints)
+        self.assertEqual(response.status_code, 200)
+        route = response.get_json()['route']
+        self.assertEqual(route['network_type'], 'multimodal')
+        self.assertEqual([(leg['from'], leg['to'], leg['mode']) for leg in route['legs']], [
+            ('A', 'B', 'walking'),
+            ('B', 'Parking near B', 'walking'),
+            ('Parking near B', 'Far', 'driving'),
+            ('Far', 'Parking near C', 'driving'),
+            ('Parking near C', 'C', 'walking'),
+        ])
+        parking = (float(self.driving.node_y[0]), float(self.driving.node_x[0]))
+        self.assertEqual([(t['type'], t['waypoint_index'], t['from_mode'], t['to_mode'], (t['lat'], t['lng']))
+                          for t in route['transfers']],
+                         [('parking', None, 'walking', 'driving', parking),
+                          ('parking', None, 'driving', 'walking', parking)])
+
+        expected = (self.walking.route_leg(63, 0).length_m + self.driving.route_leg(0, 63).length_m +
+                    self.driving.route_leg(63, 0).length_m + self.walking.route_leg(0, 9).length_m)
+        self.assertAlmostEqual(route['total_distance'] - route['legs'][0]['distance'], expected / 1000, places=1)
+
+    def test_central_leg_off_walking_network_is_driven(self):
+        # Central, but well beyond the walking graph's snap distance
+        off_network = {'name': 'Off', 'lat': 38.6400, 'lng': 34.9350}
+        self.assertTrue(self.poi_api.is_within_urgup_center(off_network['lat'], off_network['lng']))
+        response, _ = self.smart_route([self.point(self.walking, 0, 'A'), off_network])
+        route = response.get_json()['route']
+        self.assertEqual(route['network_type'], 'driving')
+        self.assertEqual(route['legs'][0]['mode'], 'driving')
+
+
+if __name__ == '__main__':
+    unittest.main()